@@ -16,4 +16,105 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     LOG_LEVEL: str = "INFO"
 
+    # Outgoing HTTP connection pool (Telegram Bot API, TMDB)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP2_ENABLED: bool = False
+
+    # Telegram Bot API base URL (a self-hosted server or a local stand-in for benchmarks)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+
+    # Telegram getFile path cache (paths are valid for at least 1 hour)
+    FILE_PATH_CACHE_TTL: int = 3000
+    FILE_PATH_CACHE_SIZE: int = 4096
+
+    # On-disk segment cache for streamed files (0 disables it)
+    STREAM_CACHE_DIR: str = "data/stream_cache"
+    STREAM_CACHE_MAX_BYTES: int = 5 * 1024 * 1024 * 1024
+    STREAM_SEGMENT_SIZE: int = 1024 * 1024
+    # Segments a shared upstream transfer may run ahead of its fastest viewer
+    STREAM_COALESCE_WINDOW: int = 4
+
+    # Sequential read-ahead (segments downloaded ahead of the player, 0 disables it)
+    STREAM_PREFETCH_SEGMENTS: int = 4
+    STREAM_PREFETCH_MAX_BYTES: int = 256 * 1024 * 1024
+    STREAM_PREFETCH_IDLE_TIMEOUT: float = 30.0
+
+    # Stream admission control and bandwidth shaping (0 = unlimited)
+    STREAM_MAX_CONCURRENT: int = 64
+    STREAM_MAX_PER_USER: int = 4
+    STREAM_BANDWIDTH_LIMIT: int = 0  # bytes/s shared by all streams
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_QUEUE_TIMEOUT: float = 5.0
+    STREAM_RETRY_AFTER: int = 5
+    # Viewers whose role/ban status is kept in memory (looked up again after a minute)
+    VIEWER_ROLE_CACHE_SIZE: int = 10000
+
+    # TMDB API (requests per second are shared by all import workers)
+    TMDB_API_URL: str = "https://api.themoviedb.org/3"
+    TMDB_LANGUAGE: str = "en"
+    TMDB_RATE_LIMIT: float = 40.0
+    TMDB_MAX_RETRIES: int = 4
+
+    # TMDB metadata cache (seconds). Searches without results and 404s use the negative TTL.
+    TMDB_CACHE_TTL: int = 7 * 24 * 3600
+    TMDB_CACHE_NEGATIVE_TTL: int = 300
+    TMDB_CACHE_SIZE: int = 2048
+
+    # Batch import queue (Redis Stream) and worker pool
+    INGEST_WORKERS: int = 4
+    INGEST_MAX_ATTEMPTS: int = 6
+    INGEST_CLAIM_IDLE: float = 300.0  # seconds before a stuck job is taken over
+    INGEST_STREAM_MAXLEN: int = 100000
+    # Failed imports are retried after 30s, 60s, 120s, ... (capped, with jitter)
+    INGEST_RETRY_BASE_DELAY: float = 30.0
+    INGEST_RETRY_MAX_DELAY: float = 3600.0
+    # Files per second put back in the queue by an Unsorted re-run
+    INGEST_RERUN_RATE: float = 5.0
+    # Seconds between updates of the batch status event stream (admin WebApp)
+    BATCH_EVENTS_INTERVAL: float = 2.0
+    # Episodes are written in batches: at most every WINDOW seconds or BATCH episodes
+    INGEST_WRITE_WINDOW: float = 0.05
+    INGEST_WRITE_BATCH: int = 100
+    # Filename parsing: processes for guessit (0 = a thread instead) and memoized filenames
+    PARSER_PROCESSES: int = 2
+    PARSER_CACHE_SIZE: int = 8192
+
+    # Player heartbeats are buffered in Redis and written every FLUSH_INTERVAL seconds (BATCH users per round)
+    PROGRESS_FLUSH_INTERVAL: float = 5.0
+    PROGRESS_FLUSH_BATCH: int = 500
+
+    # List endpoints are paginated: default and largest page size
+    LIST_PAGE_SIZE: int = 50
+    LIST_MAX_PAGE_SIZE: int = 200
+
+    # Catalog listings (bundles, series, episodes) cached as JSON: entries in memory, Redis TTL (seconds)
+    CATALOG_CACHE_SIZE: int = 1024
+    CATALOG_CACHE_TTL: int = 24 * 3600
+
+    # Search index (in memory): seconds between picking up new documents and between full rebuilds
+    SEARCH_REFRESH_INTERVAL: float = 15.0
+    SEARCH_REBUILD_INTERVAL: float = 6 * 3600
+    # Only the best N matches of a query can be paged through
+    SEARCH_MAX_RESULTS: int = 200
+    SEARCH_PAGE_SIZE: int = 20
+
+    # Cache-Control of /webapp/stream/u/{file_unique_id} responses (content never changes).
+    # Private by default: the endpoint checks initData, bans and admission, a shared cache would not.
+    STREAM_CACHE_CONTROL: str = "private, max-age=31536000, immutable"
+
+    # Download backend for streaming: "bot_api" (cloud or self-hosted) or "mtproto"
+    STREAM_BACKEND: str = "bot_api"
+    STREAM_DOWNLOAD_CONCURRENCY: int = 4
+    STREAM_DOWNLOAD_PART_SIZE: int = 1024 * 1024
+    # Self-hosted Bot API in --local mode: its working dir and where we see it mounted
+    TELEGRAM_LOCAL_SERVER_DIR: str = "/var/lib/telegram-bot-api"
+    TELEGRAM_LOCAL_FILES_DIR: Optional[str] = None
+    # MTProto backend (my.telegram.org)
+    TELEGRAM_API_ID: Optional[int] = None
+    TELEGRAM_API_HASH: Optional[str] = None
+
 settings = Settings()
@@ -1,20 +1,31 @@
-from aiogram.types import Message
-from app.models import StorageChannel, Bundle, Series, Season, Episode
+from app.models import Bundle, Series, Season, Episode
 from app.utils.guessit_parser import MediaParser
-from app.utils.tmdb import tmdb_client
-from app.config import settings
+from app.utils.tmdb_cache import tmdb_cache
+from app.utils.catalog_cache import catalog_cache, series_scope
+from app.ingest.jobs import ImportJob, ImportRejected
+from app.ingest.writer import import_writer
+from app.ingest.telemetry import count, stage
 import logging
-import asyncio
-from beanie import PydanticObjectId
-import redis.asyncio as redis
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple, Type
+from beanie import Document, PydanticObjectId, UpdateResponse
+from beanie.odm.utils.encoder import Encoder
+from bson import DBRef
+from pymongo.errors import DuplicateKeyError
+from app.utils.redis_client import redis_client
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-# Redis Connection
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-
-# Key Prefix
+# Key Prefixes
 BATCH_KEY_PREFIX = "batch_import:"
+LOCK_KEY_PREFIX = "import_lock:"
+
+# Seconds a Series/Season creation may hold its lock (TMDB retries included)
+LOCK_TIMEOUT = 60
+
+# Concurrent imports of the same show create its Series/Season only once
+_flight = SingleFlight()
 
 async def get_batch_info(channel_id: int):
     """
@@ -27,6 +38,17 @@ async def get_batch_info(channel_id: int):
         return {"bundle_id": bundle_id}
     return None
 
+async def active_batches() -> Dict[int, str]:
+    """
+    All channels with an active batch: {channel_id: bundle_id}
+    """
+    batches = {}
+    async for key in redis_client.scan_iter(match=f"{BATCH_KEY_PREFIX}*"):
+        bundle_id = await redis_client.get(key)
+        if bundle_id:
+            batches[int(key[len(BATCH_KEY_PREFIX):])] = bundle_id
+    return batches
+
 async def start_batch(channel_id: int, bundle_id: str):
     key = f"{BATCH_KEY_PREFIX}{channel_id}"
     await redis_client.set(key, bundle_id)
@@ -37,59 +59,174 @@ async def stop_batch(channel_id: int):
     await redis_client.delete(key)
     logger.info(f"Stopped batch import for channel {channel_id}")
 
-async def process_new_file(message: Message, storage_channel: StorageChannel):
+@asynccontextmanager
+async def _creation_lock(name: str):
     """
-    Main logic to process a file:
-    1. Check if batch is active.
-    2. Parse filename.
-    3. Fetch TMDB Metadata.
-    4. Create/Get Series, Season.
-    5. Create Episode.
+    Cross-process lock around creating a Series/Season, so only one worker asks
+    TMDB for it. Best effort: the upserts stay correct without it.
     """
-    channel_id = message.chat.id
+    lock = redis_client.lock(f"{LOCK_KEY_PREFIX}{name}", timeout=LOCK_TIMEOUT, blocking_timeout=LOCK_TIMEOUT)
+    try:
+        acquired = await lock.acquire()
+    except Exception as e:
+        logger.warning(f"Could not lock {name}: {e}")
+        acquired = False
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except Exception as e:
+                logger.warning(f"Could not unlock {name}: {e}")
 
-    # Only process if a batch is active for this channel
-    batch_info = await get_batch_info(channel_id)
-    if not batch_info:
-        logger.debug(f"Ignored file in {channel_id}: No active batch.")
-        return
+def _on_insert(document: Document) -> dict:
+    """
+    $setOnInsert payload for an upsert. The id is chosen here, so the caller
+    can tell whether its document was the one inserted.
+    """
+    document.id = PydanticObjectId()
+    return Encoder(to_db=True).encode(document)
 
-    bundle_id = batch_info["bundle_id"]
+async def _upsert(model: Type[Document], query: dict, document: Document) -> Tuple[Document, bool]:
+    """
+    Inserts `document` unless a document matching `query` exists (in one atomic
+    operation). Returns (stored document, inserted).
+    """
+    fields = _on_insert(document)
     try:
-        bundle = await Bundle.get(PydanticObjectId(bundle_id))
+        stored = await model.find_one(query).update(
+            {"$setOnInsert": fields}, upsert=True, response_type=UpdateResponse.NEW_DOCUMENT
+        )
+    except DuplicateKeyError:
+        # Lost a race on the unique index: the other insert won
+        stored = await model.find_one(query)
+    return stored, stored.id == fields["_id"]
+
+async def get_or_create_series(tmdb_id: int, bundle: Bundle) -> Optional[Series]:
+    series = await Series.find_one(Series.tmdb_id == tmdb_id)
+    if series:
+        return series
+    return await _flight.do(("series", tmdb_id), lambda: _create_series(tmdb_id, bundle))
+
+async def _create_series(tmdb_id: int, bundle: Bundle) -> Optional[Series]:
+    async with _creation_lock(f"series:{tmdb_id}"):
+        series = await Series.find_one(Series.tmdb_id == tmdb_id)
+        if series:
+            return series
+
+        details = await tmdb_cache.get_show_details(tmdb_id)
+        if not details:
+            return None
+
+        series, inserted = await _upsert(Series, {"tmdb_id": tmdb_id}, Series(
+            tmdb_id=tmdb_id,
+            name=details["name"],
+            overview=details.get("overview"),
+            poster_path=details.get("poster_path"),
+            backdrop_path=details.get("backdrop_path"),
+            first_air_date=details.get("first_air_date"),
+            rating=details.get("vote_average", 0),
+            bundle_id=bundle.id
+        ))
+
+    if inserted:
+        await catalog_cache.invalidate(series_scope(bundle.id))
+        # Update Bundle count (with the next batch write)
+        import_writer.increment(Bundle, bundle.id, "series_count")
+    return series
+
+def _season_query(series: Series, season_num: int) -> dict:
+    # Links are stored as DBRefs: compare with one, not with the bare id
+    return {"series_id": DBRef(Series.get_collection_name(), series.id), "season_number": season_num}
+
+async def get_or_create_season(series: Series, season_num: int) -> Season:
+    season = await Season.find_one(_season_query(series, season_num))
+    if season:
+        return season
+    return await _flight.do(("season", series.tmdb_id, season_num), lambda: _create_season(series, season_num))
+
+async def _create_season(series: Series, season_num: int) -> Season:
+    async with _creation_lock(f"season:{series.tmdb_id}:{season_num}"):
+        season = await Season.find_one(_season_query(series, season_num))
+        if season:
+            return season
+
+        season_details = await tmdb_cache.get_season_details(series.tmdb_id, season_num)
+        if not season_details:
+            # Fallback if season details fail
+            season_details = {}
+
+        season, _ = await _upsert(Season, _season_query(series, season_num), Season(
+            series_id=series.id,
+            season_number=season_num,
+            name=season_details.get("name", f"Season {season_num}"),
+            overview=season_details.get("overview"),
+            poster_path=season_details.get("poster_path"),
+            air_date=season_details.get("air_date"),
+            episode_count=0
+        ))
+    return season
+
+def episode_metadata(season_details: Optional[dict], episode_num: int) -> dict:
+    """
+    Episode fields (name, overview, still, air date, runtime) from a TMDB season
+    response. Placeholders if TMDB does not know the episode (yet).
+    """
+    episodes = (season_details or {}).get("episodes") or []
+    tmdb_episode = next((ep for ep in episodes if ep.get("episode_number") == episode_num), {})
+    return {
+        "name": tmdb_episode.get("name") or f"Episode {episode_num}",
+        "overview": tmdb_episode.get("overview") or "",
+        "still_path": tmdb_episode.get("still_path"),
+        "air_date": tmdb_episode.get("air_date"),
+        "runtime": tmdb_episode.get("runtime"),
+    }
+
+async def process_new_file(job: ImportJob):
+    """
+    Main logic to import a queued file (see app/ingest/queue.py):
+    1. Parse filename.
+    2. Fetch TMDB Metadata.
+    3. Create/Get Series, Season.
+    4. Create Episode.
+    Raising makes the queue retry the job later, ImportRejected moves the file
+    to the Unsorted list.
+    """
+    channel_id = job.channel_id
+    bundle_id = job.bundle_id
+    try:
+        bundle_object_id = PydanticObjectId(bundle_id)
     except Exception:
-        logger.error(f"Invalid bundle ID: {bundle_id}")
-        return
+        raise ImportRejected("no_bundle", f"Invalid bundle ID: {bundle_id}")
 
+    bundle = await Bundle.get(bundle_object_id)
     if not bundle:
-        logger.error(f"Bundle {bundle_id} not found!")
-        return
+        raise ImportRejected("no_bundle", f"Bundle {bundle_id} not found")
 
-    # Get file info
-    video = message.video or message.document
-    if not video:
-        return
-
-    file_id = video.file_id
-    file_unique_id = video.file_unique_id
-    filename = video.file_name or "Unknown_Video.mkv"
+    file_id = job.file_id
+    file_unique_id = job.file_unique_id
+    filename = job.file_name or "Unknown_Video.mkv"
 
-    # 1. Parse Filename (CPU bound, run in thread)
-    parsed = await asyncio.to_thread(MediaParser.parse_filename, filename)
-    if not parsed.get("title"):
-        logger.warning(f"Could not parse title from {filename}")
-        # TODO: Handle unparsed files (add to 'Unsorted' list)
-        return
+    # 1. Parse Filename (fast path inline, guessit in the parser process pool)
+    with stage("parse"):
+        parsed = await MediaParser.parse_filename_async(filename)
+    if not parsed.get("title") or not parsed.get("episode"):
+        raise ImportRejected("unparsed", f"Could not parse title and episode from {filename}")
 
     show_name = parsed["title"]
-    season_num = parsed.get("season", 1)
-    episode_num = parsed.get("episode", 1)
+    # Absolute numbering ("[Group] Title - 12") has no season
+    season_num = parsed.get("season") or 1
+    episode_num = parsed["episode"]
 
-    # 2. Search TMDB (Network bound, run in thread)
-    results = await asyncio.to_thread(tmdb_client.search_tv_show, show_name)
+    # 2. Search TMDB (cached, see app/utils/tmdb_cache.py)
+    with stage("tmdb_search"):
+        results = await tmdb_cache.search_tv_show(show_name)
+    if results is None:
+        # TMDB unreachable: let the queue retry the file
+        raise RuntimeError(f"TMDB search for {show_name} failed")
     if not results:
-        logger.warning(f"No TMDB results for {show_name}")
-        return
+        raise ImportRejected("no_match", f"No TMDB results for {show_name}")
 
     # Assume first result is correct (Batch Mode)
     # In a real rigorous system, we might ask for confirmation,
@@ -97,86 +234,42 @@ async def process_new_file(message: Message, storage_channel: StorageChannel):
     tmdb_show = results[0]
     tmdb_id = tmdb_show["id"]
 
-    # 3. Get/Create Series
-    series = await Series.find_one(Series.tmdb_id == tmdb_id)
+    # 3. Get/Create Series (atomic, safe with concurrent workers)
+    with stage("series"):
+        series = await get_or_create_series(tmdb_id, bundle)
     if not series:
-        details = await asyncio.to_thread(tmdb_client.get_show_details, tmdb_id)
-        if not details:
-            return
-
-        series = Series(
-            tmdb_id=tmdb_id,
-            name=details["name"],
-            overview=details.get("overview"),
-            poster_path=details.get("poster_path"),
-            backdrop_path=details.get("backdrop_path"),
-            first_air_date=details.get("first_air_date"),
-            rating=details.get("vote_average", 0),
-            bundle_id=bundle.id
-        )
-        await series.create()
-
-        # Update Bundle count
-        bundle.series_count += 1
-        await bundle.save()
+        raise RuntimeError(f"TMDB details for {tmdb_id} failed")
 
     # 4. Get/Create Season
-    season = await Season.find_one(Season.series_id == series.id, Season.season_number == season_num)
-    if not season:
-        season_details = await asyncio.to_thread(tmdb_client.get_season_details, tmdb_id, season_num)
-        if not season_details:
-             # Fallback if season details fail
-            season = Season(
-                series_id=series.id,
-                season_number=season_num,
-                name=f"Season {season_num}",
-                episode_count=0
-            )
-        else:
-            season = Season(
-                series_id=series.id,
-                season_number=season_num,
-                name=season_details.get("name", f"Season {season_num}"),
-                overview=season_details.get("overview"),
-                poster_path=season_details.get("poster_path"),
-                air_date=season_details.get("air_date"),
-                episode_count=0
-            )
-        await season.create()
+    with stage("season"):
+        season = await get_or_create_season(series, season_num)
 
     # 5. Create Episode
-    # Check if exists
-    existing_ep = await Episode.find_one(Episode.file_unique_id == file_unique_id)
-    if existing_ep:
-        logger.info(f"Episode {filename} already exists.")
-        return
-
-    # Get specific episode details from Season info if available, else generic
-    episode_name = f"Episode {episode_num}"
-    episode_overview = ""
-    episode_still = None
-
-    # Try to fetch episode specific metadata if not already
-    # (Optimally we cached the season response, but for now simple)
+    # Metadata from the season response, fetched once per (show, season) by tmdb_cache
+    with stage("tmdb_season"):
+        season_details = await tmdb_cache.get_season_details(series.tmdb_id, season_num)
 
     new_episode = Episode(
         series_id=series.id,
         season_id=season.id,
+        season_number=season_num,
         episode_number=episode_num,
-        name=episode_name, # TMDB fetch could improve this
-        overview=episode_overview,
-        still_path=episode_still,
+        **episode_metadata(season_details, episode_num),
         storage_channel_id=channel_id,
-        message_id=message.message_id,
+        message_id=job.message_id,
         file_id=file_id,
         file_unique_id=file_unique_id,
-        file_size=video.file_size,
+        file_size=job.file_size,
+        mime_type=job.mime_type,
         original_filename=filename
     )
-    await new_episode.create()
-
-    # Update counts
-    season.episode_count += 1
-    await season.save()
+    # Written with other workers' episodes in one batch (app/ingest/writer.py).
+    # The unique file_unique_id index rejects files that were already imported.
+    with stage("episode_write"):
+        inserted = await import_writer.add_episode(new_episode)
+    if not inserted:
+        logger.info(f"Episode {filename} already exists.")
+        count("duplicate")
+        return
 
     logger.info(f"Imported: {series.name} - S{season_num:02d}E{episode_num:02d}")
@@ -1,7 +1,10 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from app.models import StorageChannel, AdminSettings
-from app.handlers.batch_import import process_new_file
+from app.handlers.batch_import import get_batch_info, process_new_file
+from app.ingest.jobs import ImportJob, ImportRejected
+from app.ingest.queue import import_queue
+from app.ingest.unsorted import record_unsorted
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,11 +28,24 @@ async def handle_channel_post(message: Message):
     if not storage_channel.is_active:
         return
 
-    # 2. Check if a Batch Import is currently running for this channel
-    # This state is usually stored in Redis or DB.
-    # For now, we will just Log it. Implementing full Batch Logic in batch_import.py
+    # 2. Only files posted during an active Batch Import are imported
+    batch_info = await get_batch_info(channel_id)
+    if not batch_info:
+        logger.debug(f"Ignored file in {channel_id}: No active batch.")
+        return
+
+    job = ImportJob.from_message(message, batch_info["bundle_id"])
+    if not job:
+        return
 
     logger.info(f"New file detected in Storage Channel {storage_channel.name} (ID: {channel_id})")
 
-    # Forward to the batch processor
-    await process_new_file(message, storage_channel)
+    # 3. Queue it for the import workers (app/ingest/queue.py) so polling is never held up
+    try:
+        await import_queue.enqueue(job)
+    except Exception as e:
+        logger.error(f"Could not queue {job.file_name}, importing inline: {e}")
+        try:
+            await process_new_file(job)
+        except ImportRejected as rejected:
+            await record_unsorted(job, rejected.reason, rejected)
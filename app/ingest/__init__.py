@@ -0,0 +1 @@
+# Batch import pipeline: channel posts are queued here and imported by workers
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from beanie import BulkWriter
+
+from app.handlers.batch_import import episode_metadata
+from app.models import Episode, Season, Series
+from app.utils.catalog_cache import catalog_cache, episodes_scope
+from app.utils.tmdb_cache import tmdb_cache
+
+logger = logging.getLogger(__name__)
+
+# Episodes imported before TMDB knew them (or while TMDB was down)
+PLACEHOLDER_QUERY = {"name": {"$regex": r"^Episode \d+$"}}
+
+class MetadataBackfill:
+    """
+    Repairs episodes that were imported with placeholder metadata.
+
+    Placeholder episodes are grouped by season, every season is fetched from
+    TMDB once (not from tmdb_cache, whose entry is refreshed) and its episodes
+    are updated with one bulk_write. Episodes TMDB still does not know are left
+    as they are.
+    Only one run at a time. A run that fails leaves {"error": ...} as its result.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """Starts a run in the background. False if one is already running."""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run())
+        self._task.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        logger.error(f"Metadata backfill failed: {error}", exc_info=error)
+        self.last_result = {"error": str(error) or type(error).__name__}
+
+    async def run(self) -> Dict[str, int]:
+        # season id -> [(episode id, episode number)]
+        placeholders: Dict = defaultdict(list)
+        collection = Episode.get_motor_collection()
+        async for doc in collection.find(PLACEHOLDER_QUERY, {"season_id": 1, "episode_number": 1}):
+            placeholders[doc["season_id"].id].append((doc["_id"], doc["episode_number"]))
+
+        result = {"seasons": len(placeholders), "episodes": 0, "updated": 0, "failed_seasons": 0}
+        if not placeholders:
+            self.last_result = result
+            return result
+
+        seasons = await Season.find({"_id": {"$in": list(placeholders)}}).to_list()
+        series_ids = {season.series_id.ref.id for season in seasons}
+        tmdb_ids = {series.id: series.tmdb_id for series in await Series.find({"_id": {"$in": list(series_ids)}}).to_list()}
+
+        for season in seasons:
+            episodes = placeholders[season.id]
+            result["episodes"] += len(episodes)
+            tmdb_id = tmdb_ids.get(season.series_id.ref.id)
+            if tmdb_id is None:
+                continue
+            # Not the cached response: that is the one the placeholders came from
+            season_details = await tmdb_cache.get_season_details(tmdb_id, season.season_number, refresh=True)
+            if not season_details:
+                result["failed_seasons"] += 1
+                continue
+            updated = await self._update_season(episodes, season_details)
+            if updated:
+                await catalog_cache.invalidate(episodes_scope(season.series_id.ref.id))
+            result["updated"] += updated
+
+        logger.info(
+            f"Metadata backfill: {result['updated']}/{result['episodes']} episodes updated "
+            f"in {result['seasons']} seasons ({result['failed_seasons']} seasons failed)"
+        )
+        self.last_result = result
+        return result
+
+    @staticmethod
+    async def _update_season(episodes: List, season_details: dict) -> int:
+        updated = 0
+        async with BulkWriter() as bulk_writer:
+            for episode_id, episode_number in episodes:
+                metadata = episode_metadata(season_details, episode_number)
+                if metadata["name"] == f"Episode {episode_number}" and not metadata["still_path"]:
+                    continue  # TMDB has nothing for it either
+                await Episode.find_one({"_id": episode_id}).update({"$set": metadata}, bulk_writer=bulk_writer)
+                updated += 1
+        return updated
+
+# Singleton instance
+metadata_backfill = MetadataBackfill()
@@ -0,0 +1,53 @@
+from typing import Dict, Optional
+
+from aiogram.types import Message
+from pydantic import BaseModel
+
+class ImportRejected(Exception):
+    """
+    The file cannot be imported as it is (no title, no TMDB match, no bundle): retrying
+    will not help, it goes to the Unsorted list.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class ImportJob(BaseModel):
+    """
+    One file posted in a storage channel, waiting to be imported.
+    Carries everything the importer needs, so the Telegram update itself is not kept.
+    """
+    channel_id: int
+    message_id: int
+    bundle_id: str
+    file_id: str
+    file_unique_id: str
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    attempts: int = 0
+
+    @classmethod
+    def from_message(cls, message: Message, bundle_id: str) -> Optional["ImportJob"]:
+        video = message.video or message.document
+        if not video:
+            return None
+        return cls(
+            channel_id=message.chat.id,
+            message_id=message.message_id,
+            bundle_id=bundle_id,
+            file_id=video.file_id,
+            file_unique_id=video.file_unique_id,
+            file_name=video.file_name,
+            file_size=video.file_size,
+            mime_type=video.mime_type,
+        )
+
+    def to_fields(self) -> Dict[str, str]:
+        # Redis Stream entries are flat string maps
+        return {"job": self.model_dump_json()}
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "ImportJob":
+        return cls.model_validate_json(fields["job"])
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.config import settings
+from app.ingest.jobs import ImportJob, ImportRejected
+from app.ingest.telemetry import ImportTrace, reset_stats, tracing
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis keys
+STREAM_KEY = "ingest:files"
+DEAD_LETTER_KEY = "ingest:dead"
+RETRY_KEY = "ingest:retry"  # sorted set: job -> time it is due again
+PROGRESS_KEY_PREFIX = "ingest:progress:"
+GROUP = "importers"
+
+# How long a worker blocks on an empty stream (ms) and waits after a Redis error (s)
+READ_BLOCK_MS = 5000
+READ_RETRY_DELAY = 2.0
+
+# How often due retries are moved back onto the stream (s), and how many at once
+RETRY_POLL_INTERVAL = 1.0
+RETRY_BATCH = 100
+
+# Log progress every N files
+PROGRESS_LOG_EVERY = 25
+
+# Called with (job, reason, error) for jobs that will not be retried
+GiveUpHandler = Callable[[ImportJob, str, Exception], Awaitable[None]]
+
+def progress_key(channel_id: int) -> str:
+    return f"{PROGRESS_KEY_PREFIX}{channel_id}"
+
+def retry_delay(attempts: int, base: float, cap: float) -> float:
+    """
+    Exponential backoff with jitter: base, 2*base, 4*base, ... up to cap,
+    randomized to [delay/2, delay] so files failing together do not retry together.
+    """
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+class ImportQueue:
+    """
+    Durable queue of ImportJobs on a Redis Stream, consumed by a pool of async workers.
+
+    channel_post only enqueues, so a burst of uploads never blocks polling.
+    An entry is acknowledged once its import finished. Entries of a worker that
+    died mid-import stay pending and are claimed by another worker after
+    `claim_idle` seconds.
+
+    A failed job waits in the retry set with exponential backoff (see
+    retry_delay) and is then put back on the stream. A job that failed
+    `max_attempts` times, or was rejected (ImportRejected), is handed to the
+    give-up handler (the Unsorted list). Without one, or if it fails, the job
+    goes to the dead-letter stream with its last error.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_attempts: int,
+        claim_idle: float,
+        maxlen: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ):
+        self.handler: Optional[Callable[[ImportJob], Awaitable[None]]] = None
+        self.on_give_up: Optional[GiveUpHandler] = None
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.claim_idle = claim_idle
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.maxlen = maxlen
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, job: ImportJob):
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xadd(STREAM_KEY, job.to_fields(), maxlen=self.maxlen, approximate=True)
+        pipe.hincrby(progress_key(job.channel_id), "received", 1)
+        await pipe.execute()
+
+    async def progress(self, channel_id: int) -> Dict[str, float]:
+        """
+        Batch counters: files received, imported, duplicates, retried, unsorted,
+        failed, TMDB lookups/misses (see app/ingest/telemetry.py) and when it started.
+        """
+        counters = await redis_client.hgetall(progress_key(channel_id))
+        progress = {
+            name: int(counters.get(name, 0))
+            for name in ("received", "imported", "duplicates", "retried", "unsorted", "failed", "tmdb_lookups", "tmdb_misses")
+        }
+        done = progress["imported"] + progress["duplicates"] + progress["unsorted"] + progress["failed"]
+        progress["remaining"] = max(0, progress["received"] - done)
+        progress["started_at"] = float(counters.get("started_at", 0)) or None
+        return progress
+
+    async def reset_progress(self, channel_id: int):
+        await redis_client.delete(progress_key(channel_id))
+        await redis_client.hset(progress_key(channel_id), "started_at", time.time())
+        await reset_stats(channel_id)
+
+    async def start(self, handler: Callable[[ImportJob], Awaitable[None]], on_give_up: Optional[GiveUpHandler] = None):
+        self.handler = handler
+        self.on_give_up = on_give_up
+        try:
+            await redis_client.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self.consumer_prefix}-{i}"))
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._retry_loop()))
+        logger.info(f"Import queue started with {self.workers} workers")
+
+    async def close(self):
+        # Jobs interrupted here stay pending and are claimed again later
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, consumer: str):
+        next_claim = 0.0
+        while True:
+            try:
+                entries = []
+                if time.monotonic() >= next_claim:
+                    entries = await self._claim_stale(consumer)
+                    # Keep claiming while there is a backlog of stale entries
+                    next_claim = 0.0 if entries else time.monotonic() + self.claim_idle / 2
+                if not entries:
+                    entries = await self._read(consumer)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Import queue read failed: {e}")
+                await asyncio.sleep(READ_RETRY_DELAY)
+                continue
+
+            for entry_id, fields in entries:
+                try:
+                    await self._process(entry_id, fields)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Left unacknowledged: claimed again after `claim_idle`
+                    logger.error(f"Import queue could not process entry {entry_id}: {e}")
+                    await asyncio.sleep(READ_RETRY_DELAY)
+
+    async def _claim_stale(self, consumer: str) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+        result = await redis_client.xautoclaim(
+            STREAM_KEY, GROUP, consumer,
+            min_idle_time=int(self.claim_idle * 1000),
+            start_id="0-0",
+            count=1,
+        )
+        return result[1]
+
+    async def _read(self, consumer: str) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+        response = await redis_client.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=1, block=READ_BLOCK_MS)
+        return response[0][1] if response else []
+
+    async def _process(self, entry_id: str, fields: Optional[Dict[str, str]]):
+        if not fields:
+            # Trimmed from the stream before anyone handled it
+            await self._ack(entry_id)
+            return
+
+        try:
+            job = ImportJob.from_fields(fields)
+        except Exception as e:
+            logger.error(f"Dropping malformed import entry {entry_id}: {e}")
+            await self._dead_letter(entry_id, fields, None, e)
+            return
+
+        trace = ImportTrace(job.channel_id)
+        try:
+            with tracing(trace), trace.stage("total"):
+                await self.handler(job)
+        except asyncio.CancelledError:
+            raise
+        except ImportRejected as e:
+            logger.warning(f"Import of {job.file_name} rejected ({e.reason}): {e}")
+            await self._give_up(entry_id, job, e.reason, e, trace)
+            return
+        except Exception as e:
+            await self._failed(entry_id, job, e, trace)
+            return
+
+        # The handler counts a file that was already imported as "duplicate"
+        outcome = "duplicates" if trace.counters.pop("duplicate", 0) else "imported"
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xack(STREAM_KEY, GROUP, entry_id)
+        pipe.xdel(STREAM_KEY, entry_id)
+        pipe.hincrby(progress_key(job.channel_id), outcome, 1)
+        pipe.hmget(progress_key(job.channel_id), "imported", "received")
+        trace.write(pipe, progress_key(job.channel_id), finished=True)
+        imported, received = (int(n or 0) for n in (await pipe.execute())[3])
+
+        if outcome == "imported" and (imported % PROGRESS_LOG_EVERY == 0 or imported >= received):
+            logger.info(f"Import progress for channel {job.channel_id}: {imported}/{received}")
+
+    async def _failed(self, entry_id: str, job: ImportJob, error: Exception, trace: ImportTrace):
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            logger.error(f"Import of {job.file_name} failed {job.attempts} times, giving up: {error}")
+            await self._give_up(entry_id, job, "failed", error, trace)
+            return
+
+        delay = retry_delay(job.attempts, self.retry_base_delay, self.retry_max_delay)
+        logger.warning(f"Import of {job.file_name} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.zadd(RETRY_KEY, {job.model_dump_json(): time.time() + delay})
+        pipe.xack(STREAM_KEY, GROUP, entry_id)
+        pipe.xdel(STREAM_KEY, entry_id)
+        pipe.hincrby(progress_key(job.channel_id), "retried", 1)
+        trace.write(pipe, progress_key(job.channel_id), finished=False)
+        await pipe.execute()
+
+    async def _give_up(self, entry_id: str, job: ImportJob, reason: str, error: Exception, trace: ImportTrace):
+        if self.on_give_up:
+            try:
+                await self.on_give_up(job, reason, error)
+            except Exception as e:
+                logger.error(f"Could not hand over {job.file_name}, dead-lettered: {e}")
+            else:
+                counter = "failed" if reason == "failed" else "unsorted"
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.xack(STREAM_KEY, GROUP, entry_id)
+                pipe.xdel(STREAM_KEY, entry_id)
+                pipe.hincrby(progress_key(job.channel_id), counter, 1)
+                trace.write(pipe, progress_key(job.channel_id), finished=True)
+                await pipe.execute()
+                return
+        await self._dead_letter(entry_id, job.to_fields(), job.channel_id, error)
+
+    async def _retry_loop(self):
+        """
+        Moves retries that are due back onto the stream. Every instance runs
+        one; the move is a transaction, so a job is never lost (at worst two
+        instances both requeue it and the second import finds the file imported).
+        """
+        while True:
+            try:
+                due = await redis_client.zrangebyscore(RETRY_KEY, "-inf", time.time(), start=0, num=RETRY_BATCH)
+                for member in due:
+                    pipe = redis_client.pipeline(transaction=True)
+                    pipe.zrem(RETRY_KEY, member)
+                    pipe.xadd(STREAM_KEY, {"job": member}, maxlen=self.maxlen, approximate=True)
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Import retry scheduler failed: {e}")
+                await asyncio.sleep(READ_RETRY_DELAY)
+                continue
+            if len(due) < RETRY_BATCH:
+                await asyncio.sleep(RETRY_POLL_INTERVAL)
+
+    async def _dead_letter(self, entry_id: str, fields: Dict[str, str], channel_id: Optional[int], error: Exception):
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.xadd(DEAD_LETTER_KEY, {**fields, "error": str(error) or type(error).__name__}, maxlen=self.maxlen, approximate=True)
+        pipe.xack(STREAM_KEY, GROUP, entry_id)
+        pipe.xdel(STREAM_KEY, entry_id)
+        if channel_id is not None:
+            pipe.hincrby(progress_key(channel_id), "failed", 1)
+        await pipe.execute()
+
+    async def _ack(self, entry_id: str):
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xack(STREAM_KEY, GROUP, entry_id)
+        pipe.xdel(STREAM_KEY, entry_id)
+        await pipe.execute()
+
+# Singleton instance
+import_queue = ImportQueue(
+    workers=settings.INGEST_WORKERS,
+    max_attempts=settings.INGEST_MAX_ATTEMPTS,
+    claim_idle=settings.INGEST_CLAIM_IDLE,
+    maxlen=settings.INGEST_STREAM_MAXLEN,
+    retry_base_delay=settings.INGEST_RETRY_BASE_DELAY,
+    retry_max_delay=settings.INGEST_RETRY_MAX_DELAY,
+)
@@ -0,0 +1,146 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from redis.asyncio.client import Pipeline
+
+from app.utils.redis_client import redis_client
+
+# Redis key of the per-minute stats of a channel's batch
+STATS_KEY_PREFIX = "ingest:stats:"
+STATS_TTL = 2 * 3600
+
+# Throughput and latencies are reported over the last N minutes
+WINDOW_MINUTES = 5
+
+# Latency histogram buckets (upper bounds in ms); slower samples go in the last one
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float("inf"))
+
+STAGES = ("parse", "tmdb_search", "series", "season", "tmdb_season", "episode_write", "total")
+
+_current: ContextVar[Optional["ImportTrace"]] = ContextVar("import_trace", default=None)
+
+def stats_key(channel_id: int, minute: int) -> str:
+    return f"{STATS_KEY_PREFIX}{channel_id}:{minute}"
+
+def current_minute() -> int:
+    return int(time.time() // 60)
+
+class ImportTrace:
+    """
+    Counters and stage timings of one import attempt. Collected in memory and
+    written by the import queue with its own bookkeeping, in the same pipeline.
+    """
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.counters: Counter = Counter()
+        self.timings: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - started))
+
+    def write(self, pipe: Pipeline, progress_key: str, finished: bool):
+        """
+        Adds the counters to the batch progress hash and the timings to the
+        histogram of the current minute. `finished`: the file is done (imported,
+        duplicate, unsorted or failed), it counts towards throughput.
+        """
+        for name, amount in self.counters.items():
+            pipe.hincrby(progress_key, name, amount)
+
+        key = stats_key(self.channel_id, current_minute())
+        if finished:
+            pipe.hincrby(key, "done", 1)
+        for name, seconds in self.timings:
+            ms = seconds * 1000
+            bucket = next(i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound)
+            pipe.hincrby(key, f"{name}:{bucket}", 1)
+            pipe.hincrbyfloat(key, f"{name}:sum", ms)
+        pipe.expire(key, STATS_TTL)
+
+@contextmanager
+def tracing(trace: ImportTrace) -> Iterator[ImportTrace]:
+    """Makes `trace` the current one (also for tasks started inside)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times a stage of the current import. A no-op outside of the import queue."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+def count(name: str, amount: int = 1):
+    """Adds to a batch counter of the current import (if any)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] += amount
+
+def _quantile(buckets: List[int], q: float) -> Optional[float]:
+    """Upper bound (ms) of the bucket holding quantile q, None without samples."""
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for bound, samples in zip(LATENCY_BUCKETS_MS, buckets):
+        seen += samples
+        if seen >= q * total:
+            return bound if bound != float("inf") else LATENCY_BUCKETS_MS[-2]
+    return None
+
+async def window_stats(channel_id: int, started_at: Optional[float]) -> Dict:
+    """
+    Throughput (files/s) and per-stage latency over the last WINDOW_MINUTES
+    minutes (or since `started_at` if the batch is younger).
+    Reads WINDOW_MINUTES small hashes, independent of the batch size.
+    """
+    now = time.time()
+    minute = current_minute()
+    pipe = redis_client.pipeline(transaction=False)
+    for m in range(minute - WINDOW_MINUTES + 1, minute + 1):
+        pipe.hgetall(stats_key(channel_id, m))
+    minutes = await pipe.execute()
+
+    totals: Counter = Counter()
+    for fields in minutes:
+        for field, value in fields.items():
+            totals[field] += float(value)
+
+    window_start = (minute - WINDOW_MINUTES + 1) * 60
+    if started_at:
+        window_start = max(window_start, started_at)
+    elapsed = max(now - window_start, 1.0)
+
+    stages = {}
+    for name in STAGES:
+        buckets = [int(totals.get(f"{name}:{i}", 0)) for i in range(len(LATENCY_BUCKETS_MS))]
+        samples = sum(buckets)
+        if not samples:
+            continue
+        stages[name] = {
+            "count": samples,
+            "mean_ms": round(totals[f"{name}:sum"] / samples, 1),
+            "p50_ms": _quantile(buckets, 0.5),
+            "p95_ms": _quantile(buckets, 0.95),
+            "histogram": {str(bound): n for bound, n in zip(LATENCY_BUCKETS_MS, buckets) if n},
+        }
+    return {"files_per_s": round(totals["done"] / elapsed, 2), "stages": stages}
+
+async def reset_stats(channel_id: int):
+    minute = current_minute()
+    await redis_client.delete(*[stats_key(channel_id, m) for m in range(minute - WINDOW_MINUTES + 1, minute + 1)])
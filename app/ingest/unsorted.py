@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.config import settings
+from app.ingest.jobs import ImportJob
+from app.ingest.queue import import_queue
+from app.models import UnsortedFile
+from app.utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+async def record_unsorted(job: ImportJob, reason: str, error: Exception):
+    """
+    Adds a file to the Unsorted list (or updates its entry if it failed before).
+    Used as the import queue's give-up handler.
+    """
+    now = datetime.utcnow()
+    await UnsortedFile.get_motor_collection().update_one(
+        {"file_unique_id": job.file_unique_id},
+        {
+            "$set": {
+                "channel_id": job.channel_id,
+                "message_id": job.message_id,
+                "bundle_id": job.bundle_id,
+                "file_id": job.file_id,
+                "file_name": job.file_name,
+                "file_size": job.file_size,
+                "mime_type": job.mime_type,
+                "reason": reason,
+                "error": str(error) or type(error).__name__,
+                "attempts": job.attempts,
+                "updated_at": now,
+            },
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+    )
+
+def to_job(unsorted: UnsortedFile) -> ImportJob:
+    return ImportJob(
+        channel_id=unsorted.channel_id,
+        message_id=unsorted.message_id,
+        bundle_id=unsorted.bundle_id,
+        file_id=unsorted.file_id,
+        file_unique_id=unsorted.file_unique_id,
+        file_name=unsorted.file_name,
+        file_size=unsorted.file_size,
+        mime_type=unsorted.mime_type,
+    )
+
+class UnsortedRerun:
+    """
+    Puts Unsorted files back through the normal import (the import queue),
+    at most `rate` files per second so a large list does not flood TMDB.
+    Entries are removed once queued: files failing again come back with a new reason.
+    Only one run at a time. Why a run stopped early is kept in `error`.
+    """
+
+    def __init__(self, rate: float):
+        self.limiter = TokenBucket(rate, burst_seconds=1.0)
+        self._task: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, query: Dict) -> bool:
+        """Re-runs the files matching `query` in the background. False if a run is active."""
+        if self.running:
+            return False
+        self.queued = 0
+        self.error = None
+        self._task = asyncio.create_task(self.run(query))
+        self._task.add_done_callback(self._on_done)
+        return True
+
+    def _on_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        logger.error(f"Unsorted re-run failed after {self.queued} files: {error}", exc_info=error)
+        self.error = str(error) or type(error).__name__
+
+    async def run(self, query: Dict):
+        # Ids first: the entries are deleted while we go
+        ids = [doc["_id"] async for doc in UnsortedFile.get_motor_collection().find(query, {"_id": 1})]
+        for unsorted_id in ids:
+            unsorted = await UnsortedFile.get(unsorted_id)
+            if not unsorted:
+                continue
+            await self.limiter.consume(1)
+            try:
+                await import_queue.enqueue(to_job(unsorted))
+            except Exception as e:
+                logger.error(f"Unsorted re-run stopped after {self.queued} files: {e}")
+                self.error = str(e) or type(e).__name__
+                return
+            await unsorted.delete()
+            self.queued += 1
+        logger.info(f"Unsorted re-run queued {self.queued} files")
+
+# Singleton instance
+unsorted_rerun = UnsortedRerun(settings.INGEST_RERUN_RATE)
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+from beanie import BulkWriter, Document
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.models import Bundle, Episode, Season
+from app.utils.catalog_cache import BUNDLES, catalog_cache, episodes_scope
+
+logger = logging.getLogger(__name__)
+
+# Mongo error code of a unique index violation
+DUPLICATE_KEY = 11000
+
+class ImportWriter:
+    """
+    Micro-batches the database writes of the import workers.
+
+    Episodes are buffered for up to `window` seconds (or `max_batch` episodes)
+    and written with one unordered insert_many. Files imported twice are
+    rejected by the unique file_unique_id index instead of a lookup per file.
+    Counters (season episode_count, bundle series_count) are summed in memory
+    and written as one $inc per document, in one bulk_write per collection.
+    Afterwards the cached catalog listings that changed are invalidated.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._episodes: List[Tuple[Episode, asyncio.Future]] = []
+        self._counters: Dict[Tuple[Type[Document], Any, str], int] = defaultdict(int)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def add_episode(self, episode: Episode) -> bool:
+        """
+        Queues an episode for the next flush and waits for it.
+        Returns False if the file was already imported. The season's
+        episode_count is increased for every inserted episode.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._episodes.append((episode, future))
+        if len(self._episodes) >= self.max_batch:
+            self._flush()
+        else:
+            self._schedule()
+        # The write goes on for the others even if this caller is cancelled
+        return await asyncio.shield(future)
+
+    def increment(self, model: Type[Document], document_id: Any, field: str, amount: int = 1):
+        """
+        Adds `amount` to a counter field, written with the next flush.
+        """
+        self._counters[(model, document_id, field)] += amount
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        episodes, self._episodes = self._episodes, []
+        counters, self._counters = self._counters, defaultdict(int)
+        if not episodes and not counters:
+            return
+
+        task = asyncio.create_task(self._write(episodes, counters))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def close(self):
+        self._flush()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _write(self, episodes: List[Tuple[Episode, asyncio.Future]], counters: Dict[Tuple[Type[Document], Any, str], int]):
+        outcomes = await self._insert_episodes(episodes, counters) if episodes else []
+        try:
+            await self._write_counters(counters)
+        except Exception as e:
+            logger.error(f"Import writer: counter update failed: {e}")
+
+        # Cached listings showing what was written
+        scopes = {
+            episodes_scope(episode.series_id.ref.id)
+            for (episode, _), outcome in zip(episodes, outcomes) if outcome is True
+        }
+        if any(model is Bundle and amount for (model, _, _), amount in counters.items()):
+            scopes.add(BUNDLES)
+        await catalog_cache.invalidate(*scopes)
+
+        # Callers are released once everything is written (and visible)
+        for (_, future), outcome in zip(episodes, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    async def _insert_episodes(self, episodes: List[Tuple[Episode, asyncio.Future]], counters: Dict[Tuple[Type[Document], Any, str], int]) -> List[Any]:
+        """Inserts the episodes: per episode True, False (duplicate) or the error."""
+        outcomes: List[Any] = [True] * len(episodes)
+        try:
+            await Episode.insert_many([episode for episode, _ in episodes], ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything but the reported documents was inserted
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY:
+                    outcomes[error["index"]] = False
+                else:
+                    outcomes[error["index"]] = BulkWriteError({"writeErrors": [error]})
+        except Exception as e:
+            outcomes = [e] * len(episodes)
+
+        for (episode, _), outcome in zip(episodes, outcomes):
+            if outcome is True:
+                counters[(Season, episode.season_id.ref.id, "episode_count")] += 1
+        return outcomes
+
+    @staticmethod
+    async def _write_counters(counters: Dict[Tuple[Type[Document], Any, str], int]):
+        # model -> document id -> {field: amount}
+        increments: Dict[Type[Document], Dict[Any, Dict[str, int]]] = defaultdict(lambda: defaultdict(dict))
+        for (model, document_id, field), amount in counters.items():
+            if amount:
+                increments[model][document_id][field] = amount
+
+        for model, documents in increments.items():
+            async with BulkWriter() as bulk_writer:
+                for document_id, fields in documents.items():
+                    await model.find_one({"_id": document_id}).update({"$inc": fields}, bulk_writer=bulk_writer)
+
+# Singleton instance
+import_writer = ImportWriter(settings.INGEST_WRITE_WINDOW, settings.INGEST_WRITE_BATCH)
@@ -11,13 +11,22 @@ from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.config import settings
-from app.models import AdminSettings, StorageChannel, Bundle, Series, Season, Episode, User
+from app.models import AdminSettings, StorageChannel, Bundle, Series, Season, Episode, User, UnsortedFile, WatchProgress
 from app.middlewares.auth import AuthMiddleware
 from app.utils.logging import logger, setup_logging
+from app.utils.http import init_http_client, close_http_client
+from app.streaming.lifecycle import start_streaming, stop_streaming
+from app.ingest.queue import import_queue
+from app.ingest.writer import import_writer
+from app.ingest.unsorted import record_unsorted
+from app.utils.guessit_parser import MediaParser
+from app.search.engine import search_engine
+from app.webapp.progress import progress_buffer
+from app.migrations import run_migrations
 
 # Import Routers
 from app.webapp.routes import router as webapp_router
-from app.handlers import user_commands, channel_post
+from app.handlers import user_commands, channel_post, batch_import
 
 # --- Global Instances ---
 bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
@@ -36,6 +45,8 @@ async def init_db():
             logger.warning("No default database in URI, using 'tsn_bot'")
             db = mongo_client.get_database("tsn_bot")
 
+        await run_migrations(db)
+
         await init_beanie(
             database=db,
             document_models=[
@@ -45,7 +56,9 @@ async def init_db():
                 Series,
                 Season,
                 Episode,
-                User
+                User,
+                UnsortedFile,
+                WatchProgress
             ]
         )
         logger.info("✅ MongoDB Connection & Beanie Initialized Successfully")
@@ -72,6 +85,11 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting TSN Bot Application...")
     await init_db()
+    await init_http_client()
+    await start_streaming()
+    await import_queue.start(batch_import.process_new_file, on_give_up=record_unsorted)
+    await search_engine.start()
+    await progress_buffer.start()
 
     # Register Bot Routers
     dp.include_router(user_commands.router)
@@ -97,6 +115,14 @@ async def lifespan(app: FastAPI):
     if bot.session:
         await bot.session.close()
 
+    await progress_buffer.close()
+    await search_engine.close()
+    await import_queue.close()
+    await import_writer.close()
+    MediaParser.shutdown()
+    await stop_streaming()
+    await close_http_client()
+
 async def start_bot_polling():
     # Drop pending updates to avoid flooding on restart
     await bot.delete_webhook(drop_pending_updates=True)
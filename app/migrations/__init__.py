@@ -0,0 +1,30 @@
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.migrations import (
+    m0001_unique_seasons, m0002_unique_episode_files, m0003_episode_season_number, m0004_watch_progress,
+)
+
+logger = logging.getLogger(__name__)
+
+# Applied in order, each exactly once (recorded in the "migrations" collection).
+# They run before init_beanie, so they may fix data that new indexes depend on.
+MIGRATIONS: List[Tuple[str, Callable[[AsyncIOMotorDatabase], Awaitable[None]]]] = [
+    ("0001_unique_seasons", m0001_unique_seasons.migrate),
+    ("0002_unique_episode_files", m0002_unique_episode_files.migrate),
+    ("0003_episode_season_number", m0003_episode_season_number.migrate),
+    ("0004_watch_progress", m0004_watch_progress.migrate),
+]
+
+async def run_migrations(db: AsyncIOMotorDatabase):
+    applied = {doc["_id"] async for doc in db.migrations.find({}, {"_id": 1})}
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        logger.info(f"Applying migration {name}...")
+        await migrate(db)
+        await db.migrations.insert_one({"_id": name, "applied_at": datetime.utcnow()})
+        logger.info(f"Migration {name} applied")
@@ -0,0 +1,41 @@
+"""
+Merges duplicate seasons before the unique (series_id, season_number) index is built.
+Concurrent imports used to create one Season per file. The oldest season is
+kept, episodes of the duplicates are moved to it and its episode_count is recounted.
+"""
+import logging
+
+from bson import DBRef
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+OLD_INDEX = "series_id_1_season_number_1"
+
+async def migrate(db: AsyncIOMotorDatabase):
+    duplicates = db.seasons.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {"series_id": "$series_id", "season_number": "$season_number"},
+            "ids": {"$push": "$_id"},
+        }},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ])
+
+    merged = 0
+    async for group in duplicates:
+        keep, *extra = group["ids"]
+        await db.episodes.update_many(
+            {"season_id": {"$in": [DBRef("seasons", season_id) for season_id in extra]}},
+            {"$set": {"season_id": DBRef("seasons", keep)}},
+        )
+        count = await db.episodes.count_documents({"season_id": DBRef("seasons", keep)})
+        await db.seasons.update_one({"_id": keep}, {"$set": {"episode_count": count}})
+        await db.seasons.delete_many({"_id": {"$in": extra}})
+        merged += len(extra)
+    logger.info(f"Merged {merged} duplicate seasons")
+
+    # The old non-unique index has the same keys: drop it so the unique one can be created
+    indexes = await db.seasons.index_information()
+    if OLD_INDEX in indexes and not indexes[OLD_INDEX].get("unique"):
+        await db.seasons.drop_index(OLD_INDEX)
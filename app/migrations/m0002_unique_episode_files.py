@@ -0,0 +1,32 @@
+"""
+Removes episodes imported twice before the unique file_unique_id index is built.
+The oldest copy is kept, the episode_count of the seasons of removed copies is decreased.
+"""
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+OLD_INDEX = "file_unique_id_1"
+
+async def migrate(db: AsyncIOMotorDatabase):
+    duplicates = db.episodes.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$file_unique_id", "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ])
+
+    removed = 0
+    async for group in duplicates:
+        extra = group["ids"][1:]
+        async for episode in db.episodes.find({"_id": {"$in": extra}}, {"season_id": 1}):
+            if episode.get("season_id"):
+                await db.seasons.update_one({"_id": episode["season_id"].id}, {"$inc": {"episode_count": -1}})
+        await db.episodes.delete_many({"_id": {"$in": extra}})
+        removed += len(extra)
+    logger.info(f"Removed {removed} duplicate episodes")
+
+    indexes = await db.episodes.index_information()
+    if OLD_INDEX in indexes and not indexes[OLD_INDEX].get("unique"):
+        await db.episodes.drop_index(OLD_INDEX)
@@ -0,0 +1,34 @@
+"""
+Copies season_number from the season onto every episode (listing sorts by it)
+and drops the old (series_id, season_id, episode_number) index, which sorted by
+season ObjectId. Its replacement "series_listing" is built by init_beanie.
+"""
+import logging
+
+from bson import DBRef
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateMany
+
+logger = logging.getLogger(__name__)
+
+OLD_INDEX = "series_id_1_season_id_1_episode_number_1"
+BATCH_SIZE = 500
+
+async def migrate(db: AsyncIOMotorDatabase):
+    updated = 0
+    operations = []
+    async for season in db.seasons.find({}, {"season_number": 1}):
+        operations.append(UpdateMany(
+            {"season_id": DBRef("seasons", season["_id"])},
+            {"$set": {"season_number": season["season_number"]}},
+        ))
+        if len(operations) >= BATCH_SIZE:
+            updated += (await db.episodes.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await db.episodes.bulk_write(operations, ordered=False)).modified_count
+    logger.info(f"Set season_number on {updated} episodes")
+
+    indexes = await db.episodes.index_information()
+    if OLD_INDEX in indexes:
+        await db.episodes.drop_index(OLD_INDEX)
@@ -0,0 +1,43 @@
+"""
+Moves User.watch_progress ({episode_id: share watched}) into the watch_progress
+collection, one document per (user, episode), and removes it from the users.
+Old clients only sent the share watched: it is stored as position with a
+duration of 1. Documents already there (written since) are not overwritten.
+"""
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+async def migrate(db: AsyncIOMotorDatabase):
+    moved = 0
+    operations = []
+    # No timestamps were kept: everything counts as watched at migration time
+    now = datetime.utcnow()
+    query = {"watch_progress": {"$exists": True, "$ne": {}}}
+    async for user in db.users.find(query, {"telegram_id": 1, "watch_progress": 1}):
+        for episode_id, progress in (user.get("watch_progress") or {}).items():
+            try:
+                episode_id = ObjectId(episode_id)
+            except InvalidId:
+                continue
+            operations.append(UpdateOne(
+                {"user_id": user["telegram_id"], "episode_id": episode_id},
+                {"$setOnInsert": {"position": float(progress), "duration": 1.0, "updated_at": now}},
+                upsert=True,
+            ))
+        if len(operations) >= BATCH_SIZE:
+            moved += (await db.watch_progress.bulk_write(operations, ordered=False)).upserted_count
+            operations = []
+    if operations:
+        moved += (await db.watch_progress.bulk_write(operations, ordered=False)).upserted_count
+    logger.info(f"Moved {moved} watch progress entries")
+
+    await db.users.update_many({"watch_progress": {"$exists": True}}, {"$unset": {"watch_progress": ""}})
@@ -1,8 +1,9 @@
 import os
-from typing import Optional, List, Dict
+from typing import Optional, List
 from datetime import datetime
-from pydantic import Field
-from beanie import Document, Indexed, Link
+from pydantic import BaseModel, Field
+from beanie import Document, Indexed, Link, PydanticObjectId
+from pymongo import IndexModel
 
 class AdminSettings(Document):
     """
@@ -67,6 +68,10 @@ class Series(Document):
 
     class Settings:
         name = "series"
+        indexes = [
+            # Series of a bundle by name (paginated on name, _id)
+            IndexModel([("bundle_id", 1), ("name", 1), ("_id", 1)], name="bundle_listing")
+        ]
 
 class Season(Document):
     """
@@ -82,9 +87,9 @@ class Season(Document):
 
     class Settings:
         name = "seasons"
-        # Compound index for fast lookup of a specific season in a series
+        # One season per number and series: concurrent imports upsert into it
         indexes = [
-            [("series_id", 1), ("season_number", 1)]
+            IndexModel([("series_id", 1), ("season_number", 1)], unique=True, name="series_season_unique")
         ]
 
 class Episode(Document):
@@ -95,6 +100,7 @@ class Episode(Document):
     series_id: Link[Series]
     season_id: Link[Season]
 
+    season_number: Optional[int] = None  # Copy of Season.season_number, for sorting/listing
     episode_number: int
     name: str
     overview: Optional[str] = None
@@ -118,10 +124,30 @@ class Episode(Document):
     class Settings:
         name = "episodes"
         indexes = [
-            [("series_id", 1), ("season_id", 1), ("episode_number", 1)],
-            "file_unique_id"
+            # Covers the episode list of a series (EpisodeListItem, sorted by season/episode)
+            IndexModel(
+                [("series_id", 1), ("season_number", 1), ("episode_number", 1),
+                 ("_id", 1), ("name", 1), ("still_path", 1), ("runtime", 1), ("file_unique_id", 1)],
+                name="series_listing"
+            ),
+            # Deduplicates imports (see app/ingest/writer.py)
+            IndexModel([("file_unique_id", 1)], unique=True, name="file_unique_id_unique")
         ]
 
+class EpisodeListItem(BaseModel):
+    """
+    Projection of Episode for episode lists: only what the WebApp shows and
+    needs to play it. Every field is in the "series_listing" index, so a
+    listing is answered from the index alone.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    season_number: Optional[int] = None
+    episode_number: int
+    name: str
+    still_path: Optional[str] = None
+    runtime: Optional[int] = None
+    file_unique_id: str
+
 class User(Document):
     """
     Represents a Bot User.
@@ -135,12 +161,64 @@ class User(Document):
     is_banned: bool = False
     joined_at: datetime = Field(default_factory=datetime.utcnow)
 
-    # Watch History & Progress
-    # stored as {episode_id_str: timestamp_seconds}
-    watch_progress: Dict[str, float] = {}
+    # Watch progress is in its own collection (WatchProgress)
 
     # Stats
     total_watch_time: int = 0 # in seconds
 
     class Settings:
         name = "users"
+
+class WatchProgress(Document):
+    """
+    How far a user got in an episode. Written by app/webapp/progress.py with
+    upserts on (user_id, episode_id), never loaded and saved as a whole.
+    """
+    user_id: int  # User.telegram_id
+    episode_id: PydanticObjectId
+    position: float = 0.0  # Seconds played
+    duration: Optional[float] = None  # Seconds, if the player knew it
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @property
+    def progress(self) -> float:
+        """Share of the episode watched (0.0 - 1.0)."""
+        if not self.duration:
+            return 0.0
+        return min(max(self.position / self.duration, 0.0), 1.0)
+
+    class Settings:
+        name = "watch_progress"
+        indexes = [
+            IndexModel([("user_id", 1), ("episode_id", 1)], unique=True, name="user_episode_unique"),
+            # Continue watching: most recent first (paginated on updated_at, _id)
+            IndexModel([("user_id", 1), ("updated_at", -1), ("_id", -1)], name="user_recent"),
+        ]
+
+class UnsortedFile(Document):
+    """
+    A channel file the import could not place (no title parsed, no TMDB match,
+    or still failing after all retries). Keeps the message/file references so an
+    admin can fix it up and re-run it (see app/ingest/unsorted.py).
+    """
+    file_unique_id: str = Indexed(unique=True)
+    channel_id: int
+    message_id: int
+    bundle_id: str
+    file_id: str
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+
+    reason: str  # unparsed, no_match, no_bundle, failed
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "unsorted_files"
+        indexes = [
+            # Most recently failed first (paginated on updated_at, _id)
+            IndexModel([("updated_at", -1), ("_id", -1)], name="recent")
+        ]
@@ -0,0 +1 @@
+# Search over series and episodes: in-memory index kept in sync with MongoDB
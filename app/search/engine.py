@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.config import settings
+from app.models import Episode, Series
+from app.search.index import SearchDocument, SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Documents read from MongoDB / indexed per batch (the event loop is yielded between batches)
+LOAD_BATCH = 5000
+# Re-read documents created up to this long before the last refresh: ObjectIds
+# come from the clients' clocks and inserts of concurrent writers interleave
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+SERIES_PROJECTION = {"name": 1, "overview": 1, "poster_path": 1}
+EPISODE_PROJECTION = {
+    "series_id": 1, "season_number": 1, "episode_number": 1, "name": 1,
+    "overview": 1, "still_path": 1, "file_unique_id": 1,
+}
+
+class SearchEngine:
+    """
+    Full-text and prefix search over series and episodes.
+
+    The index lives in memory (see SearchIndex) and is built from MongoDB in
+    the background at startup. New series and episodes (imports) are added
+    every `refresh_interval` seconds by reading only documents created since
+    the last refresh (_id range, served by the _id index). Every
+    `rebuild_interval` seconds a fresh index is built and swapped in, which
+    picks up renamed or backfilled documents and drops deleted ones.
+    Until the first build is done, series names are searched in MongoDB.
+    """
+
+    def __init__(self, refresh_interval: float, rebuild_interval: float, max_results: int):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.max_results = max_results
+        self.index = SearchIndex()
+        self.ready = False
+        self._series: Dict[str, SearchDocument] = {}
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        built_at: Optional[float] = None
+        while True:
+            try:
+                if built_at is None or time.monotonic() - built_at >= self.rebuild_interval:
+                    await self.rebuild()
+                    built_at = time.monotonic()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Search index update failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def rebuild(self):
+        """Builds a new index from all series and episodes and swaps it in."""
+        started = time.perf_counter()
+        synced_at = datetime.now(timezone.utc)
+        series, documents = await self._read({}, {}, lambda key: False)
+        # Display order: equally scored results are listed in document order
+        documents.sort(key=lambda item: (
+            item[0].kind != "series", item[0].series_name.casefold(), item[0].series_id,
+            item[0].season_number or 0, item[0].episode_number or 0,
+        ))
+        index = SearchIndex()
+        for start in range(0, len(documents), LOAD_BATCH):
+            index.bulk_load(documents[start:start + LOAD_BATCH])
+            await asyncio.sleep(0)
+        self.index, self._series, self._synced_at = index, series, synced_at
+        self.ready = True
+        logger.info(f"Search index built: {len(index)} documents in {time.perf_counter() - started:.1f}s")
+
+    async def refresh(self):
+        """Adds series and episodes created since the last refresh."""
+        if self._synced_at is None:
+            await self.rebuild()
+            return
+        synced_at = datetime.now(timezone.utc)
+        query = {"_id": {"$gte": ObjectId.from_datetime(self._synced_at - REFRESH_OVERLAP)}}
+        _, documents = await self._read(query, self._series, self.index.__contains__)
+        self.index.bulk_load(documents)
+        self._synced_at = synced_at
+        if documents:
+            logger.info(f"Search index: {len(documents)} new documents")
+
+    async def _read(
+        self, query: Dict, series: Dict[str, SearchDocument], indexed: Callable[[Tuple[str, str]], bool]
+    ) -> Tuple[Dict[str, SearchDocument], List[Tuple[SearchDocument, Optional[str]]]]:
+        """
+        Reads the series and episodes matching `query` that are not `indexed`
+        as (document, overview) pairs. New series are added to `series`.
+        """
+        documents = []
+        async for batch in self._batches(Series, query, SERIES_PROJECTION):
+            for doc in batch:
+                if indexed(("series", str(doc["_id"]))):
+                    continue
+                document = self._series_document(doc)
+                series[document.id] = document
+                documents.append((document, doc.get("overview")))
+
+        async for batch in self._batches(Episode, query, EPISODE_PROJECTION):
+            for doc in batch:
+                if indexed(("episode", str(doc["_id"]))):
+                    continue
+                parent = series.get(str(doc["series_id"].id))
+                if parent is None:
+                    continue  # Series deleted (or created after the series pass): next refresh
+                documents.append((self._episode_document(doc, parent), doc.get("overview")))
+        return series, documents
+
+    @staticmethod
+    async def _batches(model, query: Dict, projection: Dict) -> AsyncIterator[List[Dict]]:
+        cursor = model.get_motor_collection().find(query, projection, batch_size=LOAD_BATCH)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == LOAD_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _series_document(doc: Dict) -> SearchDocument:
+        series_id = str(doc["_id"])
+        return SearchDocument(
+            kind="series",
+            id=series_id,
+            name=doc.get("name") or "",
+            series_id=series_id,
+            series_name=doc.get("name") or "",
+            image_path=doc.get("poster_path"),
+            overview=doc.get("overview"),
+        )
+
+    @staticmethod
+    def _episode_document(doc: Dict, series: SearchDocument) -> SearchDocument:
+        return SearchDocument(
+            kind="episode",
+            id=str(doc["_id"]),
+            name=doc.get("name") or "",
+            series_id=series.id,
+            series_name=series.name,
+            image_path=doc.get("still_path"),
+            season_number=doc.get("season_number"),
+            episode_number=doc.get("episode_number"),
+            file_unique_id=doc.get("file_unique_id"),
+        )
+
+    async def search(self, query: str, offset: int, limit: int) -> Dict:
+        """
+        A page of results, best first. Only the best `max_results` matches can
+        be paged through; `total` is the number of matches.
+        """
+        offset = min(offset, self.max_results)
+        end = min(offset + limit, self.max_results)
+        if end <= offset:
+            results, total = [], 0
+        elif self.ready:
+            matches, total = self.index.search(query, end)
+            results = [document.to_result(score) for score, document in matches[offset:end]]
+        else:
+            results, total = await self._search_series_names(query, offset, end - offset)
+        return {"results": results, "total": total, "offset": offset, "limit": limit}
+
+    @staticmethod
+    async def _search_series_names(query: str, offset: int, limit: int) -> Tuple[List[Dict], int]:
+        """Fallback while the index is being built."""
+        collection = Series.get_motor_collection()
+        mongo_query = {"name": {"$regex": re.escape(query), "$options": "i"}}
+        total = await collection.count_documents(mongo_query)
+        cursor = collection.find(mongo_query, SERIES_PROJECTION).sort("name", 1).skip(offset).limit(limit)
+        results = [SearchEngine._series_document(doc).to_result(0.0) async for doc in cursor]
+        return results, total
+
+# Singleton instance
+search_engine = SearchEngine(
+    settings.SEARCH_REFRESH_INTERVAL,
+    settings.SEARCH_REBUILD_INTERVAL,
+    settings.SEARCH_MAX_RESULTS,
+)
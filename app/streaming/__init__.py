@@ -0,0 +1 @@
+# Internals of the streaming proxy behind /webapp/stream
@@ -0,0 +1,297 @@
+import anyio
+import asyncio
+import httpx
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.streaming.telegram import TelegramFile, file_path_cache, open_file_stream
+
+logger = logging.getLogger(__name__)
+
+# Read size for files on a local disk (self-hosted Bot API in --local mode)
+LOCAL_READ_SIZE = 256 * 1024
+
+# Retries of a part that failed before delivering any byte
+PART_RETRIES = 2
+
+class UpstreamError(Exception):
+    """
+    Telegram did not deliver the requested bytes.
+    """
+
+class _Part:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+class DownloadBackend(ABC):
+    """
+    Where the streaming proxy gets file bytes from.
+    Subclasses resolve a Bot API file_id and fetch single aligned parts, this
+    class turns that into a parallel download of any byte range: up to
+    `concurrency` parts are in flight, bytes are yielded in order as soon as
+    they arrive.
+    """
+
+    part_size = 1024 * 1024
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def resolve(self, file_id: str) -> Optional[TelegramFile]:
+        """
+        The file behind a Bot API file_id, None if it cannot be found.
+        """
+
+    @abstractmethod
+    def fetch_part(self, tg_file: TelegramFile, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        Yields bytes [start, end]. `start` is a multiple of part_size and the
+        range never crosses a part boundary.
+        """
+
+    async def iter_range(self, tg_file: TelegramFile, start: int, end: int) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Yields (offset, chunk) pairs covering bytes [start, end] in order.
+        """
+        first = start // self.part_size
+        last = end // self.part_size
+        parts: Dict[int, _Part] = {}
+        next_part = first
+
+        try:
+            for index in range(first, last + 1):
+                # Keep `concurrency` parts downloading ahead (including this one)
+                while next_part <= last and next_part < index + self.concurrency:
+                    part = _Part()
+                    part.task = asyncio.create_task(self._fill(part, tg_file, next_part))
+                    parts[next_part] = part
+                    next_part += 1
+
+                part = parts[index]
+                offset = index * self.part_size
+                consumed = 0
+                while True:
+                    if consumed < len(part.chunks):
+                        chunk = part.chunks[consumed]
+                        consumed += 1
+                        chunk_start = offset
+                        offset += len(chunk)
+                        lo = max(start, chunk_start)
+                        hi = min(end + 1, offset)
+                        if lo < hi:
+                            yield lo, chunk if (lo == chunk_start and hi == offset) else chunk[lo - chunk_start:hi - chunk_start]
+                        continue
+                    if part.done:
+                        if part.error:
+                            raise part.error
+                        break
+                    part.changed.clear()
+                    await part.changed.wait()
+                del parts[index]
+        finally:
+            for part in parts.values():
+                part.task.cancel()
+
+    async def _fill(self, part: _Part, tg_file: TelegramFile, index: int):
+        part_start = index * self.part_size
+        part_end = min(part_start + self.part_size, tg_file.file_size) - 1
+        try:
+            for attempt in range(PART_RETRIES + 1):
+                try:
+                    async for chunk in self.fetch_part(tg_file, part_start, part_end):
+                        part.chunks.append(chunk)
+                        part.changed.set()
+                    break
+                except (UpstreamError, httpx.HTTPError, OSError, asyncio.TimeoutError) as e:
+                    if part.chunks or attempt == PART_RETRIES:
+                        raise
+                    logger.info(f"Part {index} of {tg_file.file_unique_id} failed ({e}), retrying")
+                    await asyncio.sleep(0.5 * (attempt + 1))
+
+            received = sum(len(c) for c in part.chunks)
+            if received != part_end - part_start + 1:
+                raise UpstreamError(f"Part {index} of {tg_file.file_unique_id} is incomplete ({received} bytes)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            part.error = e if isinstance(e, UpstreamError) else UpstreamError(str(e))
+        finally:
+            part.done = True
+            part.changed.set()
+
+class BotApiBackend(DownloadBackend):
+    """
+    Downloads through the Bot API at TELEGRAM_API_URL.
+    The cloud API refuses getFile above 20 MB, a self-hosted telegram-bot-api
+    server does not. In --local mode that server returns absolute file paths,
+    which are read from disk (shared volume, see TELEGRAM_LOCAL_FILES_DIR).
+    """
+
+    def __init__(self, concurrency: int, part_size: int):
+        super().__init__(concurrency)
+        self.part_size = part_size
+
+    async def resolve(self, file_id: str) -> Optional[TelegramFile]:
+        return await file_path_cache.get(file_id)
+
+    @staticmethod
+    def local_path(tg_file: TelegramFile) -> Optional[str]:
+        if not os.path.isabs(tg_file.file_path):
+            return None
+        if settings.TELEGRAM_LOCAL_FILES_DIR:
+            relative = os.path.relpath(tg_file.file_path, settings.TELEGRAM_LOCAL_SERVER_DIR)
+            return os.path.join(settings.TELEGRAM_LOCAL_FILES_DIR, relative)
+        return tg_file.file_path
+
+    async def fetch_part(self, tg_file: TelegramFile, start: int, end: int) -> AsyncIterator[bytes]:
+        if not tg_file.file_path:
+            # Built from our database (app/streaming/library.py), path not looked up yet
+            resolved = await file_path_cache.get(tg_file.file_id)
+            if resolved is None:
+                raise UpstreamError(f"Could not resolve {tg_file.file_id}")
+            tg_file = resolved
+
+        path = self.local_path(tg_file)
+        if path:
+            async for chunk in self._read_local(path, start, end):
+                yield chunk
+            return
+
+        _, upstream = await open_file_stream(tg_file.file_id, f"bytes={start}-{end}")
+        if upstream is None:
+            raise UpstreamError(f"Could not resolve {tg_file.file_id}")
+
+        try:
+            if upstream.status_code == 206:
+                pos = start
+            elif upstream.status_code == 200:
+                # Range ignored, the body starts at byte 0
+                pos = 0
+            else:
+                raise UpstreamError(f"Telegram returned {upstream.status_code} for {tg_file.file_id}")
+
+            async for chunk in upstream.aiter_raw():
+                chunk_start = pos
+                pos += len(chunk)
+                if pos <= start:
+                    continue
+                if chunk_start < start:
+                    chunk = chunk[start - chunk_start:]
+                    chunk_start = start
+                if pos > end + 1:
+                    chunk = chunk[:end + 1 - chunk_start]
+                yield chunk
+                if pos > end:
+                    return
+        finally:
+            with anyio.CancelScope(shield=True):
+                await upstream.aclose()
+
+    @staticmethod
+    async def _read_local(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+        fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+        try:
+            pos = start
+            while pos <= end:
+                chunk = await asyncio.to_thread(os.pread, fd, min(LOCAL_READ_SIZE, end + 1 - pos), pos)
+                if not chunk:
+                    break
+                pos += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+class MTProtoBackend(DownloadBackend):
+    """
+    Downloads over MTProto with the bot account (no file size limit).
+    Requires the optional `pyrogram` package and TELEGRAM_API_ID / TELEGRAM_API_HASH.
+    MTProto serves files in 1 MiB aligned parts, which is our part size.
+    """
+
+    part_size = 1024 * 1024
+
+    def __init__(self, concurrency: int):
+        super().__init__(concurrency)
+        self.client = None
+        self._files: "OrderedDict[str, TelegramFile]" = OrderedDict()
+
+    async def start(self):
+        try:
+            from pyrogram import Client
+        except ImportError:
+            raise RuntimeError("STREAM_BACKEND=mtproto requires the 'pyrogram' package")
+
+        if not settings.TELEGRAM_API_ID or not settings.TELEGRAM_API_HASH:
+            raise RuntimeError("STREAM_BACKEND=mtproto requires TELEGRAM_API_ID and TELEGRAM_API_HASH")
+
+        self.client = Client(
+            "tsn_stream",
+            api_id=settings.TELEGRAM_API_ID,
+            api_hash=settings.TELEGRAM_API_HASH,
+            bot_token=settings.BOT_TOKEN,
+            in_memory=True,
+            no_updates=True,
+        )
+        await self.client.start()
+        logger.info("MTProto streaming backend connected")
+
+    async def stop(self):
+        if self.client:
+            await self.client.stop()
+            self.client = None
+
+    async def resolve(self, file_id: str) -> Optional[TelegramFile]:
+        cached = self._files.get(file_id)
+        if cached:
+            self._files.move_to_end(file_id)
+            return cached
+
+        from app.models import Episode
+
+        # MTProto does not tell the size up front, it was stored at import time
+        # (with the file_unique_id Telegram reported for the message's media)
+        episode = await Episode.find_one(Episode.file_id == file_id)
+        if not episode:
+            return None
+
+        tg_file = TelegramFile(
+            file_id=file_id,
+            file_unique_id=episode.file_unique_id,
+            file_path="",
+            file_size=episode.file_size,
+        )
+        self._files[file_id] = tg_file
+        while len(self._files) > settings.FILE_PATH_CACHE_SIZE:
+            self._files.popitem(last=False)
+        return tg_file
+
+    async def fetch_part(self, tg_file: TelegramFile, start: int, end: int) -> AsyncIterator[bytes]:
+        # stream_media counts offset and limit in 1 MiB chunks
+        async for chunk in self.client.stream_media(tg_file.file_id, offset=start // self.part_size, limit=1):
+            yield chunk[:end + 1 - start]
+            return
+
+def create_backend() -> DownloadBackend:
+    if settings.STREAM_BACKEND == "mtproto":
+        return MTProtoBackend(settings.STREAM_DOWNLOAD_CONCURRENCY)
+    if settings.STREAM_BACKEND != "bot_api":
+        raise ValueError(f"Unknown STREAM_BACKEND '{settings.STREAM_BACKEND}'")
+    return BotApiBackend(settings.STREAM_DOWNLOAD_CONCURRENCY, settings.STREAM_DOWNLOAD_PART_SIZE)
+
+# Singleton instance
+download_backend = create_backend()
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.streaming.backends import DownloadBackend, UpstreamError
+from app.streaming.segment_cache import SegmentCache
+from app.streaming.telegram import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+class Lagged(Exception):
+    """
+    A subscriber fell too far behind a shared transfer, the data it needs was
+    already released from memory. It should resume from the disk cache or a new transfer.
+    """
+
+def segment_length(segment: int, segment_size: int, file_size: int) -> int:
+    return min(segment_size, file_size - segment * segment_size)
+
+class Subscriber:
+    """
+    Read cursor of one consumer on a shared transfer.
+    """
+
+    def __init__(self, segment: int, segment_size: int):
+        self.segment = segment
+        self.index = 0                          # Next chunk of `segment`
+        self.offset = segment * segment_size    # File offset of that chunk
+
+class Transfer:
+    """
+    One upstream download of segments [first, last] of a file, shared by every
+    viewer that needs those segments at the same time.
+
+    Chunks are kept per segment in memory. Each subscriber reads them at its own
+    pace, the download runs at the pace of the fastest one (at most `window`
+    segments ahead of it). Segments further behind are released, a subscriber that
+    still needed them gets Lagged and resumes elsewhere, so a slow client never
+    stalls the others. Complete segments are written to the disk cache.
+    The download is cancelled as soon as nobody is subscribed anymore.
+    """
+
+    def __init__(self, hub: "UpstreamHub", tg_file: TelegramFile, first: int, last: int):
+        self.hub = hub
+        self.tg_file = tg_file
+        self.first = first
+        self.last = last
+        self.head = first            # Segment currently being downloaded
+        self.done = False
+        self.cancelling = False
+        self.error: Optional[BaseException] = None
+
+        self._chunks: Dict[int, List[bytes]] = {first: []}
+        self._filled: Dict[int, int] = {first: 0}
+        self._subscribers: Set[Subscriber] = set()
+        self._data = asyncio.Event()      # New chunks (or end)
+        self._progress = asyncio.Event()  # A subscriber moved on
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def can_serve(self, segment: int) -> bool:
+        if self.error or self.cancelling or not (self.first <= segment <= self.last):
+            return False
+        return segment in self._chunks or (segment >= self.head and not self.done)
+
+    def subscribe(self, segment: int) -> Subscriber:
+        subscriber = Subscriber(segment, self.hub.cache.segment_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        self._progress.set()
+        if not self._subscribers and not self.done and self._task:
+            # Nobody is listening anymore: stop downloading right away
+            self.cancelling = True
+            self._task.cancel()
+
+    async def read(self, subscriber: Subscriber, last: int) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Yields (offset, chunk) for the subscriber up to the end of segment `last`
+        (or the end of this transfer, whichever comes first).
+        """
+        last = min(last, self.last)
+        while subscriber.segment <= last:
+            segment = subscriber.segment
+            chunks = self._chunks.get(segment)
+            if chunks is None:
+                if segment < self.head or self.done:
+                    raise Lagged(f"{self.tg_file.file_unique_id}/{segment}")
+                await self._wait_for_data()
+                continue
+
+            if subscriber.index < len(chunks):
+                chunk = chunks[subscriber.index]
+                offset = subscriber.offset
+                subscriber.index += 1
+                subscriber.offset += len(chunk)
+                yield offset, chunk
+                continue
+
+            if segment < self.head:
+                # Segment complete, move on
+                subscriber.segment += 1
+                subscriber.index = 0
+                self._progress.set()
+                continue
+
+            if self.done:
+                raise self.error or UpstreamError(f"Transfer of {self.tg_file.file_unique_id} stopped early")
+            await self._wait_for_data()
+
+    async def _wait_for_data(self):
+        self._data.clear()
+        await self._data.wait()
+
+    def _fastest(self) -> int:
+        return max((s.segment for s in self._subscribers), default=self.head)
+
+    async def _run(self):
+        cache = self.hub.cache
+        segment_size = cache.segment_size
+        file_size = self.tg_file.file_size
+        fetch_end = min((self.last + 1) * segment_size, file_size) - 1
+        try:
+            async for offset, chunk in self.hub.backend.iter_range(self.tg_file, self.first * segment_size, fetch_end):
+                while chunk:
+                    segment = offset // segment_size
+                    missing = segment_length(segment, segment_size, file_size) - self._filled[segment]
+                    piece = chunk if len(chunk) <= missing else chunk[:missing]
+                    self._chunks[segment].append(piece)
+                    self._filled[segment] += len(piece)
+                    offset += len(piece)
+                    chunk = chunk[len(piece):]
+
+                    if len(piece) == missing:
+                        cache.store_later(self.tg_file.file_unique_id, segment, b"".join(self._chunks[segment]))
+                        self.head = segment + 1
+                        if self.head <= self.last:
+                            self._chunks[self.head] = []
+                            self._filled[self.head] = 0
+                        self._release_old()
+                self._data.set()
+
+                # Stay at most `window` segments ahead of the fastest subscriber
+                while self.head - self._fastest() >= self.hub.window:
+                    self._progress.clear()
+                    await self._progress.wait()
+        except asyncio.CancelledError:
+            self.error = UpstreamError("Transfer cancelled")
+        except Exception as e:
+            logger.warning(f"Upstream transfer of {self.tg_file.file_unique_id} failed: {e}")
+            self.error = e
+        finally:
+            self.done = True
+            self._data.set()
+            self.hub._forget(self)
+
+    def _release_old(self):
+        # Keep `window` complete segments behind the download head for slower subscribers
+        for segment in [s for s in self._chunks if s < self.head - self.hub.window]:
+            del self._chunks[segment]
+            del self._filled[segment]
+
+class UpstreamHub:
+    """
+    Coalesces concurrent upstream downloads per (file_unique_id, segment).
+    A viewer needing a segment that is already being downloaded attaches to that
+    transfer instead of opening its own (e.g. several viewers starting the same
+    new episode on release night).
+    """
+
+    def __init__(self, backend: DownloadBackend, cache: SegmentCache, window: int):
+        self.backend = backend
+        self.cache = cache
+        self.window = window
+        self._transfers: Dict[str, List[Transfer]] = {}
+
+    def _find(self, file_unique_id: str, segment: int) -> Optional[Transfer]:
+        for transfer in self._transfers.get(file_unique_id, []):
+            if transfer.can_serve(segment):
+                return transfer
+        return None
+
+    def _start(self, tg_file: TelegramFile, first: int, last: int) -> Transfer:
+        # Stop where another transfer already covers the following segments
+        end = first
+        while end < last and self._find(tg_file.file_unique_id, end + 1) is None:
+            end += 1
+        transfer = Transfer(self, tg_file, first, end)
+        self._transfers.setdefault(tg_file.file_unique_id, []).append(transfer)
+        transfer.start()
+        return transfer
+
+    def _forget(self, transfer: Transfer):
+        transfers = self._transfers.get(transfer.tg_file.file_unique_id)
+        if transfers and transfer in transfers:
+            transfers.remove(transfer)
+            if not transfers:
+                del self._transfers[transfer.tg_file.file_unique_id]
+
+    async def stream(self, tg_file: TelegramFile, first: int, last: int) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Yields (offset, chunk) for segments [first, last], joining in-flight
+        transfers where possible and starting new ones for the rest.
+        Raises Lagged if this consumer falls too far behind a shared transfer.
+        """
+        segment = first
+        while segment <= last:
+            transfer = self._find(tg_file.file_unique_id, segment) or self._start(tg_file, segment, last)
+            subscriber = transfer.subscribe(segment)
+            try:
+                async with aclosing(transfer.read(subscriber, last)) as chunks:
+                    async for item in chunks:
+                        yield item
+            finally:
+                transfer.unsubscribe(subscriber)
+            segment = subscriber.segment
+
+# Singleton instance (needs the segment cache, None when disabled)
+upstream_hub: Optional[UpstreamHub] = None
+if settings.STREAM_CACHE_MAX_BYTES > 0:
+    from app.streaming.backends import download_backend
+    from app.streaming.segment_cache import segment_cache
+    upstream_hub = UpstreamHub(download_backend, segment_cache, max(1, settings.STREAM_COALESCE_WINDOW))
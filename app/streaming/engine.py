@@ -0,0 +1,99 @@
+import logging
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Tuple, Union
+
+from app.streaming.backends import DownloadBackend
+from app.streaming.coalesce import Lagged, UpstreamHub, segment_length
+from app.streaming.response import FileSlice
+from app.streaming.telegram import TelegramFile
+
+if TYPE_CHECKING:
+    from app.streaming.prefetch import ReadAheadStage
+
+logger = logging.getLogger(__name__)
+
+async def stream_range(
+    hub: UpstreamHub,
+    tg_file: TelegramFile,
+    start: int,
+    end: int,
+    stage: Optional["ReadAheadStage"] = None,
+) -> AsyncIterator[Union[bytes, memoryview, FileSlice]]:
+    """
+    Produces bytes [start, end] of a file.
+    Segments are looked up in the disk cache first, then in the read-ahead stage
+    of this viewer (if any). Each run of consecutive missing segments is fetched
+    through the upstream hub, which shares in-flight downloads between viewers
+    and writes complete segments to the cache. While read-ahead is active we only
+    fetch the segment being read, the stage downloads the ones after it.
+    """
+    cache = hub.cache
+    segment_size = cache.segment_size
+    file_unique_id = tg_file.file_unique_id
+    last_segment = end // segment_size
+    position = start  # Next byte to send
+
+    while position <= end:
+        segment = position // segment_size
+        seg_start = segment * segment_size
+        seg_end = min(end + 1, seg_start + segment_length(segment, segment_size, tg_file.file_size))
+
+        if stage:
+            stage.advance(segment)
+
+        cached = cache.open(file_unique_id, segment)
+        if cached:
+            yield FileSlice(cached, position - seg_start, seg_end - position)
+            position = seg_end
+            continue
+
+        if stage:
+            data = await stage.take(segment)
+            if data is not None:
+                yield memoryview(data)[position - seg_start:seg_end - seg_start]
+                position = seg_end
+                continue
+
+        run_end = segment
+        if not (stage and stage.sequential):
+            while run_end < last_segment and not cache.contains(file_unique_id, run_end + 1):
+                run_end += 1
+
+        try:
+            async with aclosing(hub.stream(tg_file, segment, run_end)) as chunks:
+                async for chunk_start, chunk in chunks:
+                    chunk_end = chunk_start + len(chunk)
+                    lo = max(position, chunk_start)
+                    hi = min(end + 1, chunk_end)
+                    if lo < hi:
+                        yield chunk if (lo == chunk_start and hi == chunk_end) else chunk[lo - chunk_start:hi - chunk_start]
+                        position = hi
+        except Lagged:
+            # Too slow for a shared transfer, continue from the cache or a new transfer
+            logger.debug(f"Stream of {file_unique_id} lagged at byte {position}, resuming")
+
+async def stream_direct(backend: DownloadBackend, tg_file: TelegramFile, start: int, end: int) -> AsyncIterator[bytes]:
+    """
+    Produces bytes [start, end] straight from the download backend (segment cache disabled).
+    """
+    async with aclosing(backend.iter_range(tg_file, start, end)) as chunks:
+        async for _, chunk in chunks:
+            yield chunk
+
+async def download_segments(hub: UpstreamHub, tg_file: TelegramFile, first: int, last: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Downloads segments [first, last] through the upstream hub, yielding (segment, data) as each completes.
+    """
+    segment_size = hub.cache.segment_size
+    segment = first
+    buffer = bytearray()
+    async with aclosing(hub.stream(tg_file, first, last)) as chunks:
+        async for _, chunk in chunks:
+            buffer += chunk
+            while segment <= last:
+                length = segment_length(segment, segment_size, tg_file.file_size)
+                if len(buffer) < length:
+                    break
+                yield segment, bytes(buffer[:length])
+                del buffer[:length]
+                segment += 1
@@ -0,0 +1,60 @@
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config import settings
+from app.models import Episode
+from app.streaming.telegram import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class StoredFile:
+    """
+    An imported file as recorded in our database: enough to answer a request
+    (length, validators) without asking Telegram.
+    """
+    tg_file: TelegramFile
+    mime_type: str
+    last_modified: datetime
+
+class StoredFileIndex:
+    """
+    In-process LRU of file_unique_id -> StoredFile.
+    Entries never go stale (the content behind a file_unique_id is immutable),
+    they are only evicted. Unknown ids are not cached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._files: "OrderedDict[str, StoredFile]" = OrderedDict()
+
+    async def get(self, file_unique_id: str) -> Optional[StoredFile]:
+        stored = self._files.get(file_unique_id)
+        if stored:
+            self._files.move_to_end(file_unique_id)
+            return stored
+
+        episode = await Episode.find_one(Episode.file_unique_id == file_unique_id)
+        if not episode or not episode.file_size:
+            return None
+
+        stored = StoredFile(
+            tg_file=TelegramFile(
+                file_id=episode.file_id,
+                file_unique_id=episode.file_unique_id,
+                file_path="",  # Looked up by the download backend when needed
+                file_size=episode.file_size,
+            ),
+            mime_type=episode.mime_type or "video/mp4",
+            last_modified=episode.created_at.replace(tzinfo=timezone.utc, microsecond=0),
+        )
+        self._files[file_unique_id] = stored
+        while len(self._files) > self.max_size:
+            self._files.popitem(last=False)
+        return stored
+
+# Singleton instance
+stored_files = StoredFileIndex(settings.FILE_PATH_CACHE_SIZE)
@@ -0,0 +1,21 @@
+from app.streaming.backends import download_backend
+from app.streaming.prefetch import read_ahead
+from app.streaming.segment_cache import segment_cache
+
+async def start_streaming():
+    """
+    Starts the background parts of the streaming proxy.
+    Requires the shared HTTP client (app.utils.http) to be initialized.
+    """
+    await download_backend.start()
+    if segment_cache:
+        await segment_cache.load()
+    if read_ahead:
+        read_ahead.start()
+
+async def stop_streaming():
+    if read_ahead:
+        await read_ahead.close()
+    if segment_cache:
+        await segment_cache.close()
+    await download_backend.stop()
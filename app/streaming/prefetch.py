@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.streaming.coalesce import UpstreamHub, segment_length
+from app.streaming.engine import download_segments
+from app.streaming.segment_cache import SegmentCache
+from app.streaming.telegram import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+# How often idle stages are looked for (seconds)
+JANITOR_INTERVAL = 5
+
+class PrefetchBudget:
+    """
+    Global limit on the memory held by read-ahead buffers of all active streams.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+
+    def reserve(self, size: int) -> bool:
+        if self.used_bytes + size > self.max_bytes:
+            return False
+        self.used_bytes += size
+        return True
+
+    def release(self, size: int):
+        self.used_bytes -= size
+
+class ReadAheadStage:
+    """
+    Read-ahead state of one viewer watching one file.
+    While the viewer reads sequentially, a background task keeps the next `depth`
+    segments after the current read position downloaded in memory (and writes
+    them to the disk cache). Downloads go through the upstream hub, so they are
+    shared with other viewers of the same file. A seek or an idle timeout cancels it.
+    """
+
+    def __init__(self, manager: "ReadAheadManager", tg_file: TelegramFile):
+        self.manager = manager
+        self.tg_file = tg_file
+        self.position = 0          # Segment the viewer is currently reading
+        self.sequential = False
+        self.readers = 0
+        self.last_active = time.monotonic()
+        self.cancelled = False
+
+        self._segments: Dict[int, bytes] = {}
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cache(self) -> SegmentCache:
+        return self.manager.cache
+
+    @property
+    def last_segment(self) -> int:
+        return (self.tg_file.file_size - 1) // self.cache.segment_size
+
+    def near(self, segment: int) -> bool:
+        # Continuing where the viewer left off, or inside the prefetched window
+        return self.position - 1 <= segment <= self.position + self.manager.depth
+
+    def advance(self, segment: int):
+        """
+        Called by the stream before it reads `segment`.
+        """
+        self.position = segment
+        self.last_active = time.monotonic()
+        for old in [s for s in self._segments if s < segment]:
+            self._drop(old)
+
+        if not self.sequential or self.cancelled:
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wake.set()
+
+    async def take(self, segment: int) -> Optional[bytes]:
+        """
+        Returns a prefetched segment, waiting for it if its download is under way.
+        Returns None if the segment is not (or no longer) part of the read-ahead.
+        """
+        future = self._pending.get(segment)
+        if future is not None:
+            await asyncio.shield(future)
+        if segment not in self._segments:
+            return None
+        data = self._segments[segment]
+        self._drop(segment)
+        return data
+
+    async def release(self):
+        self.readers -= 1
+        self.last_active = time.monotonic()
+
+    def cancel(self):
+        self.cancelled = True
+        if self._task:
+            self._task.cancel()
+        for segment in list(self._segments):
+            self._drop(segment)
+        self._resolve_pending()
+
+    def _resolve_pending(self, segments=None):
+        # Futures only signal "done", waiters then look into the buffer
+        for segment in list(self._pending if segments is None else segments):
+            future = self._pending.pop(segment, None)
+            if future and not future.done():
+                future.set_result(None)
+
+    def _drop(self, segment: int):
+        data = self._segments.pop(segment, None)
+        if data is not None:
+            self.manager.budget.release(len(data))
+
+    def _wanted(self) -> Optional[Tuple[int, int]]:
+        """
+        Next run of segments in the window (position, position + depth] that is
+        neither cached, buffered nor being downloaded, limited by the memory budget.
+        """
+        file_unique_id = self.tg_file.file_unique_id
+        window_end = min(self.position + self.manager.depth, self.last_segment)
+        first = None
+        last = None
+        for segment in range(self.position + 1, window_end + 1):
+            missing = (
+                segment not in self._segments
+                and segment not in self._pending
+                and not self.cache.contains(file_unique_id, segment)
+            )
+            if not missing:
+                if first is not None:
+                    break
+                continue
+            size = segment_length(segment, self.cache.segment_size, self.tg_file.file_size)
+            if not self.manager.budget.reserve(size):
+                break
+            if first is None:
+                first = segment
+            last = segment
+        if first is None:
+            return None
+        return first, last
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            wanted = self._wanted()
+            if wanted is None:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            first, last = wanted
+            reserved = set(range(first, last + 1))
+            for segment in reserved:
+                self._pending[segment] = loop.create_future()
+
+            try:
+                async for segment, data in download_segments(self.manager.hub, self.tg_file, first, last):
+                    reserved.discard(segment)
+                    self._segments[segment] = data
+                    self._resolve_pending([segment])
+                    if segment < self.position:
+                        # The viewer already went past it
+                        self._drop(segment)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Read-ahead of {self.tg_file.file_unique_id} failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                # Give back the budget of segments that were reserved but not delivered
+                for segment in reserved:
+                    self.manager.budget.release(segment_length(segment, self.cache.segment_size, self.tg_file.file_size))
+                self._resolve_pending(reserved)
+
+class ReadAheadManager:
+    """
+    Tracks one read-ahead stage per (viewer, file_unique_id).
+    """
+
+    def __init__(self, hub: UpstreamHub, depth: int, max_bytes: int, idle_timeout: float):
+        self.hub = hub
+        self.cache = hub.cache
+        self.depth = depth
+        self.idle_timeout = idle_timeout
+        self.budget = PrefetchBudget(max_bytes)
+        self._stages: Dict[Tuple[str, str], ReadAheadStage] = {}
+        self._janitor: Optional[asyncio.Task] = None
+
+    def begin(self, viewer: str, tg_file: TelegramFile, start: int, end: int) -> ReadAheadStage:
+        """
+        Registers a new range request and returns the viewer's stage for it.
+        A request far from the current position is a seek: the old read-ahead is cancelled.
+        """
+        key = (viewer, tg_file.file_unique_id)
+        segment_size = self.cache.segment_size
+        first = start // segment_size
+
+        stage = self._stages.get(key)
+        continues = stage is not None and stage.near(first)
+        if stage and not continues:
+            stage.cancel()
+            stage = None
+        if stage is None:
+            stage = ReadAheadStage(self, tg_file)
+            stage.position = first
+            self._stages[key] = stage
+
+        # Playback: a range running to the end of the file (players ask "bytes=N-") or
+        # one continuing the previous read. A bounded range elsewhere (e.g. a seek)
+        # does not start read-ahead, even if it spans several segments.
+        if continues or end == tg_file.file_size - 1:
+            stage.sequential = True
+
+        stage.readers += 1
+        stage.last_active = time.monotonic()
+        return stage
+
+    def start(self):
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._reap_idle())
+
+    async def close(self):
+        if self._janitor:
+            self._janitor.cancel()
+            self._janitor = None
+        for stage in self._stages.values():
+            stage.cancel()
+        self._stages.clear()
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(JANITOR_INTERVAL)
+            now = time.monotonic()
+            for key, stage in list(self._stages.items()):
+                if stage.readers <= 0 and now - stage.last_active > self.idle_timeout:
+                    stage.cancel()
+                    del self._stages[key]
+
+# Singleton instance (needs the segment cache, None when disabled)
+read_ahead: Optional[ReadAheadManager] = None
+if settings.STREAM_PREFETCH_SEGMENTS > 0 and settings.STREAM_CACHE_MAX_BYTES > 0:
+    from app.streaming.coalesce import upstream_hub
+    read_ahead = ReadAheadManager(
+        upstream_hub,
+        settings.STREAM_PREFETCH_SEGMENTS,
+        settings.STREAM_PREFETCH_MAX_BYTES,
+        settings.STREAM_PREFETCH_IDLE_TIMEOUT,
+    )
@@ -0,0 +1,83 @@
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+class RangeNotSatisfiable(Exception):
+    """
+    The requested Range lies outside of the file (HTTP 416).
+    """
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a `Range: bytes=...` header against a file of `size` bytes.
+    Returns the inclusive (start, end) pair, or None if the whole file should be
+    served (no header, multiple ranges or a syntax we ignore, as allowed by RFC 9110).
+    Raises RangeNotSatisfiable if the range does not overlap the file.
+    """
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+
+    return start, min(end, size - 1)
+
+def content_range(start: int, end: int, size: int) -> str:
+    return f"bytes {start}-{end}/{size}"
+
+def entity_tag(file_unique_id: str, size: int) -> str:
+    # Telegram never changes the content behind a file_unique_id: a strong validator
+    return f'"{file_unique_id}-{size:x}"'
+
+def _tags(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """
+    True if an `If-None-Match` header matches `etag` (weak comparison), i.e. the
+    client's copy is current and a 304 can be sent.
+    """
+    if not header:
+        return False
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in _tags(header))
+
+def if_range_allows(header: Optional[str], etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluates an `If-Range` header: True if the Range may be honoured, False if
+    the client's partial copy is stale and the full file must be sent.
+    Entity tags use the strong comparison, dates must match Last-Modified exactly.
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"'):
+        return header == etag
+    if header.startswith("W/") or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(header) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment, usegmt=True)
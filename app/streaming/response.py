@@ -0,0 +1,100 @@
+import anyio
+import mmap
+from dataclasses import dataclass
+from typing import Awaitable, BinaryIO, Callable, Sequence
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+# Size of the pieces a cached file is sent in when the server cannot sendfile
+FILE_CHUNK_SIZE = 256 * 1024
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+@dataclass
+class FileSlice:
+    """
+    A part of the body that is served straight from a local file.
+    The response takes ownership of `file` and closes it once sent.
+    """
+    file: BinaryIO
+    offset: int
+    count: int
+
+class ProxyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always releases its upstream resources.
+    When the player aborts a range (seek, closed tab), Starlette stops iterating
+    the body. Closing the iterator right away runs its cleanup, which cancels the
+    upstream transfer instead of draining it or leaving it to the garbage collector.
+
+    `on_close` callbacks cover resources that were opened before the body iterator
+    started (closing a generator that never ran does not execute its `finally`).
+
+    Besides bytes, the body iterator may yield FileSlice objects. They are sent
+    with sendfile when the ASGI server supports the zero-copy extension, and from
+    an mmap otherwise (no copy into Python bytes objects).
+    """
+
+    def __init__(self, content, *, on_close: Sequence[Callable[[], Awaitable[None]]] = (), **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+        self.zerocopy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Shielded: we may be running inside a cancelled scope after a disconnect
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+                for callback in self.on_close:
+                    await callback()
+
+    async def stream_response(self, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        async for chunk in self.body_iterator:
+            if isinstance(chunk, FileSlice):
+                await self._send_file_slice(chunk, send)
+                continue
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_file_slice(self, part: FileSlice, send: Send):
+        try:
+            if part.count <= 0:
+                return
+            if self.zerocopy:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": part.file,
+                    "offset": part.offset,
+                    "count": part.count,
+                    "more_body": True,
+                })
+                return
+
+            mapped = mmap.mmap(part.file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                view = memoryview(mapped)
+                end = part.offset + part.count
+                for pos in range(part.offset, end, FILE_CHUNK_SIZE):
+                    await send({
+                        "type": "http.response.body",
+                        "body": view[pos:min(pos + FILE_CHUNK_SIZE, end)],
+                        "more_body": True,
+                    })
+                view.release()
+            finally:
+                try:
+                    mapped.close()
+                except BufferError:
+                    # A slice is still referenced by the server, the GC unmaps it later
+                    pass
+        finally:
+            part.file.close()
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import logging
+from typing import AsyncIterator, Dict, List, Tuple
+
+from app.config import settings
+from app.streaming.response import FileSlice
+from app.streaming.viewer import Viewer
+from app.utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Share of capacity and queue priority per User.role
+ROLE_WEIGHTS = {
+    "owner": 4,
+    "admin": 4,
+    "moderator": 2,
+    "uploader": 1,
+    "viewer": 1,
+}
+
+class Overloaded(Exception):
+    """
+    No stream slot became available in time (HTTP 503).
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class StreamTicket:
+    """
+    An admitted stream. Holds a concurrency slot and a bandwidth share until released.
+    """
+
+    def __init__(self, scheduler: "StreamScheduler", viewer: Viewer):
+        self.scheduler = scheduler
+        self.viewer = viewer
+        self.bucket = TokenBucket(0, scheduler.burst_seconds)
+        self.released = False
+
+    async def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)
+
+class StreamScheduler:
+    """
+    Admission control and fair bandwidth sharing for /webapp/stream.
+    - At most `max_streams` concurrent streams, and `max_per_user` per user.
+    - Requests over the limit wait in a priority queue (by role) for up to
+      `queue_timeout` seconds, then get a 503 with Retry-After.
+    - The total bandwidth is split between active users by role weight, and
+      each user's share between their streams (token bucket per stream).
+    Zero disables a limit.
+    """
+
+    def __init__(
+        self,
+        max_streams: int,
+        max_per_user: int,
+        bandwidth: int,
+        queue_size: int,
+        queue_timeout: float,
+        retry_after: int,
+        burst_seconds: float = 1.0,
+    ):
+        self.max_streams = max_streams
+        self.max_per_user = max_per_user
+        self.bandwidth = bandwidth
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.burst_seconds = burst_seconds
+
+        self._active: Dict[str, List[StreamTicket]] = {}
+        self._active_count = 0
+        self._waiters: List[Tuple[int, int, Viewer, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def active_streams(self) -> int:
+        return self._active_count
+
+    def _can_admit(self, viewer: Viewer) -> bool:
+        if self.max_streams and self._active_count >= self.max_streams:
+            return False
+        if self.max_per_user and len(self._active.get(viewer.user_key, [])) >= self.max_per_user:
+            return False
+        return True
+
+    async def admit(self, viewer: Viewer) -> StreamTicket:
+        if self._can_admit(viewer):
+            return self._grant(viewer)
+
+        if len(self._waiters) >= self.queue_size:
+            raise Overloaded(self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (-ROLE_WEIGHTS.get(viewer.role, 1), next(self._sequence), viewer, future)
+        self._waiters.append(entry)
+        self._waiters.sort(key=lambda w: (w[0], w[1]))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            if future.done():
+                # Granted a slot at the last moment, give it back
+                await future.result().release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(self.retry_after)
+            raise
+
+    def _grant(self, viewer: Viewer) -> StreamTicket:
+        ticket = StreamTicket(self, viewer)
+        self._active.setdefault(viewer.user_key, []).append(ticket)
+        self._active_count += 1
+        self._rebalance()
+        return ticket
+
+    def _release(self, ticket: StreamTicket):
+        tickets = self._active.get(ticket.viewer.user_key)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            self._active_count -= 1
+            if not tickets:
+                del self._active[ticket.viewer.user_key]
+        self._dispatch()
+        self._rebalance()
+
+    def _dispatch(self):
+        # Hand free slots to waiters, highest priority first
+        for entry in list(self._waiters):
+            _, _, viewer, future = entry
+            if future.done():
+                self._waiters.remove(entry)
+                continue
+            if self._can_admit(viewer):
+                self._waiters.remove(entry)
+                future.set_result(self._grant(viewer))
+
+    def _rebalance(self):
+        """
+        Recomputes every stream's rate: the bandwidth is split between users by
+        role weight, then evenly between the streams of each user.
+        """
+        if not self.bandwidth:
+            return
+        total_weight = sum(ROLE_WEIGHTS.get(tickets[0].viewer.role, 1) for tickets in self._active.values())
+        for tickets in self._active.values():
+            user_rate = self.bandwidth * ROLE_WEIGHTS.get(tickets[0].viewer.role, 1) / total_weight
+            for ticket in tickets:
+                ticket.bucket.set_rate(user_rate / len(tickets))
+
+    async def shape(self, ticket: StreamTicket, body: AsyncIterator) -> AsyncIterator:
+        """
+        Paces a response body according to the ticket's bandwidth share.
+        """
+        try:
+            async for chunk in body:
+                size = chunk.count if isinstance(chunk, FileSlice) else len(chunk)
+                await ticket.bucket.consume(size)
+                yield chunk
+        finally:
+            await body.aclose()
+
+# Singleton instance
+stream_scheduler = StreamScheduler(
+    max_streams=settings.STREAM_MAX_CONCURRENT,
+    max_per_user=settings.STREAM_MAX_PER_USER,
+    bandwidth=settings.STREAM_BANDWIDTH_LIMIT,
+    queue_size=settings.STREAM_QUEUE_SIZE,
+    queue_timeout=settings.STREAM_QUEUE_TIMEOUT,
+    retry_after=settings.STREAM_RETRY_AFTER,
+)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Set, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".seg"
+PARTIAL_SUFFIX = ".part"
+
+class SegmentCache:
+    """
+    On-disk cache of fixed-size, aligned segments of Telegram files.
+    Segment N of a file covers bytes [N * segment_size, (N + 1) * segment_size).
+    Files are keyed by `file_unique_id`, which never changes for the same bytes.
+
+    Layout: {root}/{file_unique_id[:2]}/{file_unique_id}/{N}.seg
+    Writes go to a temporary `.part` file that is renamed into place, so a crash
+    never leaves a truncated segment behind. The total size is capped, least
+    recently used segments are evicted first.
+    """
+
+    def __init__(self, root: str, segment_size: int, max_bytes: int):
+        self.root = root
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        # (file_unique_id, segment) -> size in bytes, least recently used first
+        self._index: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._total_bytes = 0
+        self._pending_writes: Set[asyncio.Task] = set()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _segment_path(self, file_unique_id: str, segment: int) -> str:
+        return os.path.join(self.root, file_unique_id[:2], file_unique_id, f"{segment}{SEGMENT_SUFFIX}")
+
+    async def load(self):
+        """
+        Rebuilds the index from disk (oldest first) and removes leftovers of interrupted writes.
+        """
+        entries = await asyncio.to_thread(self._scan)
+        for key, size in entries:
+            self._index[key] = size
+            self._total_bytes += size
+        await self._evict()
+        logger.info(f"Segment cache: {len(self._index)} segments ({self._total_bytes // (1024 * 1024)} MiB) in {self.root}")
+
+    def _scan(self):
+        found = []
+        os.makedirs(self.root, exist_ok=True)
+        for dirpath, _, filenames in os.walk(self.root):
+            file_unique_id = os.path.basename(dirpath)
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith(PARTIAL_SUFFIX):
+                    os.unlink(path)
+                    continue
+                if not name.endswith(SEGMENT_SUFFIX):
+                    continue
+                try:
+                    segment = int(name[:-len(SEGMENT_SUFFIX)])
+                    stat = os.stat(path)
+                except (ValueError, OSError):
+                    continue
+                found.append((stat.st_mtime, (file_unique_id, segment), stat.st_size))
+        found.sort()
+        return [(key, size) for _, key, size in found]
+
+    def contains(self, file_unique_id: str, segment: int) -> bool:
+        return (file_unique_id, segment) in self._index
+
+    def open(self, file_unique_id: str, segment: int) -> Optional[BinaryIO]:
+        """
+        Opens a cached segment for reading and marks it as recently used.
+        The open file stays readable even if the segment is evicted meanwhile.
+        """
+        key = (file_unique_id, segment)
+        if key not in self._index:
+            return None
+        try:
+            f = open(self._segment_path(file_unique_id, segment), "rb")
+        except OSError:
+            # Removed behind our back
+            self._total_bytes -= self._index.pop(key)
+            return None
+        self._index.move_to_end(key)
+        return f
+
+    def store_later(self, file_unique_id: str, segment: int, data: bytes):
+        """
+        Writes a complete segment in the background, the stream does not wait for the disk.
+        """
+        if (file_unique_id, segment) in self._index:
+            return
+        task = asyncio.create_task(self.store(file_unique_id, segment, data))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def store(self, file_unique_id: str, segment: int, data: bytes):
+        key = (file_unique_id, segment)
+        if key in self._index or len(data) > self.max_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._write, self._segment_path(file_unique_id, segment), data)
+        except OSError as e:
+            logger.warning(f"Segment cache: could not write {file_unique_id}/{segment}: {e}")
+            return
+
+        if key not in self._index:
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+        await self._evict()
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def _evict(self):
+        victims = []
+        while self._total_bytes > self.max_bytes and self._index:
+            (file_unique_id, segment), size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            victims.append(self._segment_path(file_unique_id, segment))
+        if victims:
+            await asyncio.to_thread(self._unlink_all, victims)
+
+    @staticmethod
+    def _unlink_all(paths):
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def close(self):
+        # Let in-flight writes finish so they are not left as .part files
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+# Singleton instance (None when disabled via STREAM_CACHE_MAX_BYTES=0)
+segment_cache: Optional[SegmentCache] = None
+if settings.STREAM_CACHE_MAX_BYTES > 0:
+    segment_cache = SegmentCache(settings.STREAM_CACHE_DIR, settings.STREAM_SEGMENT_SIZE, settings.STREAM_CACHE_MAX_BYTES)
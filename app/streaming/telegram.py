@@ -0,0 +1,164 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+import httpx
+
+from app.config import settings
+from app.streaming.upstream import open_stream
+from app.utils.http import get_http_client
+from app.utils.redis_client import redis_client
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Redis Key Prefix
+FILE_PATH_KEY_PREFIX = "tg_file_path:"
+
+@dataclass
+class TelegramFile:
+    """
+    Result of a Bot API getFile call.
+    """
+    file_id: str
+    file_unique_id: str
+    file_path: str
+    file_size: Optional[int] = None
+
+def download_url(tg_file: TelegramFile) -> str:
+    # Contains the bot token: never send this URL to the client
+    return f"{settings.TELEGRAM_API_URL}/file/bot{settings.BOT_TOKEN}/{tg_file.file_path}"
+
+async def fetch_file_info(file_id: str) -> Optional[TelegramFile]:
+    """
+    Calls getFile on the Bot API.
+    Returns None if Telegram does not know the file (or refuses it).
+    """
+    client = get_http_client()
+    try:
+        resp = await client.get(f"{settings.TELEGRAM_API_URL}/bot{settings.BOT_TOKEN}/getFile", params={"file_id": file_id})
+    except httpx.HTTPError as e:
+        logger.error(f"getFile failed for {file_id}: {e}")
+        return None
+
+    if resp.status_code != 200:
+        logger.warning(f"getFile returned {resp.status_code} for {file_id}")
+        return None
+
+    result = resp.json()["result"]
+    return TelegramFile(
+        file_id=file_id,
+        file_unique_id=result["file_unique_id"],
+        file_path=result["file_path"],
+        file_size=result.get("file_size"),
+    )
+
+class FilePathCache:
+    """
+    Two-tier cache of file_id -> getFile result.
+    Tier 1 is an in-process LRU, tier 2 is Redis (shared between workers/restarts).
+    Telegram guarantees a file_path for at least one hour, entries expire earlier (FILE_PATH_CACHE_TTL).
+    Concurrent misses for the same file_id collapse into a single getFile call.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, TelegramFile]]" = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def get(self, file_id: str, refresh: bool = False) -> Optional[TelegramFile]:
+        """
+        Returns the cached file info, loading it on a miss.
+        `refresh=True` drops the cached entry (e.g. the path returned 404) and asks Telegram again.
+        """
+        if not refresh:
+            cached = self._get_local(file_id)
+            if cached:
+                return cached
+            return await self._flight.do(("load", file_id), lambda: self._load(file_id))
+
+        return await self._flight.do(("refresh", file_id), lambda: self._refresh(file_id))
+
+    def _get_local(self, file_id: str) -> Optional[TelegramFile]:
+        entry = self._entries.get(file_id)
+        if not entry:
+            return None
+        expires_at, tg_file = entry
+        if expires_at <= time.monotonic():
+            del self._entries[file_id]
+            return None
+        self._entries.move_to_end(file_id)
+        return tg_file
+
+    def _set_local(self, tg_file: TelegramFile, ttl: float):
+        self._entries[tg_file.file_id] = (time.monotonic() + ttl, tg_file)
+        self._entries.move_to_end(tg_file.file_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, file_id: str) -> Optional[TelegramFile]:
+        key = f"{FILE_PATH_KEY_PREFIX}{file_id}"
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                raw, remaining = await pipe.get(key).ttl(key).execute()
+            if raw and remaining and remaining > 0:
+                tg_file = TelegramFile(**json.loads(raw))
+                # Keep the local copy no longer than the shared one
+                self._set_local(tg_file, remaining)
+                return tg_file
+        except Exception as e:
+            logger.warning(f"File path cache: Redis read failed: {e}")
+
+        return await self._fetch_and_store(file_id)
+
+    async def _refresh(self, file_id: str) -> Optional[TelegramFile]:
+        await self.invalidate(file_id)
+        return await self._fetch_and_store(file_id)
+
+    async def _fetch_and_store(self, file_id: str) -> Optional[TelegramFile]:
+        tg_file = await fetch_file_info(file_id)
+        if not tg_file:
+            return None
+
+        self._set_local(tg_file, self.ttl)
+        try:
+            await redis_client.set(f"{FILE_PATH_KEY_PREFIX}{file_id}", json.dumps(asdict(tg_file)), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"File path cache: Redis write failed: {e}")
+        return tg_file
+
+    async def invalidate(self, file_id: str):
+        self._entries.pop(file_id, None)
+        try:
+            await redis_client.delete(f"{FILE_PATH_KEY_PREFIX}{file_id}")
+        except Exception as e:
+            logger.warning(f"File path cache: Redis delete failed: {e}")
+
+# Singleton instance
+file_path_cache = FilePathCache(settings.FILE_PATH_CACHE_SIZE, settings.FILE_PATH_CACHE_TTL)
+
+async def open_file_stream(file_id: str, range_header: Optional[str] = None) -> Tuple[Optional[TelegramFile], Optional[httpx.Response]]:
+    """
+    Resolves the file path (cached) and opens the upstream stream.
+    A cached path that Telegram no longer accepts (404) is refreshed exactly once.
+    Returns (None, None) if the file cannot be resolved.
+    """
+    tg_file = await file_path_cache.get(file_id)
+    if not tg_file:
+        return None, None
+
+    upstream = await open_stream(download_url(tg_file), range_header)
+    if upstream.status_code != 404:
+        return tg_file, upstream
+
+    await upstream.aclose()
+    logger.info(f"Cached file path for {file_id} is stale, refreshing")
+    tg_file = await file_path_cache.get(file_id, refresh=True)
+    if not tg_file:
+        return None, None
+
+    return tg_file, await open_stream(download_url(tg_file), range_header)
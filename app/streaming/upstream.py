@@ -0,0 +1,35 @@
+import anyio
+import httpx
+from typing import AsyncIterator, Optional
+from app.utils.http import get_http_client
+
+# Upstream statuses we forward to the player as-is
+FORWARDED_STATUSES = (200, 206, 416)
+
+async def open_stream(url: str, range_header: Optional[str] = None) -> httpx.Response:
+    """
+    Sends a single GET to Telegram and returns as soon as the status line and
+    headers are in. The body is left unread so the caller can relay it.
+    The caller owns the response and must close it (see iter_body).
+    """
+    client = get_http_client()
+    # Video must be relayed byte-exact, never re-encoded
+    headers = {"Accept-Encoding": "identity"}
+    if range_header:
+        headers["Range"] = range_header
+
+    request = client.build_request("GET", url, headers=headers)
+    return await client.send(request, stream=True)
+
+async def iter_body(response: httpx.Response) -> AsyncIterator[bytes]:
+    """
+    Relays the body of an upstream response and always closes it.
+    If the client goes away, the generator is closed mid-transfer and the
+    upstream connection is released at once.
+    """
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        with anyio.CancelScope(shield=True):
+            await response.aclose()
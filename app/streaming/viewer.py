@@ -0,0 +1,90 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from aiogram.utils.web_app import check_webapp_signature
+from fastapi import Request
+
+from app.config import settings
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+# How long a looked up User.role is trusted (seconds)
+ROLE_CACHE_TTL = 60
+
+# LRU of telegram_id -> (expires_at, role, is_banned), at most VIEWER_ROLE_CACHE_SIZE viewers
+_roles: "OrderedDict[int, Tuple[float, str, bool]]" = OrderedDict()
+
+@dataclass
+class Viewer:
+    """
+    The person behind a stream request.
+    `user_key` identifies the user (Telegram ID when the WebApp signed the request,
+    client address otherwise), `stream_key` one player of that user.
+    """
+    user_key: str
+    stream_key: str
+    telegram_id: Optional[int] = None
+    role: str = "viewer"
+    is_banned: bool = False
+
+def _telegram_id_from_init_data(init_data: str) -> Optional[int]:
+    """
+    Validates the WebApp initData signature and returns the user ID in it.
+    """
+    try:
+        if not check_webapp_signature(settings.BOT_TOKEN, init_data):
+            return None
+        user_json = parse_qs(init_data).get("user", [None])[0]
+        if not user_json:
+            return None
+        return json.loads(user_json).get("id")
+    except Exception as e:
+        logger.debug(f"Invalid initData on stream request: {e}")
+        return None
+
+async def _role_of(telegram_id: int) -> Tuple[str, bool]:
+    cached = _roles.get(telegram_id)
+    if cached and cached[0] > time.monotonic():
+        _roles.move_to_end(telegram_id)
+        return cached[1], cached[2]
+
+    if telegram_id == settings.OWNER_TELEGRAM_ID:
+        role, is_banned = "owner", False
+    else:
+        user = await User.find_one(User.telegram_id == telegram_id)
+        role, is_banned = (user.role, user.is_banned) if user else ("viewer", False)
+
+    _roles[telegram_id] = (time.monotonic() + ROLE_CACHE_TTL, role, is_banned)
+    _roles.move_to_end(telegram_id)
+    while len(_roles) > settings.VIEWER_ROLE_CACHE_SIZE:
+        _roles.popitem(last=False)
+    return role, is_banned
+
+async def resolve_viewer(request: Request) -> Viewer:
+    """
+    Identifies the viewer of a stream request.
+    <video> elements cannot send headers, so the WebApp passes its initData as
+    the `init_data` query parameter (the X-Telegram-Init-Data header works too).
+    """
+    user_agent = request.headers.get("user-agent", "")
+    init_data = request.headers.get("x-telegram-init-data") or request.query_params.get("init_data")
+    telegram_id = _telegram_id_from_init_data(init_data) if init_data else None
+
+    if telegram_id is None:
+        host = request.client.host if request.client else "unknown"
+        return Viewer(user_key=f"ip:{host}", stream_key=f"ip:{host}|{user_agent}")
+
+    role, is_banned = await _role_of(telegram_id)
+    return Viewer(
+        user_key=f"tg:{telegram_id}",
+        stream_key=f"tg:{telegram_id}|{user_agent}",
+        telegram_id=telegram_id,
+        role=role,
+        is_banned=is_banned,
+    )
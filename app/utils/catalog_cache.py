@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Tuple
+
+from app.config import settings
+from app.utils.redis_client import redis_client
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Key Prefixes
+CATALOG_KEY_PREFIX = "catalog:"
+VERSION_KEY_PREFIX = "catalog_version:"
+
+# Scopes: a listing and everything that can change it
+BUNDLES = "bundles"
+CHANNELS = "channels"
+
+def series_scope(bundle_id: Any) -> str:
+    """Series of a bundle."""
+    return f"series:{bundle_id}"
+
+def episodes_scope(series_id: Any) -> str:
+    """Episodes of a series."""
+    return f"episodes:{series_id}"
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+class CatalogCache:
+    """
+    Read-through cache of the WebApp catalog listings (bundles, series,
+    episodes), stored as ready-to-send JSON with its ETag.
+
+    Every scope (e.g. the episodes of one series) has a version number in
+    Redis, bumped by whatever changes the listing (import writes, admin
+    routes). Entries are stored under the version they were built for, so a
+    bump makes every copy of the scope stale at once, in all processes, and a
+    listing built from data read before a bump can never be served after it.
+    Tier 1 is an in-process LRU (one version GET per request), tier 2 is
+    Redis. Both keep entries for `ttl` at most, so a lost version bump is
+    not served forever. If Redis is unreachable, listings are built on
+    every request.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (scope, variant) -> (expires_at, version, body, etag)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, bytes, str]]" = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def get(self, scope: str, variant: str, build: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, str]:
+        """
+        The JSON body and ETag of a listing. `variant` tells apart listings of
+        the same scope (e.g. page sizes), `build` reads and serializes it on a miss.
+        """
+        try:
+            version = await redis_client.get(f"{VERSION_KEY_PREFIX}{scope}") or "0"
+        except Exception as e:
+            logger.warning(f"Catalog cache: Redis read failed: {e}")
+            body = await build()
+            return body, body_etag(body)
+
+        key = (scope, variant)
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, entry_version, body, etag = entry
+            if entry_version == version and expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return body, etag
+            del self._entries[key]
+        return await self._flight.do((scope, variant, version), lambda: self._load(key, version, build))
+
+    async def _load(self, key: Tuple[str, str], version: str, build: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, str]:
+        scope, variant = key
+        redis_key = f"{CATALOG_KEY_PREFIX}{scope}:{version}:{variant}"
+        body = None
+        try:
+            raw = await redis_client.get(redis_key)
+            if raw is not None:
+                body = raw.encode()
+        except Exception as e:
+            logger.warning(f"Catalog cache: Redis read failed: {e}")
+
+        if body is None:
+            body = await build()
+            try:
+                await redis_client.set(redis_key, body.decode(), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Catalog cache: Redis write failed: {e}")
+
+        etag = body_etag(body)
+        self._entries[key] = (time.monotonic() + self.ttl, version, body, etag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body, etag
+
+    async def invalidate(self, *scopes: str):
+        """Bumps the version of the scopes: call after the change is written."""
+        if not scopes:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for scope in set(scopes):
+                    pipe.incr(f"{VERSION_KEY_PREFIX}{scope}")
+                await pipe.execute()
+        except Exception as e:
+            # Other processes serve their entries until they expire (`ttl`), this one drops them
+            logger.error(f"Catalog cache: invalidation of {scopes} failed: {e}")
+            for key in [key for key in self._entries if key[0] in scopes]:
+                del self._entries[key]
+
+# Singleton instance
+catalog_cache = CatalogCache(settings.CATALOG_CACHE_SIZE, settings.CATALOG_CACHE_TTL)
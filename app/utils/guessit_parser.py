@@ -1,46 +1,140 @@
 from guessit import guessit
 from typing import Optional, Dict
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
 import logging
+import multiprocessing
+import re
+import threading
+
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Fast path: the filename shapes that make up nearly every import.
+# Anything the patterns below are not sure about goes to guessit instead.
+_EXTENSION_RE = re.compile(r"\.(?:mkv|mp4|avi|mov|webm|flv|m4v)$", re.IGNORECASE)
+_GROUP_TAG_RE = re.compile(r"^\s*\[[^\[\]]+\]\s*")
+_EPISODE_MARKERS = (
+    # Show.Name.S01E02, Show Name s1e2
+    re.compile(r"(?<![a-z0-9])s(\d{1,2})e(\d{1,3})(?![a-z0-9])", re.IGNORECASE),
+    # Show Name - 1x02
+    re.compile(r"(?<![a-z0-9])(\d{1,2})x(\d{2,3})(?![a-z0-9])", re.IGNORECASE),
+    # Show Name Season 1 Episode 2
+    re.compile(r"(?<![a-z0-9])season[ ._]?(\d{1,2})[ ._-]+episode[ ._]?(\d{1,3})(?![a-z0-9])", re.IGNORECASE),
+)
+# [Group] Show Name - 12 [1080p] (absolute numbering, no season)
+_ABSOLUTE_RE = re.compile(r"^(?P<title>[^\[\]()]+?) - (?P<episode>\d{1,3})(?:v\d)?(?= *[\[(]|$)")
+# Another episode number right after the marker (S01E01E02, S01E01-E02, 1x01-1x02)
+_MULTI_EPISODE_RE = re.compile(r"^[ ._-]?(?:e|x|\d{1,2}x|s\d)\d", re.IGNORECASE)
+_YEAR_RE = re.compile(r"^\(?((?:19|20)\d{2})\)?$")
+_TITLE_SPLIT_RE = re.compile(r"[ ._]+")
+_COUNTRY_CODES = {"US", "UK"}
+# Words guessit gives a meaning to (or may). A title containing one is left to guessit.
+_TITLE_STOPWORDS = {
+    "part", "pt", "season", "episode", "ep", "vol", "complete", "extended", "proper",
+    "repack", "internal", "limited", "uncut", "remastered", "dubbed", "subbed", "multi",
+    "web", "hdtv", "dvd", "bluray", "hevc", "avc", "x264", "x265", "hdr",
+}
+
+_QUALITY_RE = re.compile(r"(?<![a-z0-9])(2160|1080|720|576|480)([pi])(?![a-z0-9])", re.IGNORECASE)
+_SOURCES = (
+    (re.compile(r"(?<![a-z0-9])(?:blu-?ray|bdrip|brrip)(?![a-z0-9])", re.IGNORECASE), "Blu-ray"),
+    (re.compile(r"(?<![a-z0-9])web(?:-?dl|-?rip)?(?![a-z0-9])", re.IGNORECASE), "Web"),
+    (re.compile(r"(?<![a-z0-9])hdtv(?![a-z0-9])", re.IGNORECASE), "HDTV"),
+    (re.compile(r"(?<![a-z0-9])dvd(?:-?rip)?(?![a-z0-9])", re.IGNORECASE), "DVD"),
+)
+# Source-like tokens the fast path does not map (CAM, TVRip, HDRip, UHD, 4K, ...)
+_UNKNOWN_SOURCE_RE = re.compile(
+    r"(?<![a-z0-9])(?:\w*rip|\w*tv|\w*dvd\w*|cam|ts|tc|scr|screener|vhs|uhd|remux|4k|hd)(?![a-z0-9])",
+    re.IGNORECASE,
+)
+
 class MediaParser:
     """
     Parses filenames to extract show info (Name, Season, Episode).
+    Common release names are parsed by precompiled patterns, guessit only sees
+    the rest. Results are memoized per filename.
     """
 
+    _memo: "OrderedDict[str, Dict]" = OrderedDict()
+    _memo_lock = threading.Lock()
+    _pool: Optional[ProcessPoolExecutor] = None
+
     @staticmethod
     def parse_filename(filename: str) -> Dict:
         """
-        Uses guessit to parse the filename.
+        Parses the filename in the calling thread.
         Returns a dictionary with normalized keys.
         """
+        result = MediaParser._recall(filename)
+        if result is None:
+            result = parse_fast(filename) or parse_guessit(filename)
+            MediaParser._remember(filename, result)
+        return dict(result)
+
+    @staticmethod
+    async def parse_filename_async(filename: str) -> Dict:
+        """
+        Like parse_filename, but guessit runs in the parser process pool
+        (PARSER_PROCESSES) so a batch import does not stall the event loop.
+        """
+        result = MediaParser._recall(filename)
+        if result is None:
+            result = parse_fast(filename)
+            if result is None:
+                result = await MediaParser._guess_in_pool(filename)
+            MediaParser._remember(filename, result)
+        return dict(result)
+
+    @staticmethod
+    async def _guess_in_pool(filename: str) -> Dict:
+        if settings.PARSER_PROCESSES <= 0:
+            return await asyncio.to_thread(parse_guessit, filename)
+
+        if MediaParser._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            MediaParser._pool = ProcessPoolExecutor(
+                max_workers=settings.PARSER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        pool = MediaParser._pool
         try:
-            guess = guessit(filename)
-
-            result = {
-                "title": guess.get("title"),
-                "season": guess.get("season"),
-                "episode": guess.get("episode"),
-                "year": guess.get("year"),
-                "type": guess.get("type", "episode"), # episode or movie
-                "quality": guess.get("screen_size"), # 1080p, 720p
-                "source": guess.get("source"), # BluRay, Web
-                "original_filename": filename
-            }
-
-            # Normalize list to single int if multiple episodes in one file (not supported well yet)
-            if isinstance(result["episode"], list):
-                result["episode"] = result["episode"][0]
-
-            if isinstance(result["season"], list):
-                result["season"] = result["season"][0]
+            return await asyncio.get_running_loop().run_in_executor(pool, parse_guessit, filename)
+        except BrokenProcessPool:
+            # Concurrent lookups all fail on the same pool: only the first one replaces it
+            if MediaParser._pool is pool:
+                logger.warning("Parser process pool died, restarting it")
+                # Reap its remaining workers and management thread
+                pool.shutdown(wait=False, cancel_futures=True)
+                MediaParser._pool = None
+            return await asyncio.to_thread(parse_guessit, filename)
 
+    @staticmethod
+    def shutdown():
+        """Stops the parser process pool (if it was started)."""
+        if MediaParser._pool is not None:
+            MediaParser._pool.shutdown(wait=False, cancel_futures=True)
+            MediaParser._pool = None
+
+    @staticmethod
+    def _recall(filename: str) -> Optional[Dict]:
+        with MediaParser._memo_lock:
+            result = MediaParser._memo.get(filename)
+            if result is not None:
+                MediaParser._memo.move_to_end(filename)
             return result
 
-        except Exception as e:
-            logger.error(f"Error parsing filename '{filename}': {e}")
-            return {"original_filename": filename, "error": str(e)}
+    @staticmethod
+    def _remember(filename: str, result: Dict):
+        if "error" in result:
+            return
+        with MediaParser._memo_lock:
+            MediaParser._memo[filename] = result
+            while len(MediaParser._memo) > settings.PARSER_CACHE_SIZE:
+                MediaParser._memo.popitem(last=False)
 
     @staticmethod
     def is_video_file(filename: str) -> bool:
@@ -49,3 +143,121 @@ class MediaParser:
         """
         video_extensions = ['.mkv', '.mp4', '.avi', '.mov', '.webm', '.flv']
         return any(filename.lower().endswith(ext) for ext in video_extensions)
+
+def parse_guessit(filename: str) -> Dict:
+    """
+    Uses guessit to parse the filename.
+    Module level so it can run in the parser process pool.
+    """
+    try:
+        guess = guessit(filename)
+
+        result = {
+            "title": guess.get("title"),
+            "season": guess.get("season"),
+            "episode": guess.get("episode"),
+            "year": guess.get("year"),
+            "type": guess.get("type", "episode"), # episode or movie
+            "quality": guess.get("screen_size"), # 1080p, 720p
+            "source": guess.get("source"), # BluRay, Web
+            "original_filename": filename
+        }
+
+        # Normalize list to single int if multiple episodes in one file (not supported well yet)
+        if isinstance(result["episode"], list):
+            result["episode"] = result["episode"][0]
+
+        if isinstance(result["season"], list):
+            result["season"] = result["season"][0]
+
+        return result
+
+    except Exception as e:
+        logger.error(f"Error parsing filename '{filename}': {e}")
+        return {"original_filename": filename, "error": str(e)}
+
+def parse_fast(filename: str) -> Optional[Dict]:
+    """
+    Parses the dominant release name shapes (S01E02, 1x02, Season 1 Episode 2,
+    [Group] Title - 12) the way guessit would. Returns None when unsure.
+    """
+    name = _EXTENSION_RE.sub("", filename)
+    if name == filename:
+        return None
+    name, tagged = _GROUP_TAG_RE.subn("", name)
+
+    markers = [m for pattern in _EPISODE_MARKERS for m in pattern.finditer(name)]
+    if len(markers) > 1:
+        return None
+    if markers:
+        marker = markers[0]
+        season, episode = int(marker.group(1)), int(marker.group(2))
+        head, tail = name[:marker.start()], name[marker.end():]
+        if _MULTI_EPISODE_RE.match(tail):
+            return None
+    else:
+        # Absolute numbering is only trusted on fansub style names
+        absolute = _ABSOLUTE_RE.match(name) if tagged else None
+        if not absolute:
+            return None
+        season, episode = None, int(absolute.group("episode"))
+        head, tail = absolute.group("title"), name[absolute.end():]
+
+    title = _parse_title(head)
+    if title is None:
+        return None
+    title, year = title
+
+    qualities = {(m.group(1), m.group(2).lower()) for m in _QUALITY_RE.finditer(tail)}
+    if len(qualities) > 1:
+        return None
+    quality = "".join(qualities.pop()) if qualities else None
+
+    sources = set()
+    for pattern, source in _SOURCES:
+        if pattern.search(tail):
+            sources.add(source)
+            tail = pattern.sub(" ", tail)
+    if len(sources) > 1 or _UNKNOWN_SOURCE_RE.search(tail):
+        return None
+    source = sources.pop() if sources else None
+    if source == "Blu-ray" and quality == "2160p":
+        source = "Ultra HD Blu-ray"
+
+    return {
+        "title": title,
+        "season": season,
+        "episode": episode,
+        "year": year,
+        "type": "episode",
+        "quality": quality,
+        "source": source,
+        "original_filename": filename
+    }
+
+def _parse_title(head: str):
+    """
+    "Doctor.Who.2005." -> ("Doctor Who", 2005). None if guessit might read it differently.
+    """
+    head = head.strip(" ._-")
+    if not head or re.search(r"[\[\]{}]", head):
+        return None
+    tokens = _TITLE_SPLIT_RE.split(head)
+
+    year = None
+    year_match = _YEAR_RE.match(tokens[-1])
+    if year_match and len(tokens) > 1:
+        year = int(year_match.group(1))
+        tokens.pop()
+    if len(tokens) > 1 and tokens[-1] in _COUNTRY_CODES:
+        tokens.pop()
+
+    for token in tokens:
+        if (
+            len(token) < 2
+            or token == "-"
+            or any(c.isdigit() or c in "()" for c in token)
+            or token.casefold() in _TITLE_STOPWORDS
+        ):
+            return None
+    return " ".join(tokens), year
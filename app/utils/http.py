@@ -0,0 +1,59 @@
+import httpx
+import logging
+from typing import Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Shared client, owned by the FastAPI lifespan (see app/main.py)
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    Creates the application-wide pooled HTTP client.
+    Connections to api.telegram.org (and friends) are kept alive and reused,
+    so a seek does not pay for a new TCP+TLS handshake.
+    """
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        http2 = False
+
+    _http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+    )
+    logger.info(f"HTTP client pool ready (max {settings.HTTP_MAX_CONNECTIONS} connections, http2={http2})")
+    return _http_client
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client. Only valid while the app lifespan is running.
+    """
+    if _http_client is None:
+        raise RuntimeError("HTTP client is not initialized. It is created in the app lifespan.")
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is None:
+        return
+    await _http_client.aclose()
+    _http_client = None
+    logger.info("HTTP client pool closed")
@@ -0,0 +1,5 @@
+import redis.asyncio as redis
+from app.config import settings
+
+# Shared Redis Connection (batch import state, caches)
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
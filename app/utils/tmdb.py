@@ -1,94 +1,201 @@
-from tmdbv3api import TMDb, TV, Movie, Season, Episode
-from typing import Optional, Dict, List
+import asyncio
 import logging
+import math
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+
 from app.config import settings
+from app.utils.http import get_http_client
+from app.utils.token_bucket import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Answers worth retrying (rate limited or TMDB having a bad moment)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Longest wait before a retry, whatever Retry-After says (it parks an import worker)
+MAX_RETRY_DELAY = 30.0
+
+class TMDBError(Exception):
+    """
+    A TMDB request failed for good (after retries, or with a non-retryable status).
+    """
+
 class TMDBClient:
     """
-    Wrapper around the TMDB API to fetch show metadata.
+    Async client for the TMDB v3 API, used to fetch show metadata.
+    Runs on the shared pooled HTTP client (app.utils.http). Every request, from
+    all import workers, takes a token from one bucket (TMDB_RATE_LIMIT per second),
+    429/5xx answers are retried with exponential backoff, honouring Retry-After
+    (up to MAX_RETRY_DELAY).
     """
-    def __init__(self, api_key: str):
-        self.tmdb = TMDb()
-        self.tmdb.api_key = api_key
-        self.tmdb.language = "en"
-        self.tv_api = TV()
-        self.movie_api = Movie()
-        self.season_api = Season()
-        self.episode_api = Episode()
 
-    def search_tv_show(self, query: str) -> List[Dict]:
+    def __init__(self, api_key: str, base_url: str, language: str, rate_limit: float, max_retries: int):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.language = language
+        self.max_retries = max_retries
+        self.limiter = TokenBucket(rate_limit, burst_seconds=1.0)
+
+    def _auth(self) -> Dict[str, Dict[str, str]]:
+        # v4 "API Read Access Tokens" are JWTs and go in a header, v3 keys in the query
+        if self.api_key.startswith("eyJ"):
+            return {"headers": {"Authorization": f"Bearer {self.api_key}"}, "params": {}}
+        return {"headers": {}, "params": {"api_key": self.api_key}}
+
+    async def _get(self, path: str, **params: Any) -> Optional[Dict]:
+        """
+        GETs a TMDB resource. Returns None if it does not exist (404).
+        Raises TMDBError once retries are exhausted.
+        """
+        auth = self._auth()
+        params = {**auth["params"], "language": self.language, **params}
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.consume(1)
+            retry_after = None
+            try:
+                response = await get_http_client().get(url, params=params, headers=auth["headers"])
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 404:
+                    return None
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES:
+                    raise TMDBError(f"{path} returned {response.status_code}")
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt == self.max_retries:
+                break
+
+            delay = self._retry_delay(retry_after, attempt)
+            logger.warning(f"TMDB {path} failed ({error}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        raise TMDBError(f"{path} failed after {self.max_retries + 1} attempts: {error}")
+
+    @staticmethod
+    def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+        """
+        Seconds to wait before retry `attempt` + 1: Retry-After if it is a sane
+        number of seconds, exponential backoff with jitter otherwise. At most
+        MAX_RETRY_DELAY either way.
+        """
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = math.nan
+        if not 0 <= delay < math.inf:
+            delay = 0.5 * 2 ** attempt * random.uniform(0.5, 1.0)
+        return min(delay, MAX_RETRY_DELAY)
+
+    async def search_tv_show(self, query: str) -> Optional[List[Dict]]:
         """
         Search for a TV show by name.
+        Returns None if the request failed (as opposed to [] for no results).
         """
         try:
-            results = self.tv_api.search(query)
-            return [
-                {
-                    "id": show.id,
-                    "name": show.name,
-                    "overview": getattr(show, 'overview', ''),
-                    "poster_path": getattr(show, 'poster_path', None),
-                    "backdrop_path": getattr(show, 'backdrop_path', None),
-                    "first_air_date": getattr(show, 'first_air_date', None),
-                    "vote_average": getattr(show, 'vote_average', 0.0)
-                }
-                for show in results
-            ]
-        except Exception as e:
+            return await self.fetch_search_tv_show(query)
+        except TMDBError as e:
             logger.error(f"Error searching TMDB for '{query}': {e}")
-            return []
+            return None
+
+    async def fetch_search_tv_show(self, query: str) -> List[Dict]:
+        """
+        Like search_tv_show, but raises TMDBError if the request failed.
+        """
+        data = await self._get("/search/tv", query=query)
+        return [
+            {
+                "id": show["id"],
+                "name": show["name"],
+                "overview": show.get("overview", ""),
+                "poster_path": show.get("poster_path"),
+                "backdrop_path": show.get("backdrop_path"),
+                "first_air_date": show.get("first_air_date"),
+                "vote_average": show.get("vote_average", 0.0)
+            }
+            for show in (data or {}).get("results", [])
+        ]
 
-    def get_show_details(self, tmdb_id: int) -> Optional[Dict]:
+    async def get_show_details(self, tmdb_id: int) -> Optional[Dict]:
         """
         Get detailed info about a show.
         """
         try:
-            show = self.tv_api.details(tmdb_id)
-            return {
-                "id": show.id,
-                "name": show.name,
-                "overview": show.overview,
-                "poster_path": show.poster_path,
-                "backdrop_path": show.backdrop_path,
-                "first_air_date": show.first_air_date,
-                "vote_average": show.vote_average,
-                "number_of_seasons": show.number_of_seasons,
-                "status": show.status
-            }
-        except Exception as e:
+            return await self.fetch_show_details(tmdb_id)
+        except TMDBError as e:
             logger.error(f"Error getting details for ID {tmdb_id}: {e}")
             return None
 
-    def get_season_details(self, tmdb_id: int, season_number: int) -> Optional[Dict]:
+    async def fetch_show_details(self, tmdb_id: int) -> Optional[Dict]:
+        """
+        Like get_show_details, but raises TMDBError if the request failed.
+        None means TMDB does not know the show.
+        """
+        show = await self._get(f"/tv/{tmdb_id}")
+        if not show:
+            return None
+        return {
+            "id": show["id"],
+            "name": show["name"],
+            "overview": show.get("overview"),
+            "poster_path": show.get("poster_path"),
+            "backdrop_path": show.get("backdrop_path"),
+            "first_air_date": show.get("first_air_date"),
+            "vote_average": show.get("vote_average"),
+            "number_of_seasons": show.get("number_of_seasons"),
+            "status": show.get("status")
+        }
+
+    async def get_season_details(self, tmdb_id: int, season_number: int) -> Optional[Dict]:
         """
         Get info about a specific season.
         """
         try:
-            season = self.season_api.details(tmdb_id, season_number)
-            return {
-                "id": season.id,
-                "name": season.name,
-                "overview": season.overview,
-                "poster_path": season.poster_path,
-                "air_date": season.air_date,
-                "season_number": season.season_number,
-                "episodes": [
-                    {
-                        "episode_number": ep.episode_number,
-                        "name": ep.name,
-                        "overview": ep.overview,
-                        "still_path": ep.still_path,
-                        "air_date": ep.air_date,
-                        "runtime": getattr(ep, 'runtime', None)
-                    }
-                    for ep in season.episodes
-                ]
-            }
-        except Exception as e:
+            return await self.fetch_season_details(tmdb_id, season_number)
+        except TMDBError as e:
             logger.error(f"Error getting season {season_number} for show {tmdb_id}: {e}")
             return None
 
+    async def fetch_season_details(self, tmdb_id: int, season_number: int) -> Optional[Dict]:
+        """
+        Like get_season_details, but raises TMDBError if the request failed.
+        None means TMDB does not know the season.
+        """
+        season = await self._get(f"/tv/{tmdb_id}/season/{season_number}")
+        if not season:
+            return None
+        return {
+            "id": season.get("id"),
+            "name": season.get("name"),
+            "overview": season.get("overview"),
+            "poster_path": season.get("poster_path"),
+            "air_date": season.get("air_date"),
+            "season_number": season.get("season_number", season_number),
+            "episodes": [
+                {
+                    "episode_number": ep["episode_number"],
+                    "name": ep.get("name"),
+                    "overview": ep.get("overview"),
+                    "still_path": ep.get("still_path"),
+                    "air_date": ep.get("air_date"),
+                    "runtime": ep.get("runtime")
+                }
+                for ep in season.get("episodes", [])
+            ]
+        }
+
 # Singleton instance
-tmdb_client = TMDBClient(settings.TMDB_API_KEY)
+tmdb_client = TMDBClient(
+    settings.TMDB_API_KEY,
+    base_url=settings.TMDB_API_URL,
+    language=settings.TMDB_LANGUAGE,
+    rate_limit=settings.TMDB_RATE_LIMIT,
+    max_retries=settings.TMDB_MAX_RETRIES,
+)
@@ -0,0 +1,119 @@
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.ingest.telemetry import count
+from app.utils.redis_client import redis_client
+from app.utils.singleflight import SingleFlight
+from app.utils.tmdb import TMDBClient, TMDBError, tmdb_client
+
+logger = logging.getLogger(__name__)
+
+# Key Prefix
+TMDB_KEY_PREFIX = "tmdb:"
+
+def normalize_query(query: str) -> str:
+    """
+    "The.Office (US)" and "the office us" are the same search.
+    """
+    return " ".join(re.sub(r"[\W_]+", " ", query.casefold()).split())
+
+class TMDBCache:
+    """
+    Caching layer in front of TMDBClient for the batch import.
+    Tier 1 is an in-process LRU, tier 2 is Redis (shared between workers/restarts).
+    Searches are keyed by normalized query, details by tmdb_id and seasons by
+    (tmdb_id, season). A search without results and a show or season TMDB does
+    not know (404, cached as None) are kept for `negative_ttl`, failed requests
+    are not cached at all.
+    Concurrent misses for the same key collapse into a single TMDB call, so a
+    batch of one show costs one search, one details and one call per season.
+    Returned values are shared: do not modify them.
+    """
+
+    def __init__(self, client: TMDBClient, max_entries: int, ttl: int, negative_ttl: int):
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def search_tv_show(self, query: str) -> Optional[List[Dict]]:
+        key = f"search:{self.client.language}:{normalize_query(query)}"
+        return await self._get(key, lambda: self.client.fetch_search_tv_show(query))
+
+    async def get_show_details(self, tmdb_id: int) -> Optional[Dict]:
+        key = f"show:{self.client.language}:{tmdb_id}"
+        return await self._get(key, lambda: self.client.fetch_show_details(tmdb_id))
+
+    async def get_season_details(self, tmdb_id: int, season_number: int, refresh: bool = False) -> Optional[Dict]:
+        """
+        `refresh=True` asks TMDB even if the season is cached, and replaces the
+        cached entry (e.g. to repair placeholders imported from an old response).
+        """
+        key = f"season:{self.client.language}:{tmdb_id}:{season_number}"
+        return await self._get(key, lambda: self.client.fetch_season_details(tmdb_id, season_number), refresh)
+
+    async def _get(self, key: str, fetch: Callable[[], Awaitable[Any]], refresh: bool = False) -> Any:
+        # Batch telemetry: cache hits are lookups minus misses (TMDB requests)
+        count("tmdb_lookups")
+        if refresh:
+            return await self._flight.do(("refresh", key), lambda: self._load(key, fetch, refresh))
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+        return await self._flight.do(key, lambda: self._load(key, fetch))
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[Any]], refresh: bool = False) -> Any:
+        redis_key = f"{TMDB_KEY_PREFIX}{key}"
+        try:
+            if not refresh:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    raw, remaining = await pipe.get(redis_key).ttl(redis_key).execute()
+                if raw and remaining and remaining > 0:
+                    value = json.loads(raw)
+                    # Keep the local copy no longer than the shared one
+                    self._set_local(key, value, remaining)
+                    return value
+        except Exception as e:
+            logger.warning(f"TMDB cache: Redis read failed: {e}")
+
+        count("tmdb_misses")
+        try:
+            value = await fetch()
+        except TMDBError as e:
+            # Request failed: try again next time
+            logger.error(f"TMDB request for {key} failed: {e}")
+            return None
+
+        # Not found (None) and no results ([]) may change soon: negative TTL
+        ttl = self.ttl if value else self.negative_ttl
+        self._set_local(key, value, ttl)
+        try:
+            await redis_client.set(redis_key, json.dumps(value), ex=ttl)
+        except Exception as e:
+            logger.warning(f"TMDB cache: Redis write failed: {e}")
+        return value
+
+    def _set_local(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+# Singleton instance
+tmdb_cache = TMDBCache(
+    tmdb_client,
+    max_entries=settings.TMDB_CACHE_SIZE,
+    ttl=settings.TMDB_CACHE_TTL,
+    negative_ttl=settings.TMDB_CACHE_NEGATIVE_TTL,
+)
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Classic token bucket. The rate can change at runtime (e.g. stream fair share updates).
+    A rate of 0 means unlimited. Callers going over the budget sleep until their
+    tokens are available, so concurrent callers are spaced out at `rate`.
+    """
+
+    def __init__(self, rate: float, burst_seconds: float):
+        self.burst_seconds = burst_seconds
+        self.rate = rate
+        self.tokens = rate * burst_seconds
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate: float):
+        self._refill()
+        if self.rate <= 0:
+            # Start with a full burst
+            self.tokens = rate * self.burst_seconds
+        self.rate = rate
+        self.tokens = min(self.tokens, rate * self.burst_seconds)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.rate * self.burst_seconds, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, amount: int):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
@@ -0,0 +1,117 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union, get_args, get_origin
+
+from beanie import Document
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.config import settings
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """A page of a list endpoint. Pass `next_cursor` as `cursor` for the next one."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+    @classmethod
+    def of(cls, items: List[T], next_cursor: Optional[str]) -> "Page[T]":
+        return cls(items=items, next_cursor=next_cursor, has_more=next_cursor is not None)
+
+def page_size(limit: Optional[int]) -> int:
+    """The requested page size, LIST_PAGE_SIZE by default, at most LIST_MAX_PAGE_SIZE."""
+    if limit is None:
+        return settings.LIST_PAGE_SIZE
+    return max(1, min(limit, settings.LIST_MAX_PAGE_SIZE))
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor: the sort key values of the last document of a page."""
+    return base64.urlsafe_b64encode(json_util.dumps(list(values)).encode()).decode().rstrip("=")
+
+def key_types(model: Type[Document], sort: List[Tuple[str, int]]) -> List[Tuple[type, ...]]:
+    """The types a cursor may hold for each field of `sort` (None for optional fields)."""
+    types = []
+    for field, _ in sort:
+        if field == "_id":
+            types.append((ObjectId,))
+            continue
+        annotation = model.model_fields[field].annotation
+        allowed: Tuple[type, ...] = ()
+        if get_origin(annotation) is Union:
+            args = get_args(annotation)
+            if type(None) in args:
+                allowed += (type(None),)
+            annotation = next(arg for arg in args if arg is not type(None))
+        if annotation is float:
+            allowed += (int, float)
+        elif annotation in (int, str, datetime, ObjectId):
+            allowed += (annotation,)
+        else:
+            raise TypeError(f"{model.__name__}.{field} cannot be a sort key")
+        types.append(allowed)
+    return types
+
+def decode_cursor(cursor: str, types: List[Tuple[type, ...]]) -> List[Any]:
+    """
+    The sort key values of a cursor. They end up in the query, so only plain
+    values of the field's type are accepted (no operators, regexes, ...).
+    """
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for value, allowed in zip(values, types):
+        if isinstance(value, bool) or not isinstance(value, allowed):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def after(sort: List[Tuple[str, int]], values: List[Any], nullable: Sequence[bool] = ()) -> Dict:
+    """
+    Filter for the documents after `values` in `sort` order, e.g. for
+    (name, 1), (_id, 1): name > v0, or name == v0 and _id > v1.
+    MongoDB sorts null before any value, but $gt/$lt never match null: for
+    `nullable` fields "after null" is "not null" (ascending) and "after v"
+    includes null (descending).
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        prefix = {sort[j][0]: values[j] for j in range(i)}
+        may_be_null = i < len(nullable) and nullable[i]
+        if values[i] is None:
+            if direction > 0:
+                branches.append({**prefix, field: {"$ne": None}})
+            # Descending, nulls come last: nothing after null but other nulls
+            continue
+        branches.append({**prefix, field: {"$gt" if direction > 0 else "$lt": values[i]}})
+        if may_be_null and direction < 0:
+            branches.append({**prefix, field: None})
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+async def keyset_page(
+    model: Type[Document], query: Dict, sort: List[Tuple[str, int]], cursor: Optional[str], limit: int,
+    projection_model: Optional[Type[BaseModel]] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `model` (or `projection_model`) in `sort` order, which has to
+    end with _id so the key is unique, and the cursor of the next page (None
+    on the last one). Resuming after the last key instead of skipping costs
+    the same on every page, and documents inserted meanwhile do not shift pages.
+    """
+    if cursor:
+        types = key_types(model, sort)
+        values = decode_cursor(cursor, types)
+        query = {"$and": [query, after(sort, values, [type(None) in allowed for allowed in types])]}
+    items = await model.find(query, projection_model=projection_model).sort(sort).limit(limit + 1).to_list()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor([getattr(last, "id" if field == "_id" else field) for field, _ in sort])
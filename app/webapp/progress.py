@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.ingest.writer import DUPLICATE_KEY
+from app.models import WatchProgress
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Key Prefixes
+PENDING_KEY_PREFIX = "progress:pending:"  # Hash per user: episode_id -> latest heartbeat
+DIRTY_KEY = "progress:dirty"  # Set of users with pending heartbeats
+
+# user_id -> episode_id -> {"position", "duration", "updated_at"}
+Pending = Dict[str, Dict[str, Dict]]
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for player heartbeats.
+
+    A heartbeat only overwrites the user's entry for the episode in a Redis
+    hash, so any number of heartbeats between two flushes costs one write.
+    Every `interval` seconds the pending entries are taken out of Redis
+    (atomically, per user) and written with one unordered bulk_write of $set
+    upserts on (user_id, episode_id). The filter only matches older entries:
+    a stale heartbeat (another tab, another process flushing late) loses
+    against a newer one instead of overwriting it.
+
+    Entries that could not be written go back to the buffer. If Redis is
+    unreachable, heartbeats are written to MongoDB directly.
+    """
+
+    def __init__(self, interval: float, batch: int):
+        self.interval = interval
+        self.batch = batch
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Watch progress: final flush failed: {e}")
+
+    async def record(self, user_id: int, episode_id: str, position: float, duration: Optional[float]):
+        entry = {"position": position, "duration": duration, "updated_at": time.time()}
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(f"{PENDING_KEY_PREFIX}{user_id}", episode_id, json.dumps(entry))
+                pipe.sadd(DIRTY_KEY, user_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Watch progress: Redis write failed, writing through: {e}")
+            await self._write({str(user_id): {episode_id: entry}})
+
+    async def flush(self):
+        """Writes everything pending."""
+        while True:
+            users = await redis_client.spop(DIRTY_KEY, self.batch)
+            if not users:
+                return
+            await self._flush_users(users)
+
+    async def flush_user(self, user_id: int):
+        """Writes a user's pending heartbeats (before reading their progress)."""
+        try:
+            await self._flush_users([str(user_id)])
+        except Exception as e:
+            logger.warning(f"Watch progress: flush of user {user_id} failed: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Watch progress flush failed: {e}")
+
+    async def _flush_users(self, users: List[str]):
+        # Read and delete in one transaction: heartbeats arriving meanwhile start a new hash
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for user_id in users:
+                key = f"{PENDING_KEY_PREFIX}{user_id}"
+                pipe.hgetall(key)
+                pipe.delete(key)
+            results = await pipe.execute()
+
+        pending: Pending = {}
+        for user_id, entries in zip(users, results[::2]):
+            if entries:
+                pending[user_id] = {episode_id: json.loads(raw) for episode_id, raw in entries.items()}
+        if pending:
+            failed = await self._write(pending)
+            if failed:
+                await self._restore(failed)
+
+    @staticmethod
+    async def _write(pending: Pending) -> Pending:
+        """Upserts the entries, returns those that failed."""
+        operations, keys = [], []
+        for user_id, entries in pending.items():
+            for episode_id, entry in entries.items():
+                updated_at = datetime.utcfromtimestamp(entry["updated_at"])
+                operations.append(UpdateOne(
+                    {"user_id": int(user_id), "episode_id": ObjectId(episode_id), "updated_at": {"$lt": updated_at}},
+                    {"$set": {"position": entry["position"], "duration": entry["duration"], "updated_at": updated_at}},
+                    upsert=True,
+                ))
+                keys.append((user_id, episode_id))
+
+        failed_indexes: List[int] = []
+        try:
+            await WatchProgress.get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A duplicate key means a newer entry is stored: nothing to do
+            failed_indexes = [
+                error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY
+            ]
+            if failed_indexes:
+                logger.error(f"Watch progress: {len(failed_indexes)} of {len(operations)} writes failed")
+        except Exception as e:
+            logger.error(f"Watch progress: write of {len(operations)} entries failed: {e}")
+            failed_indexes = list(range(len(operations)))
+
+        failed: Pending = {}
+        for index in failed_indexes:
+            user_id, episode_id = keys[index]
+            failed.setdefault(user_id, {})[episode_id] = pending[user_id][episode_id]
+        return failed
+
+    @staticmethod
+    async def _restore(failed: Pending):
+        """Puts entries back for the next flush, unless a newer heartbeat came in."""
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for user_id, entries in failed.items():
+                    for episode_id, entry in entries.items():
+                        pipe.hsetnx(f"{PENDING_KEY_PREFIX}{user_id}", episode_id, json.dumps(entry))
+                    pipe.sadd(DIRTY_KEY, user_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Watch progress: lost {sum(map(len, failed.values()))} entries: {e}")
+
+# Singleton instance
+progress_buffer = ProgressBuffer(settings.PROGRESS_FLUSH_INTERVAL, settings.PROGRESS_FLUSH_BATCH)
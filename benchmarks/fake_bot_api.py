@@ -0,0 +1,106 @@
+"""
+Local stand-in for the Telegram Bot API, used by the streaming benchmarks.
+
+Serves `getFile` and `/file/bot<token>/<path>` (with Range support) for
+synthetic files. Latency and bandwidth are configurable to mimic slow
+Telegram edges. File contents are deterministic, so clients can verify bytes.
+
+    python -m benchmarks.fake_bot_api --port 8081 --latency 0.05 --bandwidth 20000000
+"""
+import argparse
+import asyncio
+import os
+from typing import Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import uvicorn
+
+# Content is this pseudo random block, repeated
+PATTERN = bytes((i * 7919 + (i >> 8) * 31) % 251 for i in range(64 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+def file_bytes(start: int, end: int) -> bytes:
+    """
+    Bytes [start, end] of every synthetic file.
+    """
+    length = end - start + 1
+    offset = start % len(PATTERN)
+    repeats = (offset + length) // len(PATTERN) + 1
+    return (PATTERN * repeats)[offset:offset + length]
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    if not header or not header.startswith("bytes="):
+        return None
+    first, _, last = header[len("bytes="):].partition("-")
+    if first == "":
+        return max(size - int(last), 0), size - 1
+    return int(first), min(int(last) if last else size - 1, size - 1)
+
+def create_app(file_size: int, latency: float, bandwidth: int, max_file_size: int = 0) -> FastAPI:
+    """
+    `bandwidth` is per connection in bytes/s (0 = unlimited).
+    `max_file_size` mimics the cloud Bot API getFile limit (0 = no limit).
+    """
+    app = FastAPI()
+    app.state.stats = {"getFile": 0, "downloads": 0, "bytes": 0}
+
+    @app.get("/bot{token}/getFile")
+    async def get_file(token: str, file_id: str):
+        app.state.stats["getFile"] += 1
+        await asyncio.sleep(latency)
+        if max_file_size and file_size > max_file_size:
+            return JSONResponse({"ok": False, "error_code": 400, "description": "Bad Request: file is too big"}, status_code=400)
+        return {
+            "ok": True,
+            "result": {
+                "file_id": file_id,
+                "file_unique_id": f"u{file_id}",
+                "file_size": file_size,
+                "file_path": f"videos/{file_id}.mp4",
+            },
+        }
+
+    @app.get("/file/bot{token}/{file_path:path}")
+    async def download(token: str, file_path: str, request: Request):
+        app.state.stats["downloads"] += 1
+        byte_range = parse_range(request.headers.get("range"), file_size)
+        if byte_range and byte_range[0] >= file_size:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+        start, end = byte_range or (0, file_size - 1)
+
+        async def body():
+            await asyncio.sleep(latency)
+            for pos in range(start, end + 1, CHUNK_SIZE):
+                chunk = file_bytes(pos, min(pos + CHUNK_SIZE, end + 1) - 1)
+                app.state.stats["bytes"] += len(chunk)
+                if bandwidth:
+                    await asyncio.sleep(len(chunk) / bandwidth)
+                yield chunk
+
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        return StreamingResponse(body(), status_code=206 if byte_range else 200, headers=headers, media_type="video/mp4")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--file-size", type=int, default=int(os.getenv("FAKE_FILE_SIZE", 200 * 1024 * 1024)))
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Bytes/s per connection (0 = unlimited)")
+    parser.add_argument("--max-file-size", type=int, default=0, help="Reject getFile above this size (cloud limit is 20 MB)")
+    args = parser.parse_args()
+
+    app = create_app(args.file_size, args.latency, args.bandwidth, args.max_file_size)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
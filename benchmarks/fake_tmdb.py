@@ -0,0 +1,135 @@
+"""
+Local stand-in for the TMDB v3 API, used by the import benchmarks.
+
+Serves `/search/tv`, `/tv/{id}` and `/tv/{id}/season/{n}` with deterministic
+synthetic shows: every query finds one show whose id is derived from the
+normalized query. Latency, a rate limit (answered with 429 + Retry-After like
+TMDB) and a share of random 5xx errors are configurable.
+
+    python -m benchmarks.fake_tmdb --port 8082 --latency 0.05 --rate-limit 40
+"""
+import argparse
+import asyncio
+import random
+import time
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import uvicorn
+
+EPISODES_PER_SEASON = 24
+
+def show_id(query: str) -> int:
+    normalized = " ".join("".join(c if c.isalnum() else " " for c in query.casefold()).split())
+    return zlib.crc32(normalized.encode()) % 1_000_000 + 1
+
+def create_app(latency: float, rate_limit: float = 0, error_rate: float = 0.0, seed: int = 1) -> FastAPI:
+    """
+    `rate_limit` is in requests/s over a 1s window (0 = unlimited).
+    `error_rate` is the share of requests answered with a random 5xx.
+    """
+    app = FastAPI()
+    app.state.stats = {"search": 0, "details": 0, "season": 0, "rate_limited": 0, "errors": 0}
+    window = {"start": time.monotonic(), "count": 0}
+    rng = random.Random(seed)
+
+    async def gate(kind: str):
+        await asyncio.sleep(latency)
+        if rate_limit:
+            now = time.monotonic()
+            if now - window["start"] >= 1.0:
+                window["start"], window["count"] = now, 0
+            window["count"] += 1
+            if window["count"] > rate_limit:
+                app.state.stats["rate_limited"] += 1
+                return JSONResponse({"status_code": 25, "status_message": "Your request count is over the allowed limit."},
+                                    status_code=429, headers={"Retry-After": "1"})
+        if error_rate and rng.random() < error_rate:
+            app.state.stats["errors"] += 1
+            return JSONResponse({"status_message": "Internal error"}, status_code=rng.choice([500, 502, 503]))
+        app.state.stats[kind] += 1
+        return None
+
+    @app.get("/search/tv")
+    async def search(query: str):
+        error = await gate("search")
+        if error:
+            return error
+        tmdb_id = show_id(query)
+        return {
+            "page": 1,
+            "results": [{
+                "id": tmdb_id,
+                "name": query.title(),
+                "overview": f"Synthetic show {tmdb_id}",
+                "poster_path": f"/p{tmdb_id}.jpg",
+                "backdrop_path": f"/b{tmdb_id}.jpg",
+                "first_air_date": "2020-01-01",
+                "vote_average": 7.5,
+            }],
+            "total_results": 1,
+        }
+
+    @app.get("/tv/{tmdb_id}")
+    async def details(tmdb_id: int):
+        error = await gate("details")
+        if error:
+            return error
+        return {
+            "id": tmdb_id,
+            "name": f"Show {tmdb_id}",
+            "overview": f"Synthetic show {tmdb_id}",
+            "poster_path": f"/p{tmdb_id}.jpg",
+            "backdrop_path": f"/b{tmdb_id}.jpg",
+            "first_air_date": "2020-01-01",
+            "vote_average": 7.5,
+            "number_of_seasons": 10,
+            "status": "Returning Series",
+        }
+
+    @app.get("/tv/{tmdb_id}/season/{season_number}")
+    async def season(tmdb_id: int, season_number: int):
+        error = await gate("season")
+        if error:
+            return error
+        return {
+            "id": tmdb_id * 100 + season_number,
+            "name": f"Season {season_number}",
+            "overview": "",
+            "poster_path": f"/s{tmdb_id}_{season_number}.jpg",
+            "air_date": "2020-01-01",
+            "season_number": season_number,
+            "episodes": [
+                {
+                    "episode_number": n,
+                    "name": f"Episode {n} of show {tmdb_id}",
+                    "overview": f"S{season_number:02d}E{n:02d}",
+                    "still_path": f"/e{tmdb_id}_{season_number}_{n}.jpg",
+                    "air_date": "2020-01-01",
+                    "runtime": 42,
+                }
+                for n in range(1, EPISODES_PER_SEASON + 1)
+            ],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake TMDB API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument("--rate-limit", type=float, default=40, help="Requests/s before answering 429 (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 5xx")
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.rate_limit, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
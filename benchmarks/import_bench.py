@@ -0,0 +1,268 @@
+"""
+Batch import benchmark.
+
+Generates synthetic channel posts (aiogram Messages with a video or document
+and a realistic release name, spread over many shows and seasons) and feeds
+them through app.handlers.channel_post.handle_channel_post during an active
+batch, like a storage channel being filled. The import queue workers,
+tmdb_cache and the import writer run as in the app, against a local fake TMDB
+(benchmarks.fake_tmdb) and a local MongoDB/Redis.
+
+Reports end-to-end files/s, latency p50/p99 of every import stage (parse,
+TMDB search/season, series, season, episode write) and TMDB requests and Mongo
+commands per file.
+
+The Mongo database named in the URI is dropped and the Redis database is
+flushed: point them at scratch instances.
+
+    python -m benchmarks.import_bench --files 2000 --shows 40
+    MONGO_URI=mongodb://127.0.0.1:27017/tsn_bench INGEST_WORKERS=16 python -m benchmarks.import_bench
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.stream_bench import free_port, percentile, wait_for_port
+
+CHANNEL_ID = -1001234567890
+
+SHOW_WORDS = [
+    "Dark", "Silent", "Broken", "Golden", "Last", "Lost", "Hidden", "Northern", "Crimson", "Wild",
+    "River", "Empire", "Kingdom", "Harbor", "Station", "Signal", "Garden", "Legacy", "Frontier", "Tides",
+]
+EPISODE_WORDS = ["Pilot", "Homecoming", "The Long Night", "Reckoning", "Exodus", "Crossroads", "Endgame", "Origins"]
+TAGS = [
+    "720p.HDTV.x264-KILLERS", "1080p.WEB-DL.DD5.1.H.264-NTb", "1080p.AMZN.WEBRip.DDP5.1.x264-NTG",
+    "2160p.NF.WEB-DL.DDP5.1.HDR.HEVC-FLUX", "720p.BluRay.x264-DEMAND", "1080p.BluRay.x265-RARBG",
+]
+GROUPS = ["SubsPlease", "Erai-raws", "EMBER"]
+
+def show_names(count: int, rng: random.Random) -> List[str]:
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(['The ', ''])}{rng.choice(SHOW_WORDS)} {rng.choice(SHOW_WORDS)}")
+    return sorted(names)
+
+def release_name(show: str, season: int, episode: int, rng: random.Random) -> str:
+    """One of the naming schemes found in real channels."""
+    style = rng.random()
+    if style < 0.6:
+        title = rng.choice(EPISODE_WORDS).replace(" ", ".")
+        return f"{show.replace(' ', '.')}.S{season:02d}E{episode:02d}.{title}.{rng.choice(TAGS)}.mkv"
+    if style < 0.75:
+        return f"{show} - {season}x{episode:02d} - {rng.choice(EPISODE_WORDS)}.mp4"
+    if style < 0.9:
+        return f"[{rng.choice(GROUPS)}] {show} - S{season:02d}E{episode:02d} [1080p].mkv"
+    return f"{show.lower().replace(' ', '_')}_s{season}e{episode:02d}_720p.mkv"
+
+def synthetic_posts(args) -> List:
+    from aiogram.types import Chat, Document, Message, Video
+
+    rng = random.Random(args.seed)
+    shows = show_names(args.shows, rng)
+    chat = Chat(id=CHANNEL_ID, type="channel", title="Benchmark Storage")
+    posts, unique_ids = [], []
+    for message_id in range(1, args.files + 1):
+        show = rng.choice(shows)
+        name = release_name(show, rng.randint(1, args.seasons), rng.randint(1, 24), rng)
+        file_unique_id = f"AgAD{message_id:08d}"
+        if unique_ids and rng.random() < args.duplicates:
+            # The same file posted again
+            file_unique_id = rng.choice(unique_ids)
+        unique_ids.append(file_unique_id)
+        fields = dict(
+            file_id=f"BAACAgIAAxkBAAI{message_id:010d}",
+            file_unique_id=file_unique_id,
+            file_name=name,
+            file_size=rng.randint(200, 2500) * 1024 * 1024,
+        )
+        if rng.random() < 0.8:
+            media = {"video": Video(width=1920, height=1080, duration=2600, mime_type="video/x-matroska", **fields)}
+        else:
+            media = {"document": Document(mime_type="video/mp4", **fields)}
+        posts.append(Message(message_id=message_id, date=datetime.now(timezone.utc), chat=chat, **media))
+    return posts
+
+class StageTimer:
+    """Wraps the import stages to record their latency."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, owner, attribute: str, stage: str):
+        original = getattr(owner, attribute)
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+
+        setattr(owner, attribute, timed)
+
+    def report(self) -> Dict[str, str]:
+        report = {}
+        for stage, samples in self.samples.items():
+            samples.sort()
+            report[f"{stage}_ms"] = (
+                f"p50 {percentile(samples, 50) * 1000:.2f}  p99 {percentile(samples, 99) * 1000:.2f}  n={len(samples)}"
+            )
+        return report
+
+async def run(args) -> dict:
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_tmdb",
+        "--port", str(port),
+        "--latency", str(args.tmdb_latency),
+        "--rate-limit", str(args.tmdb_rate_limit),
+    ])
+
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{port}"
+    for key, value in {
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "OWNER_TELEGRAM_ID": "1",
+        "TMDB_API_KEY": "benchmark",
+        "MONGO_URI": "mongodb://127.0.0.1:27017/tsn_import_bench",
+        "REDIS_URL": "redis://127.0.0.1:6379/15",
+        "BASE_URL": "http://127.0.0.1",
+        "SECRET_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # Imported late: settings are read from the environment set above
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import monitoring
+
+    from app.config import settings
+    from app.handlers import batch_import
+    from app.handlers.channel_post import handle_channel_post
+    from app.ingest.queue import import_queue
+    from app.ingest.unsorted import record_unsorted
+    from app.ingest.writer import import_writer
+    from app.migrations import run_migrations
+    from app.models import Bundle, Episode, Season, Series, StorageChannel, UnsortedFile
+    from app.utils.guessit_parser import MediaParser
+    from app.utils.http import close_http_client, init_http_client
+    from app.utils.redis_client import redis_client
+    from app.utils.tmdb_cache import tmdb_cache
+
+    class CommandCounter(monitoring.CommandListener):
+        def __init__(self):
+            self.commands = Counter()
+
+        def started(self, event):
+            self.commands[event.command_name] += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    posts = synthetic_posts(args)
+    mongo_commands = CommandCounter()
+    mongo_client = AsyncIOMotorClient(settings.MONGO_URI, event_listeners=[mongo_commands])
+    db = mongo_client.get_default_database()
+
+    timer = StageTimer()
+    timer.wrap(MediaParser, "parse_filename_async", "parse")
+    timer.wrap(tmdb_cache, "search_tv_show", "tmdb_search")
+    timer.wrap(tmdb_cache, "get_season_details", "tmdb_season")
+    timer.wrap(batch_import, "get_or_create_series", "db_series")
+    timer.wrap(batch_import, "get_or_create_season", "db_season")
+    timer.wrap(import_writer, "add_episode", "db_episode")
+    timer.wrap(batch_import, "process_new_file", "import_total")
+
+    try:
+        await wait_for_port(port)
+        await init_http_client()
+        await mongo_client.drop_database(db.name)
+        await redis_client.flushdb()
+        await run_migrations(db)
+        await init_beanie(database=db, document_models=[StorageChannel, Bundle, Series, Season, Episode, UnsortedFile])
+
+        await StorageChannel(channel_id=CHANNEL_ID, name="Benchmark Storage").insert()
+        bundle = await Bundle(name="Benchmark", slug="benchmark").insert()
+        await batch_import.start_batch(CHANNEL_ID, str(bundle.id))
+        await import_queue.reset_progress(CHANNEL_ID)
+        await import_queue.start(batch_import.process_new_file, on_give_up=record_unsorted)
+        mongo_commands.commands.clear()
+
+        started = time.perf_counter()
+        for message in posts:
+            await handle_channel_post(message)
+        posted = time.perf_counter() - started
+
+        deadline = time.monotonic() + args.timeout
+        while True:
+            progress = await import_queue.progress(CHANNEL_ID)
+            if progress["remaining"] == 0 and progress["received"] >= len(posts):
+                break
+            if time.monotonic() > deadline:
+                print(f"Timed out: {progress}")
+                break
+            await asyncio.sleep(0.02)
+        duration = time.perf_counter() - started
+
+        async with httpx.AsyncClient() as client:
+            tmdb_stats = (await client.get(f"http://127.0.0.1:{port}/stats")).json()
+        episodes = await Episode.count()
+        series = await Series.count()
+        seasons = await Season.count()
+    finally:
+        await import_queue.close()
+        await import_writer.close()
+        MediaParser.shutdown()
+        await close_http_client()
+        server.terminate()
+        server.wait(timeout=10)
+
+    files = len(posts)
+    tmdb_requests = tmdb_stats["search"] + tmdb_stats["details"] + tmdb_stats["season"] + tmdb_stats["rate_limited"]
+    return {
+        "files": files,
+        "imported": progress["imported"],
+        "duplicates": progress["duplicates"],
+        "unsorted": progress["unsorted"],
+        "failed": progress["failed"],
+        "episodes/series/seasons": f"{episodes}/{series}/{seasons}",
+        "post_files_per_s": files / posted,
+        "import_files_per_s": files / duration,
+        **timer.report(),
+        "tmdb_requests_per_file": tmdb_requests / files,
+        "tmdb_429": tmdb_stats["rate_limited"],
+        "mongo_commands_per_file": sum(mongo_commands.commands.values()) / files,
+        "mongo_commands": ", ".join(f"{name}={count}" for name, count in mongo_commands.commands.most_common()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batch import with synthetic channel posts")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--shows", type=int, default=30)
+    parser.add_argument("--seasons", type=int, default=4, help="Seasons per show")
+    parser.add_argument("--duplicates", type=float, default=0.02, help="Share of files posted twice")
+    parser.add_argument("--tmdb-latency", type=float, default=0.05, help="Fake TMDB latency (s)")
+    parser.add_argument("--tmdb-rate-limit", type=float, default=40, help="Fake TMDB requests/s before 429")
+    parser.add_argument("--timeout", type=float, default=600, help="Give up waiting for the import after (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:24} {value:.2f}" if isinstance(value, float) else f"{key:24} {value}")
+
+if __name__ == "__main__":
+    main()
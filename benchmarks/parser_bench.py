@@ -0,0 +1,107 @@
+"""
+Filename parser benchmark.
+
+Parses a corpus of real release names (benchmarks/data/filenames.txt) with
+plain guessit and with app.utils.guessit_parser.MediaParser (fast path,
+guessit fallback in the parser process pool, memo), checks that both give the
+same result and reports files/s for each.
+
+    python -m benchmarks.parser_bench --rounds 20
+    python -m benchmarks.parser_bench --corpus my_channel_dump.txt --show-mismatches
+"""
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "filenames.txt"
+
+def load_corpus(path: Path) -> list:
+    lines = (line.strip() for line in path.read_text(encoding="utf-8").splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+async def run(args) -> dict:
+    for key, value in {
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "OWNER_TELEGRAM_ID": "1",
+        "TMDB_API_KEY": "benchmark",
+        "MONGO_URI": "mongodb://127.0.0.1:27017",
+        "REDIS_URL": "redis://127.0.0.1:6379/0",
+        "BASE_URL": "http://127.0.0.1",
+        "SECRET_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # Imported late: settings are read from the environment set above
+    from app.config import settings
+    from app.utils.guessit_parser import MediaParser, parse_fast, parse_guessit
+
+    names = load_corpus(Path(args.corpus))
+
+    # Reference: guessit for every file
+    started = time.perf_counter()
+    expected = {name: parse_guessit(name) for name in names}
+    guessit_duration = time.perf_counter() - started
+
+    fast_hits = [name for name in names if parse_fast(name) is not None]
+    mismatches = [
+        (name, parse_fast(name), expected[name])
+        for name in fast_hits if parse_fast(name) != expected[name]
+    ]
+
+    # Cold: each name seen once (fast path + process pool fallback).
+    # The pool lives as long as the app, so it is started before timing.
+    await asyncio.gather(*[
+        MediaParser.parse_filename_async(f"warm up {i}.mkv") for i in range(max(settings.PARSER_PROCESSES, 1))
+    ])
+    MediaParser._memo.clear()
+    started = time.perf_counter()
+    cold = await asyncio.gather(*[MediaParser.parse_filename_async(name) for name in names])
+    cold_duration = time.perf_counter() - started
+    mismatches += [(name, got, expected[name]) for name, got in zip(names, cold) if got != expected[name]]
+
+    # Fast path alone (no memo), then a warm memo as seen on retries and re-runs
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for name in fast_hits:
+            parse_fast(name)
+    fast_duration = (time.perf_counter() - started) / args.rounds
+
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for name in names:
+            await MediaParser.parse_filename_async(name)
+    warm_duration = (time.perf_counter() - started) / args.rounds
+    MediaParser.shutdown()
+
+    if args.show_mismatches:
+        for name, got, want in mismatches:
+            print(f"MISMATCH {name}\n  fast:    {got}\n  guessit: {want}")
+
+    return {
+        "files": len(names),
+        "fast_path_hits": len(fast_hits),
+        "fast_path_share": len(fast_hits) / len(names),
+        "mismatches": len(mismatches),
+        "guessit_files_per_s": len(names) / guessit_duration,
+        "fast_path_files_per_s": len(fast_hits) / fast_duration if fast_hits else 0.0,
+        "cold_files_per_s": len(names) / cold_duration,
+        "warm_files_per_s": len(names) / warm_duration,
+        "speedup_cold": guessit_duration / cold_duration,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the filename parser against plain guessit")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="One filename per line")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--show-mismatches", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:22} {value:.2f}" if isinstance(value, float) else f"{key:22} {value}")
+
+if __name__ == "__main__":
+    main()
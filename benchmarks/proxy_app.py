@@ -0,0 +1,25 @@
+"""
+Minimal app serving only the WebApp routes (and so the streaming proxy),
+without the bot polling loop. Started by benchmarks.stream_bench.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.config import settings
+from app.streaming.lifecycle import start_streaming, stop_streaming
+from app.utils.http import init_http_client, close_http_client
+from app.utils.logging import setup_logging
+from app.webapp.routes import router as webapp_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging(level=settings.LOG_LEVEL)
+    await init_http_client()
+    await start_streaming()
+    yield
+    await stop_streaming()
+    await close_http_client()
+
+app = FastAPI(title="TSN Streaming Benchmark", lifespan=lifespan)
+app.include_router(webapp_router)
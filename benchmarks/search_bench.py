@@ -0,0 +1,162 @@
+"""
+Search benchmark.
+
+Builds the in-memory search index (app.search) from a synthetic library
+(default: 2,000 series with 50 episodes each = 100k episodes, with names and
+overviews drawn from a large generated vocabulary) and runs a mix of queries
+through SearchEngine.search like the /webapp/search endpoint does: whole
+words, typed prefixes ("br", "brok"), multi-word queries and misses.
+
+Reports index build time and memory, and p50/p99 latency per query kind.
+No MongoDB or Redis is needed.
+
+    python -m benchmarks.search_bench
+    python -m benchmarks.search_bench --series 5000 --episodes 40 --queries 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks.stream_bench import percentile, rss_bytes
+
+SYLLABLES = [
+    "ka", "ra", "to", "mi", "len", "dor", "va", "shi", "bel", "tor", "an", "mar", "os", "el", "quin",
+    "ri", "sa", "gen", "lo", "cor", "ya", "thu", "na", "ber", "is", "om", "zel", "pa", "dre", "ve",
+]
+COMMON_WORDS = [
+    "the", "of", "and", "a", "in", "to", "night", "last", "house", "war", "lost", "city", "dark", "blood",
+    "king", "queen", "return", "secret", "family", "game", "road", "fire", "water", "heart", "stranger",
+]
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    # Shuffled: how common a word is does not depend on its spelling
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+def phrase(words: List[str], length: int, rng: random.Random) -> str:
+    # Zipf-like: a few words are common, most are rare
+    picked = [
+        rng.choice(COMMON_WORDS) if rng.random() < 0.3 else words[int(len(words) * rng.random() ** 2)]
+        for _ in range(length)
+    ]
+    return " ".join(picked).capitalize()
+
+def synthetic_library(args, SearchDocument) -> Tuple[list, List[str]]:
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+    documents = []
+    for s in range(args.series):
+        series_id = f"{s:024x}"
+        name = phrase(words, rng.randint(1, 3), rng)
+        series = SearchDocument(kind="series", id=series_id, name=name, series_id=series_id, series_name=name)
+        documents.append((series, phrase(words, 30, rng)))
+        for e in range(args.episodes):
+            episode = SearchDocument(
+                kind="episode", id=f"{s:012x}{e:012x}", name=phrase(words, rng.randint(1, 4), rng),
+                series_id=series_id, series_name=series.name,
+                season_number=e // 10 + 1, episode_number=e % 10 + 1, file_unique_id=f"AgAD{s:06d}{e:04d}",
+            )
+            documents.append((episode, phrase(words, 25, rng)))
+    return documents, words
+
+def queries(documents: list, words: List[str], count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """(kind, query) pairs, as typed by users."""
+    names = [document.name for document, _ in documents]
+    series_names = [document.name for document, _ in documents if document.kind == "series"]
+    mix = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            mix.append(("series_name", rng.choice(series_names)))
+        elif roll < 0.5:
+            mix.append(("episode_name", rng.choice(names)))
+        elif roll < 0.8:
+            # Typing: the first 2-5 characters of a word, sometimes after a whole word
+            name = rng.choice(series_names).split()
+            prefix = name[-1][:rng.randint(2, 5)]
+            mix.append(("prefix", " ".join(name[:-1] + [prefix]) if rng.random() < 0.5 else prefix))
+        elif roll < 0.9:
+            mix.append(("two_words", f"{rng.choice(words)} {rng.choice(COMMON_WORDS)}"))
+        else:
+            mix.append(("miss", f"zz{rng.choice(words)}"))
+    return mix
+
+async def run(args) -> dict:
+    for key, value in {
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "OWNER_TELEGRAM_ID": "1",
+        "TMDB_API_KEY": "benchmark",
+        "MONGO_URI": "mongodb://127.0.0.1:27017",
+        "REDIS_URL": "redis://127.0.0.1:6379/0",
+        "BASE_URL": "http://127.0.0.1",
+        "SECRET_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # Imported late: settings are read from the environment set above
+    from app.config import settings
+    from app.search.engine import search_engine
+    from app.search.index import SearchDocument, SearchIndex
+
+    rng = random.Random(args.seed)
+    documents, words = synthetic_library(args, SearchDocument)
+    mix = queries(documents, words, args.queries, rng)
+
+    rss_before = rss_bytes(os.getpid())
+    started = time.perf_counter()
+    index = SearchIndex()
+    index.bulk_load(documents)
+    build_duration = time.perf_counter() - started
+    rss_after = rss_bytes(os.getpid())
+
+    search_engine.index = index
+    search_engine.ready = True
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    matches: Dict[str, int] = defaultdict(int)
+    for kind, query in mix:
+        started = time.perf_counter()
+        page = await search_engine.search(query, 0, settings.SEARCH_PAGE_SIZE)
+        latencies[kind].append(time.perf_counter() - started)
+        matches[kind] += page["total"]
+
+    report = {
+        "series/episodes": f"{args.series}/{args.series * args.episodes}",
+        "index_build_s": build_duration,
+        "index_docs_per_s": len(documents) / build_duration,
+        "index_rss_mb": (rss_after - rss_before) / 1e6,
+    }
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    report["all_ms"] = f"p50 {percentile(everything, 50) * 1000:.2f}  p99 {percentile(everything, 99) * 1000:.2f}"
+    for kind, samples in sorted(latencies.items()):
+        samples.sort()
+        report[f"{kind}_ms"] = (
+            f"p50 {percentile(samples, 50) * 1000:.2f}  p99 {percentile(samples, 99) * 1000:.2f}  "
+            f"n={len(samples)} avg_matches={matches[kind] / len(samples):.0f}"
+        )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search index on a synthetic library")
+    parser.add_argument("--series", type=int, default=2000)
+    parser.add_argument("--episodes", type=int, default=50, help="Episodes per series")
+    parser.add_argument("--vocabulary", type=int, default=40000, help="Distinct generated words")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:18} {value:.2f}" if isinstance(value, float) else f"{key:18} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Streaming proxy benchmark.
+
+Starts a local fake Bot API (benchmarks.fake_bot_api) and the proxy
+(benchmarks.proxy_app) as separate processes, then drives /webapp/stream with
+realistic player patterns:
+
+  sequential  every viewer plays a file from the start (open-ended range)
+  seek        every viewer jumps to random positions (bounded ranges)
+  concurrent  many viewers start the same episode at once (release night)
+
+Reports TTFB, latency p50/p99, throughput, upstream bytes, and CPU/memory of
+the proxy process per stream.
+
+    python -m benchmarks.stream_bench --scenario all --viewers 8 --latency 0.05
+    STREAM_CACHE_MAX_BYTES=0 python -m benchmarks.stream_bench --scenario seek
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_bot_api import file_bytes
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+@dataclass
+class Sample:
+    ttfb: float
+    latency: float
+    size: int
+    ok: bool = True
+
+@dataclass
+class ScenarioResult:
+    name: str
+    streams: int
+    samples: List[Sample] = field(default_factory=list)
+    duration: float = 0.0
+    upstream_bytes: int = 0
+    cpu_seconds: float = 0.0
+    peak_rss: int = 0
+
+    def report(self) -> Dict:
+        ttfbs = sorted(s.ttfb for s in self.samples)
+        latencies = sorted(s.latency for s in self.samples)
+        delivered = sum(s.size for s in self.samples)
+        return {
+            "scenario": self.name,
+            "requests": len(self.samples),
+            "errors": sum(1 for s in self.samples if not s.ok),
+            "ttfb_p50_ms": percentile(ttfbs, 50) * 1000,
+            "ttfb_p99_ms": percentile(ttfbs, 99) * 1000,
+            "latency_p50_ms": percentile(latencies, 50) * 1000,
+            "latency_p99_ms": percentile(latencies, 99) * 1000,
+            "throughput_mb_s": delivered / self.duration / 1e6 if self.duration else 0,
+            "delivered_mb": delivered / 1e6,
+            "upstream_mb": self.upstream_bytes / 1e6,
+            "cpu_ms_per_stream": self.cpu_seconds * 1000 / max(self.streams, 1),
+            "peak_rss_mb": self.peak_rss / 1e6,
+            "rss_mb_per_stream": self.peak_rss / 1e6 / max(self.streams, 1),
+        }
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of the full line
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+async def wait_for_port(port: int, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.api_port = free_port()
+        self.proxy_port = free_port()
+        self.processes: List[subprocess.Popen] = []
+        self.cache_dir = tempfile.mkdtemp(prefix="tsn_bench_cache_")
+
+    async def start(self):
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_bot_api",
+            "--port", str(self.api_port),
+            "--file-size", str(self.args.file_size),
+            "--latency", str(self.args.latency),
+            "--bandwidth", str(self.args.bandwidth),
+        ]))
+
+        env = dict(os.environ)
+        env["TELEGRAM_API_URL"] = f"http://127.0.0.1:{self.api_port}"
+        env.setdefault("STREAM_CACHE_DIR", self.cache_dir)
+        # Every benchmark viewer comes from 127.0.0.1, do not let per-user caps queue them
+        env.setdefault("STREAM_MAX_PER_USER", "0")
+        env.setdefault("STREAM_MAX_CONCURRENT", "0")
+        env.setdefault("LOG_LEVEL", "WARNING")
+        for key, value in {
+            "BOT_TOKEN": "123456:BENCHMARK",
+            "OWNER_TELEGRAM_ID": "1",
+            "TMDB_API_KEY": "benchmark",
+            "MONGO_URI": "mongodb://127.0.0.1:27017",
+            "REDIS_URL": "redis://127.0.0.1:6379/0",
+            "BASE_URL": "http://127.0.0.1",
+            "SECRET_KEY": "benchmark",
+        }.items():
+            env.setdefault(key, value)
+
+        self.proxy = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "benchmarks.proxy_app:app",
+            "--port", str(self.proxy_port), "--log-level", "warning",
+        ], env=env)
+        self.processes.append(self.proxy)
+
+        await wait_for_port(self.api_port)
+        await wait_for_port(self.proxy_port)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+
+    async def upstream_bytes(self, client: httpx.AsyncClient) -> int:
+        resp = await client.get(f"http://127.0.0.1:{self.api_port}/stats")
+        return resp.json()["bytes"]
+
+    async def fetch(self, client: httpx.AsyncClient, viewer: int, file_id: str, start: int, end: Optional[int], limit: int) -> Sample:
+        """
+        One player request. Reads at most `limit` bytes, then aborts like a player would.
+        """
+        range_header = f"bytes={start}-{end if end is not None else ''}"
+        headers = {"Range": range_header, "User-Agent": f"bench-viewer-{viewer}"}
+        url = f"http://127.0.0.1:{self.proxy_port}/webapp/stream/{file_id}"
+        began = time.perf_counter()
+        ttfb = None
+        received = bytearray() if self.args.verify else None
+        size = 0
+        ok = True
+        try:
+            async with client.stream("GET", url, headers=headers) as resp:
+                ok = resp.status_code in (200, 206)
+                async for chunk in resp.aiter_raw():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - began
+                    size += len(chunk)
+                    if received is not None:
+                        received += chunk
+                    if size >= limit:
+                        break
+        except httpx.HTTPError:
+            ok = False
+        latency = time.perf_counter() - began
+
+        if ok and received is not None:
+            ok = bytes(received) == file_bytes(start, start + len(received) - 1)
+        return Sample(ttfb if ttfb is not None else latency, latency, size, ok)
+
+    async def run(self, name: str, client: httpx.AsyncClient) -> ScenarioResult:
+        args = self.args
+        streams = args.viewers * (args.seeks if name == "seek" else 1)
+        result = ScenarioResult(name, streams)
+        # Fresh files per scenario, so caches of previous runs do not count
+        run_id = f"{name}{random.randrange(1 << 30)}"
+
+        async def sequential(viewer: int):
+            file_id = f"{run_id}-{viewer % args.files}"
+            return [await self.fetch(client, viewer, file_id, 0, None, args.play_bytes)]
+
+        async def seek(viewer: int):
+            file_id = f"{run_id}-{viewer % args.files}"
+            samples = []
+            for _ in range(args.seeks):
+                start = random.randrange(0, args.file_size - args.seek_size)
+                samples.append(await self.fetch(client, viewer, file_id, start, start + args.seek_size - 1, args.seek_size))
+            return samples
+
+        async def concurrent(viewer: int):
+            # Everyone on the same episode
+            return [await self.fetch(client, viewer, f"{run_id}-0", 0, None, args.play_bytes)]
+
+        pattern = {"sequential": sequential, "seek": seek, "concurrent": concurrent}[name]
+        viewers = args.viewers * (4 if name == "concurrent" else 1)
+        result.streams = viewers * (args.seeks if name == "seek" else 1)
+
+        upstream_before = await self.upstream_bytes(client)
+        cpu_before = cpu_seconds(self.proxy.pid)
+        peak = 0
+        running = True
+
+        async def sample_memory():
+            nonlocal peak
+            while running:
+                peak = max(peak, rss_bytes(self.proxy.pid))
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample_memory())
+        began = time.perf_counter()
+        for samples in await asyncio.gather(*(pattern(v) for v in range(viewers))):
+            result.samples.extend(samples)
+        result.duration = time.perf_counter() - began
+        running = False
+        await sampler
+
+        result.cpu_seconds = cpu_seconds(self.proxy.pid) - cpu_before
+        result.peak_rss = peak
+        result.upstream_bytes = await self.upstream_bytes(client) - upstream_before
+        return result
+
+def print_report(reports: List[Dict]):
+    columns = [
+        ("scenario", "{}"), ("requests", "{}"), ("errors", "{}"),
+        ("ttfb_p50_ms", "{:.1f}"), ("ttfb_p99_ms", "{:.1f}"),
+        ("latency_p50_ms", "{:.1f}"), ("latency_p99_ms", "{:.1f}"),
+        ("throughput_mb_s", "{:.1f}"), ("delivered_mb", "{:.1f}"), ("upstream_mb", "{:.1f}"),
+        ("cpu_ms_per_stream", "{:.1f}"), ("rss_mb_per_stream", "{:.2f}"),
+    ]
+    rows = [[fmt.format(r[key]) for key, fmt in columns] for r in reports]
+    widths = [max(len(key), *(len(row[i]) for row in rows)) for i, (key, _) in enumerate(columns)]
+    print("  ".join(key.ljust(w) for (key, _), w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(w) for value, w in zip(row, widths)))
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /webapp/stream proxy")
+    parser.add_argument("--scenario", choices=["sequential", "seek", "concurrent", "all"], default="all")
+    parser.add_argument("--viewers", type=int, default=8)
+    parser.add_argument("--files", type=int, default=4, help="Distinct files in sequential/seek")
+    parser.add_argument("--file-size", type=int, default=200 * 1024 * 1024)
+    parser.add_argument("--play-bytes", type=int, default=16 * 1024 * 1024, help="Bytes read per sequential play")
+    parser.add_argument("--seeks", type=int, default=10, help="Seeks per viewer")
+    parser.add_argument("--seek-size", type=int, default=2 * 1024 * 1024, help="Bytes per seek range")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Bot API latency (s)")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Fake Bot API bytes/s per connection")
+    parser.add_argument("--verify", action="store_true", help="Check every received byte")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    scenarios = ["sequential", "seek", "concurrent"] if args.scenario == "all" else [args.scenario]
+    bench = Bench(args)
+    await bench.start()
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            reports = [(await bench.run(name, client)).report() for name in scenarios]
+    finally:
+        bench.stop()
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+TMDB client benchmark.
+
+Starts a local fake TMDB (benchmarks.fake_tmdb) with a rate limit and random
+5xx errors, then runs many concurrent lookups (search, details, season) through
+app.utils.tmdb.TMDBClient, like a burst of import workers would.
+Reports lookups/s, latency p50/p99, failed lookups and how many requests the
+server had to reject with 429.
+
+    python -m benchmarks.tmdb_bench --lookups 300 --workers 16 --server-rate-limit 40
+    TMDB_RATE_LIMIT=0 python -m benchmarks.tmdb_bench   # client limiter off
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stream_bench import free_port, percentile, wait_for_port
+
+async def run(args) -> dict:
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_tmdb",
+        "--port", str(port),
+        "--latency", str(args.latency),
+        "--rate-limit", str(args.server_rate_limit),
+        "--error-rate", str(args.error_rate),
+    ])
+
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{port}"
+    for key, value in {
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "OWNER_TELEGRAM_ID": "1",
+        "TMDB_API_KEY": "benchmark",
+        "MONGO_URI": "mongodb://127.0.0.1:27017",
+        "REDIS_URL": "redis://127.0.0.1:6379/0",
+        "BASE_URL": "http://127.0.0.1",
+        "SECRET_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # Imported late: settings are read from the environment set above
+    from app.utils.http import close_http_client, init_http_client
+    from app.utils.tmdb import tmdb_client
+
+    try:
+        await wait_for_port(port)
+        await init_http_client()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.lookups):
+            queue.put_nowait(i)
+        latencies = []
+        failures = 0
+
+        async def lookup(i: int):
+            show = i // 3
+            if i % 3 == 0:
+                return await tmdb_client.search_tv_show(f"Benchmark Show {show}")
+            if i % 3 == 1:
+                return await tmdb_client.get_show_details(show + 1)
+            return await tmdb_client.get_season_details(show + 1, 1)
+
+        async def worker():
+            nonlocal failures
+            while not queue.empty():
+                i = queue.get_nowait()
+                started = time.perf_counter()
+                if await lookup(i) is None:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.workers)])
+        duration = time.perf_counter() - started
+
+        async with httpx.AsyncClient() as client:
+            stats = (await client.get(f"http://127.0.0.1:{port}/stats")).json()
+    finally:
+        await close_http_client()
+        server.terminate()
+        server.wait(timeout=10)
+
+    latencies.sort()
+    return {
+        "lookups": args.lookups,
+        "failed": failures,
+        "lookups_per_s": args.lookups / duration,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "server_429": stats["rate_limited"],
+        "server_5xx": stats["errors"],
+        "client_rate_limit": tmdb_client.limiter.rate,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the async TMDB client against a fake TMDB")
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake TMDB latency (s)")
+    parser.add_argument("--server-rate-limit", type=float, default=40, help="Fake TMDB requests/s before 429")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of fake TMDB 5xx answers")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:18} {value:.1f}" if isinstance(value, float) else f"{key:18} {value}")
+
+if __name__ == "__main__":
+    main()
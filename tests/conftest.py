@@ -0,0 +1,14 @@
+import os
+
+# app.config reads these at import time; the tests use local stand-ins only
+for key, value in {
+    "BOT_TOKEN": "123456:TEST",
+    "OWNER_TELEGRAM_ID": "1",
+    "TMDB_API_KEY": "test",
+    "MONGO_URI": "mongodb://127.0.0.1:27017",
+    "REDIS_URL": "redis://127.0.0.1:6379/0",
+    "BASE_URL": "http://127.0.0.1",
+    "SECRET_KEY": "test",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,127 @@
+"""
+BotApiBackend against the fake Bot API of the benchmarks (benchmarks/fake_bot_api.py),
+served in-process through httpx's ASGI transport.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+import httpx
+import pytest
+
+from app.streaming import backends
+from app.streaming.backends import BotApiBackend, UpstreamError
+from app.streaming.telegram import TelegramFile, file_path_cache
+from app.utils import http
+from benchmarks.fake_bot_api import create_app, file_bytes
+
+PART_SIZE = 256 * 1024
+FILE_SIZE = 5 * PART_SIZE + 12345
+
+class FakeTelegram(httpx.AsyncBaseTransport):
+    """
+    The fake Bot API, recording the download ranges and how many were in
+    flight at once. `failures` maps a part's first byte to what its next
+    requests get instead of the file: an httpx exception or a status code.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.inner = httpx.ASGITransport(app=create_app(FILE_SIZE, latency, 0))
+        self.ranges: List[Tuple[int, int]] = []
+        self.failures: Dict[int, List[Union[Exception, int]]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if "/file/" not in request.url.path:
+            return await self.inner.handle_async_request(request)
+
+        first, _, last = request.headers["range"][len("bytes="):].partition("-")
+        self.ranges.append((int(first), int(last)))
+        pending = self.failures.get(int(first))
+        if pending:
+            failure = pending.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, request=request)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self.inner.handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+TG_FILE = TelegramFile(file_id="f1", file_unique_id="uf1", file_path="videos/f1.mp4", file_size=FILE_SIZE)
+
+@pytest.fixture
+def telegram(monkeypatch):
+    fake = FakeTelegram()
+    monkeypatch.setattr(http, "_http_client", httpx.AsyncClient(transport=fake))
+    # Known path: no getFile (nor Redis) needed
+    file_path_cache._set_local(TG_FILE, 3600)
+    # No backoff between retries
+    monkeypatch.setattr(backends.asyncio, "sleep", fast_sleep)
+    return fake
+
+_sleep = asyncio.sleep
+
+async def fast_sleep(delay: float, result=None):
+    return await _sleep(0, result)
+
+async def read(backend: BotApiBackend, start: int, end: int) -> Tuple[bytes, Optional[Exception]]:
+    data, offset = bytearray(), start
+    try:
+        async for chunk_offset, chunk in backend.iter_range(TG_FILE, start, end):
+            assert chunk_offset == offset
+            data += chunk
+            offset += len(chunk)
+    except UpstreamError as e:
+        return bytes(data), e
+    return bytes(data), None
+
+@pytest.mark.parametrize("start, end", [
+    (0, FILE_SIZE - 1),
+    (PART_SIZE - 10, 3 * PART_SIZE + 10),
+    (PART_SIZE, 2 * PART_SIZE - 1),
+    (12345, 12345),
+    (FILE_SIZE - 1, FILE_SIZE - 1),
+])
+def test_ranges_are_served_from_aligned_parts(telegram, start, end):
+    data, error = asyncio.run(read(BotApiBackend(3, PART_SIZE), start, end))
+    assert error is None
+    assert data == file_bytes(start, end)
+
+    first, last = start // PART_SIZE, end // PART_SIZE
+    assert sorted(telegram.ranges) == [
+        (index * PART_SIZE, min((index + 1) * PART_SIZE, FILE_SIZE) - 1) for index in range(first, last + 1)
+    ]
+
+def test_parts_download_in_parallel(monkeypatch):
+    fake = FakeTelegram(latency=0.05)
+    monkeypatch.setattr(http, "_http_client", httpx.AsyncClient(transport=fake))
+    file_path_cache._set_local(TG_FILE, 3600)
+
+    data, error = asyncio.run(read(BotApiBackend(3, PART_SIZE), 0, FILE_SIZE - 1))
+    assert error is None and data == file_bytes(0, FILE_SIZE - 1)
+    assert fake.max_in_flight == 3
+
+@pytest.mark.parametrize("failures", [
+    [httpx.ConnectError("refused")],
+    [httpx.ReadTimeout("timeout"), httpx.RemoteProtocolError("peer closed")],
+    [500],
+    [502, 503],
+])
+def test_transient_failures_are_retried(telegram, failures):
+    telegram.failures[2 * PART_SIZE] = list(failures)
+    data, error = asyncio.run(read(BotApiBackend(3, PART_SIZE), 0, FILE_SIZE - 1))
+    assert error is None
+    assert data == file_bytes(0, FILE_SIZE - 1)
+    assert telegram.ranges.count((2 * PART_SIZE, 3 * PART_SIZE - 1)) == len(failures) + 1
+
+def test_part_fails_after_retries(telegram):
+    telegram.failures[2 * PART_SIZE] = [httpx.ReadTimeout("timeout")] * (backends.PART_RETRIES + 1)
+    data, error = asyncio.run(read(BotApiBackend(3, PART_SIZE), 0, FILE_SIZE - 1))
+    assert isinstance(error, UpstreamError)
+    # Everything before the failed part was delivered
+    assert data == file_bytes(0, 2 * PART_SIZE - 1)
+    assert telegram.ranges.count((2 * PART_SIZE, 3 * PART_SIZE - 1)) == backends.PART_RETRIES + 1
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.ingest import backfill as backfill_module
+from app.ingest.backfill import MetadataBackfill
+from app.utils import tmdb_cache as tmdb_cache_module
+from app.utils.tmdb_cache import TMDBCache
+from tests.test_tmdb_cache import NoRedis, StubTMDB
+
+SERIES_ID, SEASON_ID, TMDB_ID = ObjectId(), ObjectId(), 42
+EPISODES = [(ObjectId(), 1), (ObjectId(), 2)]
+
+class Documents:
+    """Stands in for a beanie find() / motor cursor over `items`."""
+
+    def __init__(self, items):
+        self.items = items
+
+    async def to_list(self):
+        return self.items
+
+    def __aiter__(self):
+        async def iterate():
+            for item in self.items:
+                yield item
+        return iterate()
+
+@pytest.fixture
+def library(monkeypatch):
+    """One season with two placeholder episodes, Mongo replaced by the lists above."""
+    placeholders = [
+        {"_id": episode_id, "season_id": SimpleNamespace(id=SEASON_ID), "episode_number": number}
+        for episode_id, number in EPISODES
+    ]
+    season = SimpleNamespace(id=SEASON_ID, season_number=1, series_id=SimpleNamespace(ref=SimpleNamespace(id=SERIES_ID)))
+    series = SimpleNamespace(id=SERIES_ID, tmdb_id=TMDB_ID)
+    monkeypatch.setattr(
+        backfill_module.Episode, "get_motor_collection",
+        lambda: SimpleNamespace(find=lambda query, projection: Documents(placeholders)),
+    )
+    monkeypatch.setattr(backfill_module.Season, "find", lambda query: Documents([season]))
+    monkeypatch.setattr(backfill_module.Series, "find", lambda query: Documents([series]))
+
+    written = {}
+
+    async def update_season(episodes, season_details):
+        for episode_id, number in episodes:
+            written[episode_id] = backfill_module.episode_metadata(season_details, number)["name"]
+        return len(episodes)
+    monkeypatch.setattr(MetadataBackfill, "_update_season", staticmethod(update_season))
+
+    async def invalidate(*scopes):
+        pass
+    monkeypatch.setattr(backfill_module.catalog_cache, "invalidate", invalidate)
+    return written
+
+def test_backfill_reads_seasons_from_tmdb_not_the_stale_cache(monkeypatch, library):
+    monkeypatch.setattr(tmdb_cache_module, "redis_client", NoRedis())
+    client = StubTMDB()
+    cache = TMDBCache(client, max_entries=100, ttl=3600, negative_ttl=300)
+    monkeypatch.setattr(backfill_module, "tmdb_cache", cache)
+
+    # At import TMDB did not know the episodes yet: that response is cached
+    client.seasons[1] = {"episodes": []}
+    asyncio.run(cache.get_season_details(TMDB_ID, 1))
+
+    client.seasons[1] = {"episodes": [{"episode_number": 1, "name": "Pilot"}, {"episode_number": 2, "name": "Second"}]}
+    result = asyncio.run(MetadataBackfill().run())
+
+    assert library == {EPISODES[0][0]: "Pilot", EPISODES[1][0]: "Second"}
+    assert result == {"seasons": 1, "episodes": 2, "updated": 2, "failed_seasons": 0}
+    assert client.requests == [1, 1]
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+
+from app.ingest.backfill import MetadataBackfill
+from app.ingest.unsorted import UnsortedRerun
+
+async def fail():
+    raise ConnectionError("mongo is down")
+
+async def finish(start, is_running):
+    assert start()
+    while is_running():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+def test_failed_backfill_is_logged_and_reported(caplog):
+    backfill = MetadataBackfill()
+    backfill.run = fail
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(finish(backfill.start, lambda: backfill.running))
+    assert backfill.last_result == {"error": "mongo is down"}
+    assert "Metadata backfill failed: mongo is down" in caplog.text
+    assert not backfill.running
+
+def test_failed_unsorted_rerun_is_logged_and_reported(caplog):
+    rerun = UnsortedRerun(rate=0)
+
+    async def run(query):
+        rerun.queued = 3
+        await fail()
+    rerun.run = run
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(finish(lambda: rerun.start({}), lambda: rerun.running))
+    assert rerun.error == "mongo is down"
+    assert "Unsorted re-run failed after 3 files: mongo is down" in caplog.text
+
+    # A new run starts without the old error
+    rerun.run = lambda query: asyncio.sleep(0)
+    asyncio.run(finish(lambda: rerun.start({}), lambda: rerun.running))
+    assert rerun.error is None
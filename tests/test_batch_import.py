@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.handlers import batch_import
+from app.ingest.jobs import ImportJob, ImportRejected
+
+def job(bundle_id: str) -> ImportJob:
+    return ImportJob(
+        channel_id=-100, message_id=1, bundle_id=bundle_id,
+        file_id="f", file_unique_id="u", file_name="Show.S01E01.mkv",
+    )
+
+def test_invalid_bundle_id_is_rejected():
+    with pytest.raises(ImportRejected) as rejected:
+        asyncio.run(batch_import.process_new_file(job("not-an-id")))
+    assert rejected.value.reason == "no_bundle"
+
+def test_missing_bundle_is_rejected(monkeypatch):
+    async def get(document_id):
+        return None
+    monkeypatch.setattr(batch_import.Bundle, "get", get)
+
+    with pytest.raises(ImportRejected) as rejected:
+        asyncio.run(batch_import.process_new_file(job(str(ObjectId()))))
+    assert rejected.value.reason == "no_bundle"
+
+def test_bundle_lookup_errors_are_retried(monkeypatch):
+    async def get(document_id):
+        raise ConnectionError("mongo is down")
+    monkeypatch.setattr(batch_import.Bundle, "get", get)
+
+    # Not ImportRejected: the queue retries the file
+    with pytest.raises(ConnectionError):
+        asyncio.run(batch_import.process_new_file(job(str(ObjectId()))))
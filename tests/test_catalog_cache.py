@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import catalog_cache as catalog_cache_module
+from app.utils.catalog_cache import BUNDLES, CatalogCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+class FakeRedis:
+    """GET/SET with expiry and pipelined INCR; `broken_writes` makes INCR fail."""
+
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.values = {}
+        self.broken_writes = False
+
+    async def get(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.clock.now:
+            return None
+        return value
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = (value, self.clock.now + ex if ex else None)
+
+    def pipeline(self, transaction=False):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.keys = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            def incr(self, key):
+                self.keys.append(key)
+
+            async def execute(self):
+                if redis.broken_writes:
+                    raise ConnectionError("redis is read-only")
+                for key in self.keys:
+                    value = int((await redis.get(key)) or 0) + 1
+                    redis.values[key] = (str(value), None)
+        return Pipeline()
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(catalog_cache_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+@pytest.fixture
+def redis(monkeypatch, clock):
+    redis = FakeRedis(clock)
+    monkeypatch.setattr(catalog_cache_module, "redis_client", redis)
+    return redis
+
+def listing(version: list):
+    async def build() -> bytes:
+        return f'{{"version": {version[0]}}}'.encode()
+    return build
+
+def test_failed_invalidation_drops_local_entries(redis):
+    cache = CatalogCache(max_entries=10, ttl=3600)
+    data = [1]
+    assert asyncio.run(cache.get(BUNDLES, "50", listing(data)))[0] == b'{"version": 1}'
+
+    data[0] = 2
+    redis.broken_writes = True
+    redis.values.clear()  # The Redis copy is gone too (evicted, flushed)
+    asyncio.run(cache.invalidate(BUNDLES))
+    assert asyncio.run(cache.get(BUNDLES, "50", listing(data)))[0] == b'{"version": 2}'
+
+def test_local_entries_expire_after_ttl(redis, clock):
+    other_process = CatalogCache(max_entries=10, ttl=3600)
+    data = [1]
+    assert asyncio.run(other_process.get(BUNDLES, "50", listing(data)))[0] == b'{"version": 1}'
+
+    # The version bump of a change is lost: served from memory until the entry expires
+    data[0] = 2
+    redis.broken_writes = True
+    asyncio.run(CatalogCache(max_entries=10, ttl=3600).invalidate(BUNDLES))
+    clock.now += 3599
+    assert asyncio.run(other_process.get(BUNDLES, "50", listing(data)))[0] == b'{"version": 1}'
+    clock.now += 2
+    assert asyncio.run(other_process.get(BUNDLES, "50", listing(data)))[0] == b'{"version": 2}'
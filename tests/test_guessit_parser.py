@@ -0,0 +1,39 @@
+"""
+MediaParser's guessit process pool (app/utils/guessit_parser.py).
+"""
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import settings
+from app.utils import guessit_parser
+from app.utils.guessit_parser import MediaParser
+
+class BrokenPool:
+    """A process pool whose workers died: every call fails."""
+
+    def __init__(self):
+        self.shutdowns = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns.append((wait, cancel_futures))
+
+def test_broken_pool_is_shut_down_once_and_replaced(monkeypatch):
+    pool = BrokenPool()
+    monkeypatch.setattr(MediaParser, "_pool", pool)
+    monkeypatch.setattr(settings, "PARSER_PROCESSES", 2)
+    monkeypatch.setattr(guessit_parser, "parse_guessit", lambda filename: {"title": filename})
+
+    async def lookups():
+        return await asyncio.gather(*(MediaParser._guess_in_pool(f"Show {i}") for i in range(3)))
+    results = asyncio.run(lookups())
+
+    # Answered in a thread meanwhile
+    assert results == [{"title": f"Show {i}"} for i in range(3)]
+    assert pool.shutdowns == [(False, True)]
+    assert MediaParser._pool is None
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from app.ingest import queue as queue_module
+from app.ingest.queue import ImportQueue
+
+def test_worker_survives_a_failing_entry(monkeypatch, caplog):
+    monkeypatch.setattr(queue_module, "READ_RETRY_DELAY", 0)
+    queue = ImportQueue(workers=1, max_attempts=3, claim_idle=60, maxlen=1000, retry_base_delay=1, retry_max_delay=10)
+    entries = [[("1-0", {"job": "a"})], [("2-0", {"job": "b"})]]
+    processed = []
+
+    async def claim_stale(consumer):
+        return []
+
+    async def read(consumer):
+        if entries:
+            return entries.pop(0)
+        await asyncio.sleep(0)
+        return []
+
+    async def process(entry_id, fields):
+        if entry_id == "1-0":
+            raise ConnectionError("redis went away")
+        processed.append(entry_id)
+
+    queue._claim_stale, queue._read, queue._process = claim_stale, read, process
+
+    async def run():
+        worker = asyncio.create_task(queue._worker("test"))
+        for _ in range(100):
+            if processed:
+                break
+            await asyncio.sleep(0)
+        assert not worker.done()
+        worker.cancel()
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(run())
+    assert processed == ["2-0"]
+    assert "could not process entry 1-0: redis went away" in caplog.text
@@ -0,0 +1,108 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, json_util
+from bson.regex import Regex
+from fastapi import HTTPException
+
+from app.models import Bundle, Episode, UnsortedFile
+from app.webapp.pagination import after, decode_cursor, encode_cursor, key_types
+
+BUNDLE_ORDER = [("name", 1), ("_id", 1)]
+EPISODE_ORDER = [("season_number", 1), ("episode_number", 1), ("_id", 1)]
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def test_round_trip():
+    values = [None, 3, ObjectId()]
+    assert decode_cursor(encode_cursor(values), key_types(Episode, EPISODE_ORDER)) == values
+
+    values = [datetime(2024, 1, 2, 3, 4, 5), ObjectId()]
+    decoded = decode_cursor(encode_cursor(values), key_types(UnsortedFile, [("updated_at", -1), ("_id", -1)]))
+    assert decoded[0].replace(tzinfo=None) == values[0] and decoded[1] == values[1]
+
+def test_key_types():
+    assert key_types(Episode, EPISODE_ORDER) == [(type(None), int), (int,), (ObjectId,)]
+    assert key_types(Bundle, BUNDLE_ORDER) == [(str,), (ObjectId,)]
+
+@pytest.mark.parametrize("values", [
+    [{"$regex": "^(a+)+$"}, str(ObjectId())],   # regex injection
+    ["a", {"$exists": True}],                    # operator injection
+    [Regex("^a"), ObjectId()],
+    [["a"], ObjectId()],
+    [5, ObjectId()],                             # wrong type
+    ["a", "not an object id"],
+    [None, ObjectId()],                          # name is not optional
+    [True, ObjectId()],
+    ["a"],                                       # wrong length
+])
+def test_rejects_anything_but_sort_key_values(values):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(raw_cursor(values), key_types(Bundle, BUNDLE_ORDER))
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", raw_cursor({"a": 1}), raw_cursor([2 ** 70, 1, ObjectId()])])
+def test_rejects_malformed_cursors(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, key_types(Episode, EPISODE_ORDER))
+    assert error.value.status_code == 400
+
+def test_after():
+    oid = ObjectId()
+    assert after([("_id", 1)], [oid]) == {"_id": {"$gt": oid}}
+    assert after([("updated_at", -1), ("_id", -1)], ["t", oid]) == {"$or": [
+        {"updated_at": {"$lt": "t"}},
+        {"updated_at": "t", "_id": {"$lt": oid}},
+    ]}
+
+def matches(document, query) -> bool:
+    """The subset of MongoDB matching used by after(): $or, $and, $gt, $lt, $ne, equality (null included)."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(key)
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    ok = value != operand
+                else:
+                    # Comparisons never match null
+                    ok = value is not None and (value > operand if operator == "$gt" else value < operand)
+                if not ok:
+                    return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+def mongo_sort(documents, sort):
+    """MongoDB order: null before any value."""
+    ordered = list(documents)
+    for field, direction in reversed(sort):
+        ordered.sort(key=lambda d: (d[field] is not None, d[field] if d[field] is not None else 0), reverse=direction < 0)
+    return ordered
+
+@pytest.mark.parametrize("direction", [1, -1])
+def test_pages_across_null_sort_keys(direction):
+    sort = [("season_number", direction), ("episode_number", direction), ("_id", direction)]
+    documents = [
+        {"_id": ObjectId(), "season_number": season, "episode_number": number}
+        for season in (None, 1, 2) for number in (1, 2, 3)
+    ]
+    nullable = [type(None) in allowed for allowed in key_types(Episode, sort)]
+    expected = mongo_sort(documents, sort)
+
+    seen, values = [], None
+    while True:
+        query = after(sort, values, nullable) if values else {}
+        page = mongo_sort([d for d in documents if matches(d, query)], sort)[:2]
+        if not page:
+            break
+        seen += page
+        values = decode_cursor(encode_cursor([page[-1][field] for field, _ in sort]), key_types(Episode, sort))
+    assert seen == expected
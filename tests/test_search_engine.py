@@ -0,0 +1,61 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.search import engine as engine_module
+from app.search.engine import SearchEngine
+
+class RecordingEngine(SearchEngine):
+    """SearchEngine with the MongoDB reads replaced by call records."""
+
+    def __init__(self):
+        super().__init__(refresh_interval=0, rebuild_interval=6 * 3600, max_results=200)
+        self.calls = []
+
+    async def rebuild(self):
+        self.calls.append("rebuild")
+        self.ready = True
+        self._synced_at = engine_module.datetime.now(engine_module.timezone.utc)
+
+    async def _read(self, query, series, indexed):
+        self.calls.append("refresh")
+        return series, []
+
+def fake_clock(monkeypatch, *readings: float):
+    """Replaces the engine's time.monotonic (only) with `readings`, the last one repeated."""
+    readings = list(readings)
+    def monotonic():
+        return readings.pop(0) if len(readings) > 1 else readings[0]
+    monkeypatch.setattr(engine_module, "time", SimpleNamespace(monotonic=monotonic, perf_counter=time.perf_counter))
+
+async def drive(engine: SearchEngine, passes: int):
+    task = asyncio.create_task(engine._run())
+    for _ in range(1000):
+        if len(engine.calls) >= passes:
+            break
+        await asyncio.sleep(0)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+def test_first_pass_builds_on_freshly_booted_host(monkeypatch):
+    # time.monotonic() counts from boot: smaller than the rebuild interval
+    fake_clock(monkeypatch, 60.0)
+    engine = RecordingEngine()
+    asyncio.run(drive(engine, 3))
+    assert engine.calls[:3] == ["rebuild", "refresh", "refresh"]
+    assert engine.ready
+
+def test_rebuilds_after_interval(monkeypatch):
+    # Built at 10, refreshed at 20, rebuilt once the interval has passed
+    fake_clock(monkeypatch, 10.0, 20.0, 10.0 + 6 * 3600)
+    engine = RecordingEngine()
+    asyncio.run(drive(engine, 3))
+    assert engine.calls[:3] == ["rebuild", "refresh", "rebuild"]
+
+def test_refresh_before_first_build_rebuilds():
+    engine = RecordingEngine()
+    asyncio.run(engine.refresh())
+    assert engine.calls == ["rebuild"]
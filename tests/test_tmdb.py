@@ -0,0 +1,141 @@
+"""
+TMDBClient against the fake TMDB of the benchmarks (benchmarks/fake_tmdb.py),
+served in-process through httpx's ASGI transport.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+from app.utils import http
+from app.utils import tmdb as tmdb_module
+from app.utils.tmdb import MAX_RETRY_DELAY, TMDBClient, TMDBError
+from benchmarks.fake_tmdb import create_app, show_id
+
+class FakeTMDB(httpx.AsyncBaseTransport):
+    """
+    The fake TMDB, answering the first requests with `failures`
+    ((status, headers) pairs) instead.
+    """
+
+    def __init__(self, rate_limit: float = 0):
+        self.app = create_app(latency=0, rate_limit=rate_limit)
+        self.inner = httpx.ASGITransport(app=self.app)
+        self.failures: List[Tuple[int, Dict[str, str]]] = []
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.failures:
+            status, headers = self.failures.pop(0)
+            return httpx.Response(status, headers=headers, json={"status_message": "failure"}, request=request)
+        return await self.inner.handle_async_request(request)
+
+def serve(monkeypatch, fake: FakeTMDB):
+    monkeypatch.setattr(http, "_http_client", httpx.AsyncClient(transport=fake))
+
+def client(rate_limit: float = 0, max_retries: int = 3) -> TMDBClient:
+    return TMDBClient("key", base_url="http://tmdb.test", language="en", rate_limit=rate_limit, max_retries=max_retries)
+
+@pytest.fixture
+def delays(monkeypatch) -> List[float]:
+    """Records the retry delays instead of sleeping them."""
+    recorded: List[float] = []
+    sleep = asyncio.sleep
+
+    async def record(delay: float, result=None):
+        recorded.append(delay)
+        return await sleep(0, result)
+    monkeypatch.setattr(tmdb_module, "asyncio", SimpleNamespace(sleep=record))
+    return recorded
+
+def search(tmdb: TMDBClient, query: str) -> Optional[List[Dict]]:
+    return asyncio.run(tmdb.search_tv_show(query))
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_statuses_are_retried(monkeypatch, delays, status):
+    fake = FakeTMDB()
+    fake.failures = [(status, {}), (status, {})]
+    serve(monkeypatch, fake)
+
+    results = search(client(), "Breaking Bad")
+    assert [show["id"] for show in results] == [show_id("Breaking Bad")]
+    assert fake.requests == 3
+    # Backoff with jitter: 0.5s then 1s, times 0.5-1
+    assert 0.25 <= delays[0] <= 0.5 and 0.5 <= delays[1] <= 1.0
+
+@pytest.mark.parametrize("retry_after, expected", [
+    ("2", 2.0),
+    ("0", 0.0),
+    ("86400", MAX_RETRY_DELAY),
+    ("inf", None),
+    ("-5", None),
+    ("nan", None),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", None),
+])
+def test_retry_after_is_honoured_up_to_a_limit(monkeypatch, delays, retry_after, expected):
+    fake = FakeTMDB()
+    fake.failures = [(429, {"Retry-After": retry_after})]
+    serve(monkeypatch, fake)
+
+    assert search(client(), "Lost")
+    assert len(delays) == 1
+    if expected is None:
+        # Not a usable number of seconds: backoff
+        assert 0.25 <= delays[0] <= 0.5
+    else:
+        assert delays[0] == expected
+
+def test_gives_up_after_max_retries(monkeypatch, delays):
+    fake = FakeTMDB()
+    fake.failures = [(503, {})] * 4
+    serve(monkeypatch, fake)
+
+    tmdb = client(max_retries=3)
+    with pytest.raises(TMDBError):
+        asyncio.run(tmdb._get("/search/tv", query="Lost"))
+    assert fake.requests == 4
+    assert len(delays) == 3
+    assert all(delay <= MAX_RETRY_DELAY for delay in delays)
+
+def test_other_errors_are_not_retried(monkeypatch, delays):
+    fake = FakeTMDB()
+    fake.failures = [(401, {})]
+    serve(monkeypatch, fake)
+
+    # Failed (None), as opposed to no results ([])
+    assert search(client(), "Lost") is None
+    assert fake.requests == 1 and delays == []
+
+def test_rate_limiter_keeps_concurrent_lookups_under_the_limit(monkeypatch):
+    # TMDB allows 50 requests per second, the client is set to 20/s
+    fake = FakeTMDB(rate_limit=50)
+    serve(monkeypatch, fake)
+    tmdb = client(rate_limit=20, max_retries=0)
+
+    async def burst():
+        started = time.monotonic()
+        results = await asyncio.gather(*(tmdb.search_tv_show(f"Show {i}") for i in range(40)))
+        return results, time.monotonic() - started
+    results, duration = asyncio.run(burst())
+
+    assert all(results)
+    assert fake.app.state.stats["rate_limited"] == 0
+    # A burst of 20, then 20 more at 20/s
+    assert duration >= 0.9
+
+def test_fake_rejects_an_unlimited_burst(monkeypatch):
+    # Same burst without the limiter: TMDB answers 429 and lookups fail
+    fake = FakeTMDB(rate_limit=50)
+    serve(monkeypatch, fake)
+    tmdb = client(rate_limit=0, max_retries=0)
+
+    async def burst():
+        return await asyncio.gather(*(tmdb.search_tv_show(f"Show {i}") for i in range(80)))
+    results = asyncio.run(burst())
+
+    assert fake.app.state.stats["rate_limited"] > 0
+    assert results.count(None) == fake.app.state.stats["rate_limited"]
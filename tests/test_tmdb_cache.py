@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import pytest
+
+from app.utils import tmdb_cache as tmdb_cache_module
+from app.utils.tmdb import TMDBError
+from app.utils.tmdb_cache import TMDBCache
+
+class NoRedis:
+    """Redis down: the cache runs on its in-process tier only."""
+
+    def pipeline(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+class StubTMDB:
+    language = "en"
+
+    def __init__(self):
+        self.seasons: Dict[int, Optional[Dict]] = {}
+        self.fail = False
+        self.requests: List[int] = []
+
+    async def fetch_season_details(self, tmdb_id: int, season_number: int) -> Optional[Dict]:
+        self.requests.append(season_number)
+        if self.fail:
+            raise TMDBError("503")
+        return self.seasons.get(season_number)
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(tmdb_cache_module, "redis_client", NoRedis())
+
+def make_cache(client: StubTMDB) -> TMDBCache:
+    return TMDBCache(client, max_entries=100, ttl=3600, negative_ttl=300)
+
+def test_unknown_season_is_cached():
+    client = StubTMDB()
+    cache = make_cache(client)
+
+    async def batch():
+        # One batch of 10 files of a season TMDB does not know
+        return [await cache.get_season_details(1, 9) for _ in range(10)]
+    assert asyncio.run(batch()) == [None] * 10
+    assert client.requests == [9]
+    expires_at, value = cache._entries["season:en:1:9"]
+    assert value is None and expires_at <= time.monotonic() + 300
+
+def test_failed_requests_are_not_cached():
+    client = StubTMDB()
+    client.fail = True
+    cache = make_cache(client)
+
+    async def batch():
+        return [await cache.get_season_details(1, 1) for _ in range(3)]
+    assert asyncio.run(batch()) == [None] * 3
+    assert client.requests == [1, 1, 1]
+
+def test_refresh_replaces_a_stale_season():
+    client = StubTMDB()
+    cache = make_cache(client)
+    client.seasons[1] = {"episodes": []}
+    assert asyncio.run(cache.get_season_details(1, 1)) == {"episodes": []}
+
+    # TMDB now knows the episodes: a plain lookup still gets the cached response
+    client.seasons[1] = {"episodes": [{"episode_number": 1, "name": "Pilot"}]}
+    assert asyncio.run(cache.get_season_details(1, 1)) == {"episodes": []}
+    assert asyncio.run(cache.get_season_details(1, 1, refresh=True)) == client.seasons[1]
+    # ... and the refreshed one from then on
+    assert asyncio.run(cache.get_season_details(1, 1)) == client.seasons[1]
+    assert client.requests == [1, 1]
@@ -0,0 +1,39 @@
+"""
+The viewer role cache of app/streaming/viewer.py.
+"""
+import asyncio
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from app.config import settings
+from app.streaming import viewer
+
+class FakeUsers:
+    """Stands in for the User model, counting lookups."""
+    telegram_id = 0
+    lookups = 0
+
+    @classmethod
+    async def find_one(cls, _query):
+        cls.lookups += 1
+        return SimpleNamespace(role="viewer", is_banned=False)
+
+def test_role_cache_keeps_the_most_recent_viewers(monkeypatch):
+    monkeypatch.setattr(viewer, "_roles", OrderedDict())
+    monkeypatch.setattr(viewer, "User", FakeUsers)
+    monkeypatch.setattr(settings, "VIEWER_ROLE_CACHE_SIZE", 3)
+    monkeypatch.setattr(settings, "OWNER_TELEGRAM_ID", -1)
+    FakeUsers.lookups = 0
+
+    async def view(*telegram_ids):
+        for telegram_id in telegram_ids:
+            await viewer._role_of(telegram_id)
+    # 1 is used again before 4 comes in, so 2 is the one dropped
+    asyncio.run(view(1, 2, 3, 1, 4))
+    assert list(viewer._roles) == [3, 1, 4]
+    assert FakeUsers.lookups == 4
+
+    asyncio.run(view(1, 3, 4))
+    assert FakeUsers.lookups == 4
+    asyncio.run(view(2))
+    assert FakeUsers.lookups == 5 and len(viewer._roles) == 3